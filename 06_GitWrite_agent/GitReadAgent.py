@@ -1,12 +1,18 @@
 import os
 import re
 import json
+import math
 import asyncio
 from urllib.parse import urlparse
 from typing import TypedDict, Optional, Any, List, Dict
-from langgraph.graph import StateGraph, START, END
-from fastmcp import Client
-from lg_utility import save_graph_as_png
+from langgraph.graph import START, END
+from mcp_session_manager import mcp_sessions
+from lg_utility import save_graph_as_png, TimedStateGraph
+from mcp_resilience import call_tool
+from diff_hunks import diff_hunks
+from artifact_store import run_store, patch_text
+from review_filter import review_filter
+from languages import detect_language
 from debug_utils import (
     log_node_enter, log_node_exit, log_step, log_ok, log_warn,
     log_error, log_state, log_diff_table
@@ -14,6 +20,9 @@ from debug_utils import (
 
 AGENT = "GIT-READ"
 
+FILES_PER_PAGE = 100    # GitHub max for the PR files endpoint
+MAX_FILE_PAGES = 30     # GitHub stops listing PR files after 3000
+
 # ============================================================================
 # STATE  — only what the read agent needs
 # ============================================================================
@@ -28,8 +37,9 @@ class GitReadAgentState(TypedDict):
     pull_number:   int
 
     # ── outputs ───────────────────────────────────────────────────────────────
-    changed_files: List[Dict]       # raw file records from GitHub
-    diffs:         List[Dict]       # structured diffs ready for LLM
+    changed_files: List[Dict]       # file records from GitHub; patch text → patch_id (artifact_store.py)
+    diffs:         List[Dict]       # structured diffs (patch_id, language), ready for LLM
+    skipped_files: List[Dict]       # {filename, status, additions, deletions, reason} (review_filter.py)
     has_valid_files: bool
 
     # ── internal ──────────────────────────────────────────────────────────────
@@ -66,12 +76,79 @@ def parse_github_pr_url(url: str):
 async def call_mcp_tool(client, tool_name: str, arguments: dict) -> dict:
     """Call a GitHub MCP tool and return parsed JSON response."""
     log_step(AGENT, f"MCP call: {tool_name}  args={arguments}")
-    result       = await client.call_tool(tool_name, arguments)
+    result       = await call_tool(client, tool_name, arguments)
     content_text = result.content[0].text
     log_step(AGENT, f"MCP response length: {len(content_text)} chars")
     return json.loads(content_text) if content_text else {}
 
 
+async def _fetch_files_page(client, owner: str, repo: str, pull_number: int, page: int) -> List[Dict]:
+    """Fetch one page of PR files (FILES_PER_PAGE per page)."""
+    response = await call_mcp_tool(client, "GITHUB_LIST_PULL_REQUESTS_FILES", {
+        "owner":       owner,
+        "repo":        repo,
+        "pull_number": pull_number,
+        "page":        page,
+        "per_page":    FILES_PER_PAGE,
+    })
+    return response.get("data", {}).get("details", []) or []
+
+
+async def _fetch_changed_files_count(client, owner: str, repo: str, pull_number: int) -> Optional[int]:
+    """Total changed-file count from the PR record, or None if it cannot be read."""
+    try:
+        response = await call_mcp_tool(client, "GITHUB_GET_A_PULL_REQUEST", {
+            "owner":       owner,
+            "repo":        repo,
+            "pull_number": pull_number,
+        })
+    except Exception as e:
+        log_warn(AGENT, f"Could not read PR metadata: {e}")
+        return None
+
+    data = response.get("data", {}) or {}
+    for record in (data, data.get("details") or {}):
+        if isinstance(record, dict) and isinstance(record.get("changed_files"), int):
+            return record["changed_files"]
+    return None
+
+
+async def fetch_all_pr_files(client, owner: str, repo: str, pull_number: int) -> List[Dict]:
+    """
+    Fetch every file of a PR. Page 1 and the PR's changed_files count are
+    requested together; the remaining pages are then fetched concurrently
+    and merged in page order. If the count is unavailable, pages are
+    walked sequentially until a short page.
+    """
+    first_page, total = await asyncio.gather(
+        _fetch_files_page(client, owner, repo, pull_number, 1),
+        _fetch_changed_files_count(client, owner, repo, pull_number),
+    )
+    files = list(first_page)
+
+    if len(first_page) < FILES_PER_PAGE:
+        return files
+
+    if total is not None:
+        pages = min(MAX_FILE_PAGES, math.ceil(total / FILES_PER_PAGE))
+        log_step(AGENT, f"PR has {total} file(s) — fetching pages 2..{pages} concurrently")
+        rest = await asyncio.gather(*(
+            _fetch_files_page(client, owner, repo, pull_number, page)
+            for page in range(2, pages + 1)
+        ))
+        for page_files in rest:
+            files.extend(page_files)
+        return files
+
+    log_warn(AGENT, "changed_files count unknown — paging sequentially")
+    for page in range(2, MAX_FILE_PAGES + 1):
+        page_files = await _fetch_files_page(client, owner, repo, pull_number, page)
+        files.extend(page_files)
+        if len(page_files) < FILES_PER_PAGE:
+            break
+    return files
+
+
 # ============================================================================
 # NODES
 # ============================================================================
@@ -85,6 +162,7 @@ def git_read_init_node(state: GitReadAgentState) -> GitReadAgentState:
     state["pull_number"]     = 0
     state["changed_files"]   = []
     state["diffs"]           = []
+    state["skipped_files"]   = []
     state["has_valid_files"] = False
     state["client"]          = None
 
@@ -103,7 +181,7 @@ def git_read_init_node(state: GitReadAgentState) -> GitReadAgentState:
 
 # ─── NODE 2 — connect to GitHub MCP ──────────────────────────────────────────
 async def git_read_connect_mcp_node(state: GitReadAgentState) -> GitReadAgentState:
-    log_node_enter(AGENT, "CONNECT_MCP", "open FastMCP client to GitHub server")
+    log_node_enter(AGENT, "CONNECT_MCP", "get pooled FastMCP session to GitHub server")
 
     mcp_url = os.getenv("GITHUB_MCP_SERVER_URL")
     log_step(AGENT, f"GITHUB_MCP_SERVER_URL = {mcp_url or '(NOT SET!)'}")
@@ -114,10 +192,8 @@ async def git_read_connect_mcp_node(state: GitReadAgentState) -> GitReadAgentSta
         return state
 
     try:
-        client = Client(mcp_url)
-        await client.__aenter__()
-        state["client"] = client
-        log_ok(AGENT, "GitHub MCP client connected")
+        state["client"] = await mcp_sessions.get_client(mcp_url)
+        log_ok(AGENT, "GitHub MCP client connected (pooled session)")
     except Exception as e:
         log_error(AGENT, f"Connection failed: {e}")
 
@@ -136,30 +212,29 @@ async def git_fetch_pr_files_node(state: GitReadAgentState) -> GitReadAgentState
         log_node_exit(AGENT, "FETCH_PR_FILES")
         return state
 
-    response = await call_mcp_tool(client, "GITHUB_LIST_PULL_REQUESTS_FILES", {
-        "owner":       state["owner"],
-        "repo":        state["repo"],
-        "pull_number": state["pull_number"],
-    })
-
-    files = response.get("data", {}).get("details", [])
+    files = await fetch_all_pr_files(
+        client, state["owner"], state["repo"], state["pull_number"]
+    )
     log_step(AGENT, f"GitHub returned {len(files)} file(s)")
 
+    # Patch text lives in the run's artifact store; state carries its id
+    store = run_store()
     state["changed_files"] = []
     for f in files:
+        patch = f.get("patch") or ""
         entry = {
             "filename":  f["filename"],
             "status":    f["status"],
             "additions": f["additions"],
             "deletions": f["deletions"],
             "changes":   f["changes"],
-            "patch":     f.get("patch", ""),
+            "patch_id":  store.put(patch) if patch else None,
         }
         state["changed_files"].append(entry)
         log_step(AGENT, f"  {entry['status']:8s}  {entry['filename']}  "
                         f"+{entry['additions']}/-{entry['deletions']}")
 
-    log_ok(AGENT, f"Fetched {len(state['changed_files'])} changed file(s)")
+    log_ok(AGENT, f"Fetched {len(state['changed_files'])} changed file(s)  {store.stats()}")
     log_node_exit(AGENT, "FETCH_PR_FILES")
     return state
 
@@ -168,33 +243,34 @@ async def git_fetch_pr_files_node(state: GitReadAgentState) -> GitReadAgentState
 async def git_extract_diffs_node(state: GitReadAgentState) -> GitReadAgentState:
     log_node_enter(AGENT, "EXTRACT_DIFFS", "build structured diff list for LLM agent")
 
-    state["diffs"] = []
-    skipped = 0
-
-    for file in state["changed_files"]:
-        if not file.get("patch"):
-            log_warn(AGENT, f"  No patch for {file['filename']} ({file['status']}) — skipped")
-            skipped += 1
-            continue
+    # Lock files, generated code, vendored trees… never reach the LLM
+    reviewable, skipped    = review_filter.split(state["changed_files"])
+    state["skipped_files"] = skipped
+    state["diffs"]         = []
+    for s in skipped:
+        log_warn(AGENT, f"  Skipped {s['filename']}  — {s['reason']}")
 
+    for file in reviewable:
         filename = file["filename"]
-        ext      = filename.rsplit(".", 1)[-1] if "." in filename else "unknown"
-
-        state["diffs"].append({
+        patch    = patch_text(file)
+        diff     = {
             "filename":  filename,
             "status":    file["status"],
-            "language":  ext,
+            "language":  detect_language(filename, patch),
             "additions": file["additions"],
             "deletions": file["deletions"],
-            "patch":     file["patch"],
-        })
-        log_step(AGENT, f"  Structured: {filename}  [{ext}]  patch_len={len(file['patch'])}")
+            "patch_id":  file["patch_id"],
+        }
+        parsed = diff_hunks(diff)    # parsed once per run, cached in the artifact store
+        state["diffs"].append(diff)
+        log_step(AGENT, f"  Structured: {filename}  [{diff['language']}]  patch_len={len(patch)}  "
+                        f"hunks={len(parsed.hunks)}")
 
     state["has_valid_files"] = len(state["diffs"]) > 0
 
     log_diff_table(AGENT, state["diffs"])
     if skipped:
-        log_warn(AGENT, f"{skipped} file(s) skipped (no patch)")
+        log_warn(AGENT, f"{len(skipped)} file(s) skipped by the reviewability filter")
 
     log_ok(AGENT, f"has_valid_files={state['has_valid_files']}  —  {len(state['diffs'])} diff(s) ready for LLM")
     log_node_exit(AGENT, "EXTRACT_DIFFS")
@@ -206,7 +282,7 @@ async def git_extract_diffs_node(state: GitReadAgentState) -> GitReadAgentState:
 # ============================================================================
 
 def graph_Builder():
-    graph = StateGraph(GitReadAgentState)
+    graph = TimedStateGraph(GitReadAgentState, AGENT)
 
     graph.add_node("GIT_READ_INIT",   git_read_init_node)        # sync
     graph.add_node("CONNECT_MCP",     git_read_connect_mcp_node) # async
@@ -219,7 +295,8 @@ def graph_Builder():
     graph.add_edge("FETCH_PR_FILES",  "EXTRACT_DIFFS")
     graph.add_edge("EXTRACT_DIFFS",   END)
 
-    compiled = graph.compile()
+    # Runs inside an orchestrator node: never inherit its checkpointer (state holds a live MCP client)
+    compiled = graph.compile(checkpointer=False)
     save_graph_as_png(compiled, __file__)
     return compiled
 
@@ -233,7 +310,10 @@ git_read_graph = graph_Builder()
 
 async def main():
     data = {"pr_details": "https://github.com/promptlyaig/issue-tracker/pull/1"}
-    result = await git_read_graph.ainvoke(data)
+    try:
+        result = await git_read_graph.ainvoke(data)
+    finally:
+        await mcp_sessions.close_all()
     print(f"\ndiffs={len(result['diffs'])}  has_valid_files={result['has_valid_files']}")
 
 if __name__ == "__main__":
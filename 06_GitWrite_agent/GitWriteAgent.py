@@ -1,10 +1,11 @@
 import os
-import json
 import asyncio
-from typing import TypedDict, Optional, List, Dict, Any
-from langgraph.graph import StateGraph, START, END
-from fastmcp import Client
-from lg_utility import save_graph_as_png
+import operator
+from typing import TypedDict, Optional, List, Dict, Any, Annotated
+from langgraph.graph import START, END
+from mcp_session_manager import mcp_sessions
+from git_batch_writer import supports_batched_commit, upload_blobs, write_artifacts
+from lg_utility import save_graph_as_png, TimedStateGraph
 from debug_utils import (
     log_node_enter, log_node_exit, log_step, log_ok, log_warn,
     log_error, log_state
@@ -12,6 +13,13 @@ from debug_utils import (
 
 AGENT = "GIT-WRITE"
 
+# Write tasks the sub-graph can fan out to. Only POST_COMMENTS needs the Jira
+# tickets, so the orchestrator runs the other two alongside the Jira agent.
+WRITE_TASKS = ["POST_COMMENTS", "COMMIT_TESTS", "TAG_PR"]
+
+# State keys holding the artifact each task builds (see git_batch_writer)
+ARTIFACT_KEYS = ["review_artifact", "tests_artifact", "tags_artifact"]
+
 # ============================================================================
 # STATE  — only what the write agent needs
 # ============================================================================
@@ -25,29 +33,27 @@ class GitWriteAgentState(TypedDict):
     bugs:                Optional[List[Dict[str, Any]]]
     test_suggetions:     Optional[Dict[str, Any]]    # {test_framework, test_cases}
     jira_ticket_details: Optional[List[Dict[str, Any]]]
+    write_tasks:         Optional[List[str]]         # subset of WRITE_TASKS (None: all, []: none)
+    staged_files:        Optional[List[Dict[str, Any]]]  # artifacts staged by an earlier invocation
+    defer_commit:        Optional[bool]              # True → build + upload blobs only, no commit
 
-    # ── outputs ───────────────────────────────────────────────────────────────
-    comment_posted:      bool
-    tests_committed:     bool
-    pr_tagged:           bool
+    # ── outputs — OR-reduced so parallel write branches can each report ──────
+    comment_posted:      Annotated[bool, operator.or_]
+    tests_committed:     Annotated[bool, operator.or_]
+    pr_tagged:           Annotated[bool, operator.or_]
+    pending_files:       List[Dict[str, Any]]        # staged artifacts when defer_commit
 
     # ── internal ──────────────────────────────────────────────────────────────
     client:              Optional[Any]
+    review_artifact:     Optional[Dict[str, Any]]    # one per task branch
+    tests_artifact:      Optional[Dict[str, Any]]
+    tags_artifact:       Optional[Dict[str, Any]]
 
 
 # ============================================================================
 # HELPERS
 # ============================================================================
 
-async def call_mcp_tool(client, tool_name: str, arguments: dict) -> str:
-    """Call a GitHub MCP tool and return raw response text."""
-    log_step(AGENT, f"MCP call: {tool_name}")
-    result       = await client.call_tool(tool_name, arguments)
-    content_text = result.content[0].text
-    log_step(AGENT, f"MCP response: {content_text[:200]}")
-    return content_text
-
-
 def _build_pr_comment(review: dict, jira_tickets: list) -> str:
     """Format LLM review + Jira links into a GitHub markdown comment."""
     lines = ["## 🤖 Automated PR Review\n"]
@@ -138,7 +144,14 @@ async def git_write_init_node(state: GitWriteAgentState) -> GitWriteAgentState:
     state["tests_committed"] = False
     state["pr_tagged"]       = False
     state["client"]          = None
-
+    state["pending_files"]   = []
+    for key in ARTIFACT_KEYS:
+        state[key] = None
+    # None → every task; an explicit [] → none (commit staged_files only)
+    tasks                    = state.get("write_tasks")
+    state["write_tasks"]     = WRITE_TASKS if tasks is None else [t for t in tasks if t in WRITE_TASKS]
+
+    log_step(AGENT, f"Tasks        : {state['write_tasks']}")
     log_step(AGENT, f"Target       : github.com/{state.get('owner')}/{state.get('repo')}  PR#{state.get('pull_number')}")
     log_step(AGENT, f"Bugs         : {len(state.get('bugs') or [])}")
     log_step(AGENT, f"Jira tickets : {len(state.get('jira_ticket_details') or [])}")
@@ -151,7 +164,7 @@ async def git_write_init_node(state: GitWriteAgentState) -> GitWriteAgentState:
 
 # ─── NODE 2 — connect to GitHub MCP ──────────────────────────────────────────
 async def git_write_connect_mcp_node(state: GitWriteAgentState) -> GitWriteAgentState:
-    log_node_enter(AGENT, "CONNECT_MCP", "open FastMCP client to GitHub server")
+    log_node_enter(AGENT, "CONNECT_MCP", "get pooled FastMCP session to GitHub server")
 
     mcp_url = os.getenv("GITHUB_MCP_SERVER_URL")
     log_step(AGENT, f"GITHUB_MCP_SERVER_URL = {mcp_url or '(NOT SET!)'}")
@@ -162,10 +175,8 @@ async def git_write_connect_mcp_node(state: GitWriteAgentState) -> GitWriteAgent
         return state
 
     try:
-        client = Client(mcp_url)
-        await client.__aenter__()
-        state["client"] = client
-        log_ok(AGENT, "GitHub MCP client connected")
+        state["client"] = await mcp_sessions.get_client(mcp_url)
+        log_ok(AGENT, "GitHub MCP client connected (pooled session)")
     except Exception as e:
         log_error(AGENT, f"Connection failed: {e}")
 
@@ -173,15 +184,26 @@ async def git_write_connect_mcp_node(state: GitWriteAgentState) -> GitWriteAgent
     return state
 
 
-# ─── NODE 3 — post review comment ────────────────────────────────────────────
-async def git_post_comment_node(state: GitWriteAgentState) -> GitWriteAgentState:
-    log_node_enter(AGENT, "POST_COMMENTS", "post formatted review comment to GitHub PR")
+# ─── ROUTER — after CONNECT_MCP ──────────────────────────────────────────────
+def route_write_tasks(state: GitWriteAgentState) -> List[str]:
+    """Fan out to every requested write task in parallel, or straight to the commit."""
+    if not state.get("client"):
+        log_warn(AGENT, "Router: no MCP client — routing to WRITE_SUMMARY")
+        return ["WRITE_SUMMARY"]
+    tasks = state.get("write_tasks") or []
+    if not tasks:
+        log_step(AGENT, "Router: no write tasks — routing to COMMIT_ARTIFACTS")
+        return ["COMMIT_ARTIFACTS"]
+    log_step(AGENT, f"Router: fan-out → {tasks}")
+    return tasks
 
-    client = state.get("client")
-    if not client:
-        log_warn(AGENT, "No MCP client — skipping")
-        log_node_exit(AGENT, "POST_COMMENTS")
-        return state
+
+# Task nodes run as parallel branches: each builds one artifact and returns
+# only the state key it owns. COMMIT_ARTIFACTS writes them all in one commit.
+
+# ─── NODE 3 — build review comment ───────────────────────────────────────────
+async def git_post_comment_node(state: GitWriteAgentState) -> Dict[str, Any]:
+    log_node_enter(AGENT, "POST_COMMENTS", "build formatted review comment for the PR")
 
     review  = state.get("review_comments") or {}
     tickets = state.get("jira_ticket_details") or []
@@ -189,7 +211,7 @@ async def git_post_comment_node(state: GitWriteAgentState) -> GitWriteAgentState
     if not review:
         log_warn(AGENT, "review_comments is empty — nothing to post")
         log_node_exit(AGENT, "POST_COMMENTS")
-        return state
+        return {}
 
     comment_body = _build_pr_comment(review, tickets)
     log_step(AGENT, f"Comment body: {len(comment_body)} chars")
@@ -198,33 +220,20 @@ async def git_post_comment_node(state: GitWriteAgentState) -> GitWriteAgentState
     # GITHUB_ADD_PULL_REQUEST_REVIEW_COMMENT is not in this MCP tool set.
     # Writing the review as a markdown file committed to the repo instead.
     review_file = f".bot-reviews/pr_{state['pull_number']}_review.md"
-    log_step(AGENT, f"Writing review to: {review_file}")
-    try:
-        await call_mcp_tool(client, "GITHUB_CREATE_OR_UPDATE_FILE_CONTENTS", {
-            "owner":   state["owner"],
-            "repo":    state["repo"],
-            "path":    review_file,
-            "message": f"bot: add automated review for PR #{state['pull_number']}",
-            "content": comment_body,
-        })
-        state["comment_posted"] = True
-        log_ok(AGENT, f"Review written to {review_file}")
-    except Exception as e:
-        log_error(AGENT, f"Failed to write review file: {e}")
+    log_step(AGENT, f"Staging review at: {review_file}")
 
     log_node_exit(AGENT, "POST_COMMENTS")
-    return state
+    return {"review_artifact": {
+        "path":    review_file,
+        "content": comment_body,
+        "message": f"bot: add automated review for PR #{state['pull_number']}",
+        "flag":    "comment_posted",
+    }}
 
 
-# ─── NODE 4 — commit test file ───────────────────────────────────────────────
-async def git_commit_tests_node(state: GitWriteAgentState) -> GitWriteAgentState:
-    log_node_enter(AGENT, "COMMIT_TESTS", "commit auto-generated test file to PR branch")
-
-    client = state.get("client")
-    if not client:
-        log_warn(AGENT, "No MCP client — skipping")
-        log_node_exit(AGENT, "COMMIT_TESTS")
-        return state
+# ─── NODE 4 — build test file ────────────────────────────────────────────────
+async def git_commit_tests_node(state: GitWriteAgentState) -> Dict[str, Any]:
+    log_node_enter(AGENT, "COMMIT_TESTS", "build auto-generated test file for the PR branch")
 
     tests      = state.get("test_suggetions") or {}
     test_cases = tests.get("test_cases", []) if isinstance(tests, dict) else []
@@ -232,7 +241,7 @@ async def git_commit_tests_node(state: GitWriteAgentState) -> GitWriteAgentState
     if not test_cases:
         log_warn(AGENT, "No test cases — skipping commit")
         log_node_exit(AGENT, "COMMIT_TESTS")
-        return state
+        return {}
 
     file_content = _build_test_file(tests)
     file_path    = f"tests/test_pr_{state['pull_number']}_autobot.py"
@@ -245,32 +254,18 @@ async def git_commit_tests_node(state: GitWriteAgentState) -> GitWriteAgentState
     for i, tc in enumerate(test_cases, 1):
         log_step(AGENT, f"  Test {i}: {tc.get('test_name', '?')} — {tc.get('description', '')[:60]}")
 
-    try:
-        await call_mcp_tool(client, "GITHUB_CREATE_OR_UPDATE_FILE_CONTENTS", {
-            "owner":   state["owner"],
-            "repo":    state["repo"],
-            "path":    file_path,
-            "message": commit_msg,
-            "content": file_content,
-        })
-        state["tests_committed"] = True
-        log_ok(AGENT, f"Test file committed: {file_path}")
-    except Exception as e:
-        log_error(AGENT, f"Failed to commit tests: {e}")
-
     log_node_exit(AGENT, "COMMIT_TESTS")
-    return state
+    return {"tests_artifact": {
+        "path":    file_path,
+        "content": file_content,
+        "message": commit_msg,
+        "flag":    "tests_committed",
+    }}
 
 
 # ─── NODE 5 — tag PR with labels ─────────────────────────────────────────────
-async def git_tag_pr_node(state: GitWriteAgentState) -> GitWriteAgentState:
-    log_node_enter(AGENT, "TAG_PR", "apply severity label + bot-reviewed to PR")
-
-    client = state.get("client")
-    if not client:
-        log_warn(AGENT, "No MCP client — skipping")
-        log_node_exit(AGENT, "TAG_PR")
-        return state
+async def git_tag_pr_node(state: GitWriteAgentState) -> Dict[str, Any]:
+    log_node_enter(AGENT, "TAG_PR", "build severity label + bot-reviewed tags for the PR")
 
     bugs       = state.get("bugs") or []
     severities = [b.get("severity", "low").lower() for b in bugs]
@@ -290,32 +285,81 @@ async def git_tag_pr_node(state: GitWriteAgentState) -> GitWriteAgentState:
     # Writing a tag summary file to the repo instead.
     tag_file = f".bot-reviews/pr_{state['pull_number']}_tags.md"
     tag_content = f"# Bot Review Tags\n\nPR #{state['pull_number']}\n\nLabels:\n" + "\n".join(f"- {l}" for l in labels)
-    log_step(AGENT, f"Writing tag summary to: {tag_file}")
-    try:
-        await call_mcp_tool(client, "GITHUB_CREATE_OR_UPDATE_FILE_CONTENTS", {
-            "owner":   state["owner"],
-            "repo":    state["repo"],
-            "path":    tag_file,
-            "message": f"bot: tag PR #{state['pull_number']} as {severity_label}",
-            "content": tag_content,
-        })
-        state["pr_tagged"] = True
-        log_ok(AGENT, f"Tag summary written to {tag_file}")
-    except Exception as e:
-        log_error(AGENT, f"Failed to write tag file: {e}")
+    log_step(AGENT, f"Staging tag summary at: {tag_file}")
+
+    log_node_exit(AGENT, "TAG_PR")
+    return {"tags_artifact": {
+        "path":    tag_file,
+        "content": tag_content,
+        "message": f"bot: tag PR #{state['pull_number']} as {severity_label}",
+        "flag":    "pr_tagged",
+    }}
+
+
+# ─── NODE 6 — join: write every staged artifact in one commit ────────────────
+async def git_commit_artifacts_node(state: GitWriteAgentState) -> Dict[str, Any]:
+    log_node_enter(AGENT, "COMMIT_ARTIFACTS", "single batched commit of all bot artifacts")
+
+    client    = state.get("client")
+    artifacts = list(state.get("staged_files") or []) + \
+                [state[k] for k in ARTIFACT_KEYS if state.get(k)]
+    # One blob per path — the artifact staged last wins
+    by_path = {}
+    for a in artifacts:
+        if a["path"] in by_path:
+            log_warn(AGENT, f"Duplicate artifact for {a['path']} — keeping the later one")
+        by_path[a["path"]] = a
+    artifacts = list(by_path.values())
+    log_step(AGENT, f"Artifacts: {[a['path'] for a in artifacts]}")
+
+    if not client or not artifacts:
+        log_warn(AGENT, "Nothing to commit" if client else "No MCP client — skipping")
+        log_node_exit(AGENT, "COMMIT_ARTIFACTS")
+        return {"pending_files": []}
+
+    # Deferred: upload blobs now (overlapping other work), commit in a later invocation
+    if state.get("defer_commit"):
+        if await supports_batched_commit(client):
+            try:
+                artifacts = await upload_blobs(client, state["owner"], state["repo"], artifacts)
+            except Exception as e:
+                log_warn(AGENT, f"Early blob upload failed ({e}) — will retry at commit")
+        log_ok(AGENT, f"{len(artifacts)} artifact(s) staged for a later commit")
+        log_node_exit(AGENT, "COMMIT_ARTIFACTS")
+        return {"pending_files": artifacts}
+
+    message = f"bot: automated review artifacts for PR #{state['pull_number']}\n\n" + \
+              "\n".join(f"- {a['message']}" for a in artifacts)
+    results = await write_artifacts(client, state["owner"], state["repo"],
+                                    state["pull_number"], artifacts, message)
+
+    flags = {}
+    for artifact, ok in zip(artifacts, results):
+        if ok:
+            flags[artifact["flag"]] = True
+    log_ok(AGENT, f"{sum(results)}/{len(artifacts)} artifact(s) written")
+
+    log_node_exit(AGENT, "COMMIT_ARTIFACTS")
+    return {**flags, "pending_files": []}
+
+
+# ─── NODE 7 — summary ────────────────────────────────────────────────────────
+async def git_write_summary_node(state: GitWriteAgentState) -> Dict[str, Any]:
+    log_node_enter(AGENT, "WRITE_SUMMARY", "log write outcome")
 
-    # ── final summary ─────────────────────────────────────────────────────────
     log_state(AGENT, {
         "owner":           state.get("owner"),
         "repo":            state.get("repo"),
         "PR#":             state.get("pull_number"),
+        "tasks":           state.get("write_tasks"),
+        "deferred":        bool(state.get("defer_commit")),
         "comment_posted":  state["comment_posted"],
         "tests_committed": state["tests_committed"],
         "pr_tagged":       state["pr_tagged"],
     }, label="GIT-WRITE final summary")
 
-    log_node_exit(AGENT, "TAG_PR")
-    return state
+    log_node_exit(AGENT, "WRITE_SUMMARY")
+    return {}
 
 
 # ============================================================================
@@ -323,22 +367,35 @@ async def git_tag_pr_node(state: GitWriteAgentState) -> GitWriteAgentState:
 # ============================================================================
 
 def graph_Builder():
-    graph = StateGraph(GitWriteAgentState)
+    graph = TimedStateGraph(GitWriteAgentState, AGENT)
 
     graph.add_node("GIT_WRITE_INIT", git_write_init_node)        # async
     graph.add_node("CONNECT_MCP",    git_write_connect_mcp_node) # async
     graph.add_node("POST_COMMENTS",  git_post_comment_node)      # async
     graph.add_node("COMMIT_TESTS",   git_commit_tests_node)      # async
     graph.add_node("TAG_PR",         git_tag_pr_node)            # async
+    graph.add_node("COMMIT_ARTIFACTS", git_commit_artifacts_node) # async
+    graph.add_node("WRITE_SUMMARY",  git_write_summary_node)     # async
 
     graph.add_edge(START,            "GIT_WRITE_INIT")
     graph.add_edge("GIT_WRITE_INIT", "CONNECT_MCP")
-    graph.add_edge("CONNECT_MCP",    "POST_COMMENTS")
-    graph.add_edge("POST_COMMENTS",  "COMMIT_TESTS")
-    graph.add_edge("COMMIT_TESTS",   "TAG_PR")
-    graph.add_edge("TAG_PR",         END)
 
-    compiled = graph.compile()
+    # Fan-out: the requested write tasks build their artifacts in parallel
+    graph.add_conditional_edges(
+        "CONNECT_MCP",
+        route_write_tasks,
+        WRITE_TASKS + ["COMMIT_ARTIFACTS", "WRITE_SUMMARY"],
+    )
+
+    # Fan-in: one batched commit for everything staged
+    graph.add_edge("POST_COMMENTS",  "COMMIT_ARTIFACTS")
+    graph.add_edge("COMMIT_TESTS",   "COMMIT_ARTIFACTS")
+    graph.add_edge("TAG_PR",         "COMMIT_ARTIFACTS")
+    graph.add_edge("COMMIT_ARTIFACTS", "WRITE_SUMMARY")
+    graph.add_edge("WRITE_SUMMARY",  END)
+
+    # Runs inside an orchestrator node: never inherit its checkpointer (state holds a live MCP client)
+    compiled = graph.compile(checkpointer=False)
     save_graph_as_png(compiled, __file__)
     return compiled
 
@@ -377,7 +434,10 @@ async def _test():
                                "ticket_url": "https://promptlyai.atlassian.net/browse/PROM-321",
                                "severity": "medium", "bug_type": "pagination_error"}],
     )
-    result = await git_Write_graph.ainvoke(test_state)
+    try:
+        result = await git_Write_graph.ainvoke(test_state)
+    finally:
+        await mcp_sessions.close_all()
     print(f"\ncomment_posted={result['comment_posted']}  "
           f"tests_committed={result['tests_committed']}  "
           f"pr_tagged={result['pr_tagged']}")
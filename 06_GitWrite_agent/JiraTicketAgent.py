@@ -1,10 +1,13 @@
 import os
 import re
+import time
 import asyncio
-from typing import TypedDict, Optional, List, Dict, Any
-from langgraph.graph import StateGraph, START, END
-from fastmcp import Client
-from lg_utility import save_graph_as_png
+from typing import TypedDict, Optional, List, Dict, Any, Tuple
+from langgraph.graph import START, END
+from mcp_session_manager import mcp_sessions
+from bug_index import BugFingerprint, bug_index
+from lg_utility import save_graph_as_png, TimedStateGraph
+from mcp_resilience import call_tool
 from jira_utilities import (
     build_jira_ticket_summary,
     build_jira_ticket_description,
@@ -17,6 +20,9 @@ from debug_utils import (
 
 AGENT = "JIRA"
 
+# Max CREATE_ISSUE calls in flight at once
+JIRA_MAX_CONCURRENCY = int(os.getenv("JIRA_MAX_CONCURRENCY", "5"))
+
 # ============================================================================
 # STATE
 # ============================================================================
@@ -29,7 +35,7 @@ class JiraAgentState(TypedDict):
     bugs:        List[Dict[str, Any]]   # bug dicts from LLM agent
 
     # ── outputs ───────────────────────────────────────────────────────────────
-    tickets_created: Optional[List[Dict[str, Any]]]  # created ticket details
+    tickets_created: Optional[List[Dict[str, Any]]]  # created or reused (reused=True) tickets
 
     # ── internal ──────────────────────────────────────────────────────────────
     jira_client: Optional[Any]
@@ -63,16 +69,14 @@ async def jira_init_agent_node(state: JiraAgentState) -> JiraAgentState:
 
 # ─── NODE 2 — connect MCP ────────────────────────────────────────────────────
 async def jira_connect_mcp_node(state: JiraAgentState) -> JiraAgentState:
-    log_node_enter(AGENT, "CONNECT_MCP", "open FastMCP client to Jira server")
+    log_node_enter(AGENT, "CONNECT_MCP", "get pooled FastMCP session to Jira server")
 
     jira_url = os.getenv("JIRA_MCP_SERVER_URL", "http://127.0.0.1:3333/mcp")
     log_step(AGENT, f"JIRA_MCP_SERVER_URL = {jira_url}")
 
     try:
-        client = Client(jira_url)
-        await client.__aenter__()
-        state["jira_client"] = client
-        log_ok(AGENT, "Jira MCP client connected successfully")
+        state["jira_client"] = await mcp_sessions.get_client(jira_url)
+        log_ok(AGENT, "Jira MCP client connected successfully (pooled session)")
     except Exception as e:
         log_error(AGENT, f"Failed to connect to Jira MCP: {e}")
         state["jira_client"] = None
@@ -95,77 +99,224 @@ def should_create_tickets(state: JiraAgentState) -> str:
 
 
 # ─── NODE 3 — create tickets ─────────────────────────────────────────────────
-async def jira_create_tickets_node(state: JiraAgentState) -> JiraAgentState:
-    log_node_enter(AGENT, "CREATE_TICKETS", "post one Jira ticket per bug via MCP")
-
-    client      = state["jira_client"]
-    bugs        = state.get("bugs", [])
-    project_key = os.getenv("JIRA_PROJECT_KEY", "PROM")
-    base_url    = os.getenv("JIRA_BASE_URL", "https://promptlyai.atlassian.net")
+def jira_project_key() -> str:
+    return os.getenv("JIRA_PROJECT_KEY", "PROM")
 
-    log_step(AGENT, f"Jira project : {project_key}")
-    log_step(AGENT, f"Jira base URL: {base_url}")
-    log_step(AGENT, f"Bugs to process: {len(bugs)}")
 
-    state["tickets_created"] = []
+def _ticket_record(bug: Dict[str, Any], ticket_key: str, ticket_url: str,
+                   reused: bool) -> Dict[str, Any]:
+    return {
+        "bug_type":   bug.get("type", "unknown"),
+        "location":   bug.get("location", ""),
+        "ticket_key": ticket_key,
+        "ticket_url": ticket_url,
+        "severity":   bug.get("severity", "medium"),
+        "reused":     reused,
+    }
 
-    for i, bug in enumerate(bugs, 1):
-        btype = bug.get('type', 'unknown')
-        sev   = bug.get('severity', 'medium')
-        log_step(AGENT, f"  [{i}/{len(bugs)}] Creating ticket — type={btype}  severity={sev}")
 
-        summary     = build_jira_ticket_summary(bug)
-        description = build_jira_ticket_description(
-            bug, state["owner"], state["repo"], state["pull_number"]
-        )
-        priority    = get_jira_priority(sev)
+async def _create_ticket(client, semaphore: asyncio.Semaphore, label: str,
+                         bug: Dict[str, Any], owner: str, repo: str, pull_number: int,
+                         project_key: str, base_url: str) -> Optional[Dict[str, Any]]:
+    """Create one Jira ticket for one bug. Returns the ticket record, or None on failure."""
+    btype = bug.get('type', 'unknown')
+    sev   = bug.get('severity', 'medium')
 
-        log_step(AGENT, f"    summary  : {summary[:80]}")
-        log_step(AGENT, f"    priority : {priority}")
-
-        params = {
+    try:
+        summary  = build_jira_ticket_summary(bug)
+        priority = get_jira_priority(sev)
+        params   = {
             "project_key": project_key,
             "summary":     summary,
-            "description": description,
+            "description": build_jira_ticket_description(bug, owner, repo, pull_number),
             "issuetype":   "Bug",
             "priority":    priority,
         }
+    except Exception as e:
+        log_error(AGENT, f"  {label} Malformed bug {btype!r} — no ticket: {e}")
+        return None
 
+    async with semaphore:
+        log_step(AGENT, f"  {label} Creating ticket — type={btype}  severity={sev}  "
+                        f"priority={priority}  summary={summary[:60]}")
+        start = time.perf_counter()
         try:
-            result        = await client.call_tool("CREATE_ISSUE", params)
+            result        = await call_tool(client, "CREATE_ISSUE", params)
             response_text = result.content[0].text
-            log_step(AGENT, f"    Raw MCP response: {response_text[:200]}")
-
-            ticket_match = re.search(r'([A-Z]+-\d+)', response_text)
-            if ticket_match:
-                ticket_key = ticket_match.group(1)
-                ticket_url = f"{base_url}/browse/{ticket_key}"
-                state["tickets_created"].append({
-                    "bug_type":   btype,
-                    "ticket_key": ticket_key,
-                    "ticket_url": ticket_url,
-                    "severity":   sev,
-                })
-                log_ok(AGENT, f"    Ticket created: {ticket_key}  →  {ticket_url}")
-            else:
-                log_warn(AGENT, f"    No ticket key found in response — skipping bug {i}")
-
         except Exception as e:
-            log_error(AGENT, f"    MCP call failed for bug {i}: {e}")
+            log_error(AGENT, f"  {label} MCP call failed after "
+                             f"{(time.perf_counter() - start) * 1000:.0f}ms: {e}")
+            return None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    log_step(AGENT, f"  {label} Raw MCP response: {response_text[:200]}")
+
+    ticket_match = re.search(r'([A-Z]+-\d+)', response_text)
+    if not ticket_match:
+        log_warn(AGENT, f"  {label} No ticket key found in response — skipping bug")
+        return None
+
+    ticket_key = ticket_match.group(1)
+    ticket_url = f"{base_url}/browse/{ticket_key}"
+    log_ok(AGENT, f"  {label} Ticket created: {ticket_key}  →  {ticket_url}  ({elapsed_ms:.0f}ms)")
+    return _ticket_record(bug, ticket_key, ticket_url, reused=False)
+
+
+class TicketBatch:
+    """
+    Dedupe + concurrent CREATE_ISSUE for one PR's bugs, whether they arrive
+    all at once (CREATE_TICKETS node) or one by one while the LLM is still
+    streaming (submit as they come, then await results()).
+
+    batch = TicketBatch(client, owner, repo, pull_number, history=history)
+    batch.submit(bug)                 # returns immediately; lookup + creation run in the background
+    tickets = await batch.results()   # one record per resolved bug, in submit order
+
+    Whether a bug is already ticketed is decided by bug_index.find (the PR's
+    review history, then the duplicate index).
+    """
+
+    def __init__(self, client, owner: str, repo: str, pull_number: int,
+                 project_key: Optional[str] = None, base_url: Optional[str] = None,
+                 max_concurrency: int = JIRA_MAX_CONCURRENCY, expected: Optional[int] = None,
+                 history: Optional[Dict[str, Any]] = None):
+        self.client      = client
+        self.expected    = expected    # bug count, when known up front (log labels only)
+        self.history     = history     # review history (bug_index fast path)
+        self.owner       = owner
+        self.repo        = repo
+        self.pull_number = pull_number
+        self.project_key = project_key or jira_project_key()
+        self.base_url    = base_url or os.getenv("JIRA_BASE_URL", "https://promptlyai.atlassian.net")
+
+        self._semaphore    = asyncio.Semaphore(max_concurrency)
+        self._bugs:         List[Dict[str, Any]]          = []
+        self._fingerprints: List[BugFingerprint]          = []
+        self._results:      List[Optional[Dict[str, Any]]] = []
+        self._tasks:        Dict[int, asyncio.Task]        = {}   # bug index → lookup/create task
+        self._followers:    Dict[int, int]                 = {}   # bug index → leader index
+
+        self.started_at      = time.perf_counter()
+        self.first_ticket_ms: Optional[float] = None
+
+    def submit(self, bug: Dict[str, Any]):
+        """Follow an in-batch duplicate, or start resolving bug (known ticket or CREATE_ISSUE)."""
+        i  = len(self._bugs)
+        fp = BugFingerprint(bug)
+        self._bugs.append(bug)
+        self._fingerprints.append(fp)
+        self._results.append(None)
+
+        leader = next((j for j in self._tasks
+                       if self._fingerprints[j].matches(fp, bug_index.threshold)), None)
+        if leader is not None:
+            self._followers[i] = leader
+            return
+
+        self._tasks[i] = asyncio.create_task(self._resolve(i, bug))
+
+    def _label(self, i: int) -> str:
+        return f"[{i + 1}/{self.expected}]" if self.expected else f"[{i + 1}]"
+
+    async def _resolve(self, i: int, bug: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        hit = await bug_index.find(self.project_key, bug, self._fingerprints[i], self.history)
+        if hit:
+            log_ok(AGENT, f"  {self._label(i)} Reusing {hit['ticket_key']} — no CREATE_ISSUE")
+            self._mark_first_ticket()
+            return _ticket_record(bug, hit["ticket_key"], hit["ticket_url"], reused=True)
+
+        ticket = await _create_ticket(
+            self.client, self._semaphore, self._label(i), bug,
+            self.owner, self.repo, self.pull_number, self.project_key, self.base_url,
+        )
+        if ticket:
+            await bug_index.remember(self.project_key, self._fingerprints[i], ticket)
+            self._mark_first_ticket()
+        return ticket
+
+    def _mark_first_ticket(self):
+        if self.first_ticket_ms is None:
+            self.first_ticket_ms = (time.perf_counter() - self.started_at) * 1000
+
+    async def results(self) -> List[Dict[str, Any]]:
+        """Wait for every in-flight creation; tickets in submit order, failures left out."""
+        indices = list(self._tasks)
+        created = await asyncio.gather(*(self._tasks[i] for i in indices), return_exceptions=True)
+        for i, ticket in zip(indices, created):
+            if isinstance(ticket, BaseException):
+                log_error(AGENT, f"  {self._label(i)} Ticket creation failed: {ticket!r}")
+                ticket = None
+            self._results[i] = ticket
+        for i, leader in self._followers.items():
+            if self._results[leader]:
+                self._results[i] = _ticket_record(self._bugs[i], self._results[leader]["ticket_key"],
+                                                  self._results[leader]["ticket_url"], reused=True)
+        indexed = sum(1 for i in indices if self._results[i] and self._results[i]["reused"])
+        log_step(AGENT, f"Dedupe: {indexed} already ticketed, {len(self._followers)} in-batch "
+                        f"duplicate(s), {len(indices) - indexed} sent to CREATE_ISSUE")
+        return [t for t in self._results if t]
+
+
+async def known_bug_tickets(bugs: List[Dict[str, Any]], history: Optional[Dict[str, Any]] = None,
+                            project_key: Optional[str] = None) -> Tuple[List[Dict[str, Any]],
+                                                                        List[Dict[str, Any]]]:
+    """Split bugs into (ticket records already filed for them, bugs still needing one)."""
+    project_key = project_key or jira_project_key()
+    hits        = await asyncio.gather(*(bug_index.find(project_key, b, history=history) for b in bugs))
+    tickets, remaining = [], []
+    for bug, hit in zip(bugs, hits):
+        if hit:
+            tickets.append(_ticket_record(bug, hit["ticket_key"], hit["ticket_url"], reused=True))
+        else:
+            remaining.append(bug)
+    return tickets, remaining
+
+
+async def open_ticket_batch(owner: str, repo: str, pull_number: int,
+                            history: Optional[Dict[str, Any]] = None) -> Optional[TicketBatch]:
+    """TicketBatch on the pooled Jira MCP session, or None if Jira is unreachable."""
+    jira_url = os.getenv("JIRA_MCP_SERVER_URL", "http://127.0.0.1:3333/mcp")
+    try:
+        client = await mcp_sessions.get_client(jira_url)
+    except Exception as e:
+        log_error(AGENT, f"Failed to connect to Jira MCP: {e}")
+        return None
+    return TicketBatch(client, owner, repo, pull_number, history=history)
+
+
+async def jira_create_tickets_node(state: JiraAgentState) -> JiraAgentState:
+    log_node_enter(AGENT, "CREATE_TICKETS", "post one Jira ticket per bug via MCP (concurrent)")
+
+    bugs  = state.get("bugs", [])
+    batch = TicketBatch(state["jira_client"], state["owner"], state["repo"], state["pull_number"],
+                        expected=len(bugs))
+
+    log_step(AGENT, f"Jira project : {batch.project_key}")
+    log_step(AGENT, f"Jira base URL: {batch.base_url}")
+    log_step(AGENT, f"Bugs to process: {len(bugs)}  (max {JIRA_MAX_CONCURRENCY} in flight)")
+
+    for bug in bugs:
+        batch.submit(bug)
+    state["tickets_created"] = await batch.results()
+    elapsed_ms = (time.perf_counter() - batch.started_at) * 1000
 
     # ── summary ──────────────────────────────────────────────────────────────
     created = state["tickets_created"]
-    log_ok(AGENT, f"{len(created)}/{len(bugs)} ticket(s) created successfully")
+    reused  = sum(1 for t in created if t["reused"])
+    log_ok(AGENT, f"{len(created)}/{len(bugs)} ticket(s) resolved in {elapsed_ms:.0f}ms  "
+                  f"(created={len(created) - reused}  reused={reused})")
 
     if created:
         log_step(AGENT, "Ticket summary:")
         for t in created:
-            log_step(AGENT, f"  {t['ticket_key']}  [{t['severity'].upper()}]  {t['bug_type']}")
+            tag = "  (reused)" if t["reused"] else ""
+            log_step(AGENT, f"  {t['ticket_key']}  [{t['severity'].upper()}]  {t['bug_type']}{tag}")
             log_step(AGENT, f"    {t['ticket_url']}")
 
     log_state(AGENT, {
         "bugs_in":         len(bugs),
-        "tickets_created": len(created),
+        "tickets_created": len(created) - reused,
+        "tickets_reused":  reused,
         "ticket_keys":     [t["ticket_key"] for t in created],
     }, label="JIRA final state")
 
@@ -178,7 +329,7 @@ async def jira_create_tickets_node(state: JiraAgentState) -> JiraAgentState:
 # ============================================================================
 
 def graph_Builder():
-    jira_graph = StateGraph(JiraAgentState)
+    jira_graph = TimedStateGraph(JiraAgentState, AGENT)
 
     jira_graph.add_node("JIRA_INIT",       jira_init_agent_node)
     jira_graph.add_node("CONNECT_MCP",     jira_connect_mcp_node)
@@ -199,7 +350,8 @@ def graph_Builder():
 
     jira_graph.add_edge("CREATE_TICKETS", END)
 
-    graph = jira_graph.compile()
+    # Runs inside an orchestrator node: never inherit its checkpointer (state holds a live MCP client)
+    graph = jira_graph.compile(checkpointer=False)
     save_graph_as_png(graph, __file__)
     return graph
 
@@ -234,7 +386,10 @@ async def _test():
         ]
     )
 
-    result = await jira_Ticket_graph.ainvoke(test_state)
+    try:
+        result = await jira_Ticket_graph.ainvoke(test_state)
+    finally:
+        await mcp_sessions.close_all()
 
     print("\n" + "=" * 60)
     print("JIRA AGENT TEST COMPLETE")
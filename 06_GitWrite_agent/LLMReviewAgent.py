@@ -1,35 +1,302 @@
-from langgraph.graph import START, END, StateGraph
-from typing import TypedDict, Optional, Dict, Any
-from lg_utility import save_graph_as_png
+from langgraph.graph import START, END
+from typing import TypedDict, Optional, Dict, Any, List, Callable, Tuple
+from langchain_core.runnables import RunnableConfig
+from lg_utility import save_graph_as_png, TimedStateGraph
 import json
 import re
-import google.generativeai as genai
+import asyncio
 import os
+import weakref
 from llm_agent_prompts import (
-    create_combined_prompt,
-    format_diffs_for_analysis,
+    build_language_prompt,
+    chunk_diffs_by_token_budget,
+    group_diffs_by_language,
+    estimate_tokens,
+    prompt_overhead_tokens,
+    MIXED,
+    PROMPT_TEMPLATE_VERSION,
 )
+from llm_response_cache import llm_response_cache, cache_key
+from metrics import timed_call
+from diff_hunks import diff_hunks
+from languages import detect_language
+from artifact_store import run_store
+from stream_json import ArrayStreamParser
 from debug_utils import (
     log_node_enter, log_node_exit, log_step, log_ok, log_warn,
-    log_error, log_state, log_llm_result, NodeTimer
+    log_error, log_state, log_llm_result, log_json, NodeTimer
 )
 
 AGENT      = "LLM-REVIEW"
 MODEL_NAME = "gemini-2.0-flash"
 
+# Cap on in-flight Gemini requests across all concurrent reviews in this process
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+
+# Review mode: "map_reduce" (one call per token-budgeted chunk, merged — a PR
+# that fits one chunk is still a single call) or "single" (always one call)
+LLM_REVIEW_MODE        = os.getenv("LLM_REVIEW_MODE", "map_reduce")
+LLM_CHUNK_TOKEN_BUDGET = int(os.getenv("LLM_CHUNK_TOKEN_BUDGET", "12000"))
+
+# map_reduce only: split diffs by language family and review each group with
+# its own leaner prompt (llm_agent_prompts.PROMPT_FAMILIES). Families with
+# less than LLM_LANGUAGE_MIN_TOKENS of diff share one combined-prompt call.
+LLM_LANGUAGE_ROUTING    = os.getenv("LLM_LANGUAGE_ROUTING", "1").lower() in ("1", "true", "yes")
+LLM_LANGUAGE_MIN_TOKENS = int(os.getenv("LLM_LANGUAGE_MIN_TOKENS", "800"))
+
+# Stream Gemini responses and hand each bug to the caller's queue (config
+# "bug_queue") as soon as it is complete, while the tests are still generating
+LLM_STREAMING = os.getenv("LLM_STREAMING", "0").lower() in ("1", "true", "yes")
+
 # ============================================================================
 # STATE
 # ============================================================================
 
 class LLMReviewAgentState(TypedDict):
-    # ── inputs (from Git Agent via Orchestrator) ──────────────────────────────
-    file_list:       list          # e.g. ["foo.py", "bar.py"]
-    difference:      list          # parallel list of patch strings
+    # ── inputs ────────────────────────────────────────────────────────────────
+    diffs:           Optional[list]  # GitReadAgent diff records (patch_id handles, via Orchestrator)
+    file_list:       Optional[list]  # standalone: e.g. ["foo.py", "bar.py"] …
+    difference:      Optional[list]  # … with a parallel list of patch strings
 
     # ── outputs ───────────────────────────────────────────────────────────────
     comments:        Optional[Dict[str, Any]]   # structured review comment dict
     bugs:            Optional[list]              # list of bug dicts
     test_suggetions: Optional[Dict[str, Any]]   # test_framework + test_cases
+    reviewed_files:  Optional[list]              # filenames whose chunk produced a parsed result
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+_gemini_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+    weakref.WeakKeyDictionary()
+_gemini_configured = None     # api key genai.configure() was last called with
+
+
+def _gemini_semaphore() -> asyncio.Semaphore:
+    """The GEMINI_MAX_CONCURRENCY cap of the running event loop (created on first use)."""
+    loop      = asyncio.get_running_loop()
+    semaphore = _gemini_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _gemini_semaphores[loop] = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return semaphore
+
+# Replaces the Gemini SDK when set: async (prompt, on_text) -> response text
+_llm_backend: Optional[Callable] = None
+
+
+def set_llm_backend(backend: Optional[Callable]):
+    """
+    Route generate_content_async through backend instead of Gemini (e.g. the
+    offline stand-in in bench_fakes.py). None restores the real SDK. The
+    cache, concurrency cap and latency metrics still apply.
+    """
+    global _llm_backend
+    _llm_backend = backend
+
+
+async def generate_content_async(prompt: str, api_key: str,
+                                 on_text: Optional[Callable[[str], None]] = None,
+                                 validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Send one prompt to Gemini without blocking the event loop and return the
+    stripped response text. At most GEMINI_MAX_CONCURRENCY calls run at once.
+    Responses are served from / stored in the on-disk llm_response_cache;
+    with validate, only responses it accepts are stored or served (a
+    rejected cache entry is dropped and the prompt goes to Gemini again).
+
+    With on_text, the response is streamed and on_text is called with each
+    piece of text as it arrives (once with the whole text on a cache hit).
+    """
+    key    = cache_key(prompt, MODEL_NAME, PROMPT_TEMPLATE_VERSION)
+    cached = llm_response_cache.get(key)
+    if cached is not None and validate is not None and not validate(cached):
+        log_warn(AGENT, f"Cache entry {key[:12]}… is not a valid response — dropping it")
+        llm_response_cache.delete(key)
+        cached = None
+    if cached is not None:
+        log_ok(AGENT, f"Cache hit {key[:12]}… — Gemini call skipped  {llm_response_cache.stats()}")
+        if on_text:
+            on_text(cached)
+        return cached
+
+    if _llm_backend is not None:
+        async with _gemini_semaphore():
+            async with timed_call("gemini", MODEL_NAME):
+                response_text = (await _llm_backend(prompt, on_text)).strip()
+        _store_response(key, response_text, validate)
+        return response_text
+
+    import google.generativeai as genai      # heavy — imported on first real call
+
+    global _gemini_configured
+    if _gemini_configured != api_key:
+        genai.configure(api_key=api_key)
+        _gemini_configured = api_key
+
+    model = genai.GenerativeModel(MODEL_NAME)
+    async with _gemini_semaphore():
+        async with timed_call("gemini", MODEL_NAME):
+            if on_text is None:
+                response = await model.generate_content_async(prompt)
+                response_text = response.text.strip()
+            else:
+                parts    = []
+                response = await model.generate_content_async(prompt, stream=True)
+                async for chunk in response:
+                    parts.append(chunk.text)
+                    on_text(chunk.text)
+                response_text = "".join(parts).strip()
+
+    _store_response(key, response_text, validate)
+    return response_text
+
+
+def _store_response(key: str, response_text: str, validate: Optional[Callable[[str], bool]]):
+    if validate is not None and not validate(response_text):
+        log_warn(AGENT, f"Cache miss {key[:12]}… — invalid response not stored")
+        return
+    llm_response_cache.put(key, response_text,
+                           model=MODEL_NAME, template_version=PROMPT_TEMPLATE_VERSION)
+    log_step(AGENT, f"Cache miss {key[:12]}… — response stored  {llm_response_cache.stats()}")
+
+
+def _review_json(response_text: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """(JSON object in a Gemini response, "") or (None, why it is unparseable)."""
+    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+    if not json_match:
+        return None, "No JSON object found in response"
+    try:
+        return json.loads(json_match.group(0)), ""
+    except json.JSONDecodeError as e:
+        return None, f"JSON decode failed: {e}"
+
+
+def is_review_json(response_text: str) -> bool:
+    return _review_json(response_text)[0] is not None
+
+
+def parse_review_json(response_text: str) -> Optional[Dict[str, Any]]:
+    """Extract the JSON object from a Gemini response, or None if unparseable."""
+    review, error = _review_json(response_text)
+    if review is None:
+        log_error(AGENT, error)
+    return review
+
+
+def _bug_streamer(index: int, total: int, bug_queue: asyncio.Queue) -> Callable[[str], None]:
+    """on_text callback that puts each bugs_found entry on bug_queue as soon as it is complete."""
+    parser = ArrayStreamParser("bugs_found")
+
+    def stream_bugs(text: str):
+        for bug in parser.feed(text):
+            log_step(AGENT, f"[chunk {index}/{total}] Bug streamed: "
+                            f"{bug.get('type', '?')} @ {bug.get('location', '?')}")
+            bug_queue.put_nowait(bug)
+
+    return stream_bugs
+
+
+async def review_chunk(index: int, total: int, diffs: list, api_key: str,
+                       bug_queue: Optional[asyncio.Queue] = None,
+                       family: str = MIXED) -> Optional[Dict[str, Any]]:
+    """
+    Map step — one Gemini call over a chunk of diffs, with the prompt for
+    their language family (combined prompt for MIXED). Returns parsed JSON
+    or None. With bug_queue, the response is streamed and each bugs_found
+    entry is put on the queue the moment it is complete.
+    """
+    prompt, omitted = build_language_prompt(family, diffs, LLM_CHUNK_TOKEN_BUDGET)
+    log_step(AGENT, f"[chunk {index}/{total}] {family}  {len(diffs)} file(s)  "
+                    f"prompt={len(prompt)} chars (~{estimate_tokens(prompt)} tokens)")
+    for o in omitted:
+        log_warn(AGENT, f"[chunk {index}/{total}] {o['filename']}: omitted {o['hunks_omitted']}/"
+                        f"{o['hunks_total']} hunk(s) (~{o['omitted_tokens']} tokens) to fit the budget")
+
+    stream_bugs = _bug_streamer(index, total, bug_queue) if bug_queue is not None else None
+    try:
+        response_text = await generate_content_async(prompt, api_key, on_text=stream_bugs,
+                                                     validate=is_review_json)
+    except Exception as e:
+        log_error(AGENT, f"[chunk {index}/{total}] Gemini call failed: {e}")
+        return None
+
+    log_step(AGENT, f"[chunk {index}/{total}] Response received — {len(response_text)} chars")
+    log_step(AGENT, f"[chunk {index}/{total}] Raw response (first 600 chars): {response_text[:600]}")
+
+    return parse_review_json(response_text)
+
+
+def _norm(text: Any) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def _dedupe(items: list, key) -> list:
+    seen, out = set(), []
+    for item in items:
+        k = key(item)
+        if k in seen:
+            continue
+        seen.add(k)
+        out.append(item)
+    return out
+
+
+def merge_review_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Reduce step — merge per-chunk results in chunk order. Bugs are
+    deduplicated on normalised (type, location, description); colliding
+    test names get a numeric suffix, applied to their `def` line as well.
+    """
+    if len(results) == 1:
+        return results[0]
+
+    # ── review_comments ──────────────────────────────────────────────────────
+    reviews   = [r.get("review_comments") or {} for r in results]
+    summaries = [str(rv.get("summary", "")).strip() for rv in reviews]
+    review = {
+        "summary": " ".join(s for s in summaries if s),
+        "bugs": _dedupe(
+            [b for rv in reviews for b in rv.get("bugs", [])],
+            key=lambda b: (_norm(b.get("title")), _norm(b.get("description"))),
+        ),
+    }
+    for field in ("quality_issues", "security_issues", "positive_feedback"):
+        review[field] = _dedupe([x for rv in reviews for x in rv.get(field, [])], key=_norm)
+
+    # ── bugs_found ───────────────────────────────────────────────────────────
+    bugs = _dedupe(
+        [b for r in results for b in r.get("bugs_found", [])],
+        key=lambda b: (_norm(b.get("type")), _norm(b.get("location")), _norm(b.get("description"))),
+    )
+
+    # ── test_suggestions ─────────────────────────────────────────────────────
+    suites     = [r.get("test_suggestions") or {} for r in results]
+    framework  = next((s.get("test_framework") for s in suites if s.get("test_framework")), "pytest")
+    test_cases, used_names = [], {}
+    for suite in suites:
+        for tc in suite.get("test_cases", []):
+            tc   = dict(tc)
+            name = tc.get("test_name") or "test_case"
+            if name in used_names:
+                used_names[name] += 1
+                new_name = f"{name}_{used_names[name]}"
+                while new_name in used_names:
+                    used_names[name] += 1
+                    new_name = f"{name}_{used_names[name]}"
+                tc["test_code"] = re.sub(rf"\bdef\s+{re.escape(name)}\s*\(",
+                                         f"def {new_name}(", tc.get("test_code", ""))
+                tc["test_name"] = new_name
+                name = new_name
+            used_names[name] = 1
+            test_cases.append(tc)
+
+    return {
+        "review_comments":  review,
+        "bugs_found":       bugs,
+        "test_suggestions": {"test_framework": framework, "test_cases": test_cases},
+    }
 
 
 # ============================================================================
@@ -43,34 +310,48 @@ def llm_review_init_node(state: LLMReviewAgentState):
     state['comments']       = None
     state['bugs']           = []
     state['test_suggetions'] = {}
-
-    file_list  = state.get("file_list", [])
-    difference = state.get("difference", [])
-
-    log_step(AGENT, f"Files received  : {len(file_list)}")
-    log_step(AGENT, f"Patches received: {len(difference)}")
-
-    for i, fname in enumerate(file_list, 1):
-        patch_len = len(difference[i - 1]) if i - 1 < len(difference) else 0
-        log_step(AGENT, f"  File {i}: {fname}  (patch_len={patch_len} chars)")
-
-    if len(file_list) != len(difference):
-        log_warn(AGENT, f"file_list length ({len(file_list)}) != difference length ({len(difference)}) — zip will truncate")
+    state['reviewed_files']  = []
+
+    if state.get("diffs") is None:
+        # Standalone call with raw patches: move them into the run's artifact store
+        file_list  = state.get("file_list") or []
+        difference = state.get("difference") or []
+        if len(file_list) != len(difference):
+            log_warn(AGENT, f"file_list length ({len(file_list)}) != difference length ({len(difference)}) — zip will truncate")
+
+        store, diffs = run_store(), []
+        for fname, patch in zip(file_list, difference):
+            diff   = {"filename": fname, "language": detect_language(fname, patch),
+                      "patch_id": store.put(patch)}
+            parsed = diff_hunks(diff)
+            diff.update(additions=parsed.additions, deletions=parsed.deletions)
+            diffs.append(diff)
+        state['diffs'] = diffs
+
+    log_step(AGENT, f"Diffs received: {len(state['diffs'])}")
+    for i, d in enumerate(state['diffs'], 1):
+        log_step(AGENT, f"  File {i}: {d['filename']}  [{d['language']}]  "
+                        f"+{d['additions']}/-{d['deletions']}")
 
     log_node_exit(AGENT, "LLM_INIT")
     return state
 
 
 # ─── NODE 2 — single combined LLM call ───────────────────────────────────────
-def llm_review_analyze_and_generate_node(state: LLMReviewAgentState):
+async def llm_review_analyze_and_generate_node(state: LLMReviewAgentState,
+                                               config: RunnableConfig = None):
     """
-    Single Gemini call that returns all three outputs at once:
+    Gemini review that returns all three outputs at once:
       review_comments  ->  state['comments']
       bugs_found       ->  state['bugs']
       test_suggestions ->  state['test_suggetions']
+    Diffs are grouped by language family and split into token-budgeted
+    chunks, each reviewed concurrently with its family's prompt (map), then
+    merged deterministically (reduce). When the caller passes
+    config={"configurable": {"bug_queue": q}}, bugs are also streamed to q.
     """
     log_node_enter(AGENT, "ANALYZE_AND_GENERATE",
-                   "one-shot Gemini call: review + bugs + tests")
+                   "Gemini review (single or map-reduce): review + bugs + tests")
 
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
@@ -78,53 +359,43 @@ def llm_review_analyze_and_generate_node(state: LLMReviewAgentState):
     else:
         log_step(AGENT, f"GEMINI_API_KEY loaded ({len(api_key)} chars)")
 
-    # ── Build diffs from parallel file_list / difference arrays ──────────────
-    diffs = []
-    for fname, patch in zip(state.get("file_list", []), state.get("difference", [])):
-        ext = fname.rsplit(".", 1)[-1] if "." in fname else "unknown"
-        diffs.append({
-            "filename":  fname,
-            "language":  ext,
-            "additions": patch.count("\n+"),
-            "deletions": patch.count("\n-"),
-            "patch":     patch,
-        })
-
-    log_step(AGENT, f"Diff structs built: {len(diffs)}")
-    for d in diffs:
-        log_step(AGENT, f"  -> {d['filename']}  [{d['language']}]  "
-                        f"+{d['additions']}/-{d['deletions']}  patch_len={len(d['patch'])}")
-
-    # ── Build & send prompt ───────────────────────────────────────────────────
-    prompt = create_combined_prompt(diffs)
-    log_step(AGENT, f"Combined prompt length: {len(prompt)} chars")
-    log_step(AGENT, f"Using model: {MODEL_NAME}")
-    log_step(AGENT, "Sending single request to Gemini ...")
-
-    genai.configure(api_key=api_key)
-    model         = genai.GenerativeModel(MODEL_NAME)
-    response      = model.generate_content(prompt)
-    response_text = response.text.strip()
-
-    log_step(AGENT, f"Response received — {len(response_text)} chars")
-    print(f"\n         ── Raw Gemini Response (first 600 chars) ──")
-    print(f"         {response_text[:600]}")
-    print(f"         ──────────────────────────────────────────\n")
-
-    # ── Parse JSON ────────────────────────────────────────────────────────────
-    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+    # Diff records carry patch_id handles; prompts read the text from the run's store
+    diffs = state.get("diffs") or []
 
-    if not json_match:
-        log_error(AGENT, "No JSON object found in response — all outputs set to defaults")
+    # ── Map: one Gemini call per (language family, chunk), concurrently ──────
+    if LLM_REVIEW_MODE == "single" or not diffs:
+        chunks = [(MIXED, diffs)]
+    else:
+        groups = (group_diffs_by_language(diffs, LLM_LANGUAGE_MIN_TOKENS)
+                  if LLM_LANGUAGE_ROUTING else [(MIXED, diffs)])
+        chunks = [(family, chunk) for family, group in groups
+                  for chunk in chunk_diffs_by_token_budget(
+                      group, LLM_CHUNK_TOKEN_BUDGET - prompt_overhead_tokens(family))]
+    log_step(AGENT, f"Using model: {MODEL_NAME}  mode={LLM_REVIEW_MODE}  chunks={len(chunks)}  "
+                    f"families={sorted({family for family, _ in chunks})}  "
+                    f"budget={LLM_CHUNK_TOKEN_BUDGET} tokens/chunk")
+    bug_queue = ((config or {}).get("configurable") or {}).get("bug_queue")
+    log_step(AGENT, f"Sending {len(chunks)} request(s) to Gemini ...  "
+                    f"streaming={'on' if bug_queue is not None else 'off'}")
+
+    chunk_results = await asyncio.gather(*(
+        review_chunk(i, len(chunks), chunk, api_key, bug_queue, family)
+        for i, (family, chunk) in enumerate(chunks, 1)
+    ))
+    parsed = [r for r in chunk_results if r is not None]
+    # Files of failed chunks are left out, so the caller does not record them as reviewed
+    state['reviewed_files'] = [d["filename"] for (_, chunk), r in zip(chunks, chunk_results)
+                               if r is not None for d in chunk]
+
+    if not parsed:
+        log_error(AGENT, "No chunk produced a parseable result — all outputs set to defaults")
         log_node_exit(AGENT, "ANALYZE_AND_GENERATE")
         return state
+    if len(parsed) < len(chunks):
+        log_warn(AGENT, f"{len(chunks) - len(parsed)}/{len(chunks)} chunk(s) failed — merging the rest")
 
-    try:
-        result = json.loads(json_match.group(0))
-    except json.JSONDecodeError as e:
-        log_error(AGENT, f"JSON decode failed: {e} — all outputs set to defaults")
-        log_node_exit(AGENT, "ANALYZE_AND_GENERATE")
-        return state
+    # ── Reduce: deterministic merge in chunk order ───────────────────────────
+    result = merge_review_results(parsed)
 
     log_ok(AGENT, "JSON parsed successfully")
 
@@ -166,9 +437,9 @@ def llm_review_analyze_and_generate_node(state: LLMReviewAgentState):
         "test_framework":   tests.get("test_framework", "?"),
     }, label="ANALYZE_AND_GENERATE — final outputs")
 
-    log_ok(AGENT, "All outputs written to state in a single LLM call")
+    log_ok(AGENT, f"All outputs written to state from {len(parsed)} LLM call(s)")
     log_node_exit(AGENT, "ANALYZE_AND_GENERATE")
-    print(json.dumps(state, sort_keys=True, indent=4))
+    log_json(AGENT, "ANALYZE_AND_GENERATE — state", state, max_chars=2000)
     return state
 
 
@@ -177,16 +448,17 @@ def llm_review_analyze_and_generate_node(state: LLMReviewAgentState):
 # ============================================================================
 
 def graph_Builder():
-    llm_review_graph = StateGraph(LLMReviewAgentState)
+    llm_review_graph = TimedStateGraph(LLMReviewAgentState, AGENT)
 
-    llm_review_graph.add_node("LLM_INIT",            llm_review_init_node)
-    llm_review_graph.add_node("ANALYZE_AND_GENERATE", llm_review_analyze_and_generate_node)
+    llm_review_graph.add_node("LLM_INIT",            llm_review_init_node)                  # sync
+    llm_review_graph.add_node("ANALYZE_AND_GENERATE", llm_review_analyze_and_generate_node) # async
 
     llm_review_graph.add_edge(START,                  "LLM_INIT")
     llm_review_graph.add_edge("LLM_INIT",             "ANALYZE_AND_GENERATE")
     llm_review_graph.add_edge("ANALYZE_AND_GENERATE", END)
 
-    graph = llm_review_graph.compile()
+    # Runs inside an orchestrator node, which is checkpointed as a whole — no nested checkpoints
+    graph = llm_review_graph.compile(checkpointer=False)
     save_graph_as_png(graph, __file__)
     return graph
 
@@ -206,7 +478,7 @@ def main():
             "@@ -10,3 +10,6 @@\n+def bar(lst):\n+    return lst[99]\n",
         ]
     }
-    llm_review_graph.invoke(data)
+    asyncio.run(llm_review_graph.ainvoke(data))
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,32 @@
+import os
+import sys
 import json
+import math
+import time
+import argparse
 import asyncio
-from typing import TypedDict, Optional, Dict, Any, List
-from langgraph.graph import StateGraph, START, END
-from lg_utility import save_graph_as_png
-from GitReadAgent  import git_read_graph,  parse_github_pr_url
-from LLMReviewAgent import llm_review_graph
-from JiraTicketAgent import jira_Ticket_graph
+import operator
+from typing import TypedDict, Optional, Dict, Any, List, Annotated
+from langgraph.graph import START, END
+from lg_utility import save_graph_as_png, TimedStateGraph
+from GitReadAgent  import git_read_graph
+from LLMReviewAgent import llm_review_graph, merge_review_results, LLM_STREAMING
+from JiraTicketAgent import jira_Ticket_graph, open_ticket_batch, known_bug_tickets
 from GitWriteAgent import git_Write_graph
+from mcp_session_manager import mcp_sessions
+from metrics import write_metrics
+from checkpointing import CHECKPOINT_DB, open_checkpointer, close_checkpointer, forget_run
+from review_scheduler import priority_order
+from diff_hunks import filter_bugs_to_changed_lines
+from artifact_store import release_run_store
+from review_history import (
+    load_review_history, save_review_history, split_diffs_by_history,
+    reused_findings, update_history_findings, record_tickets,
+)
 from debug_utils import (
     log_node_enter, log_node_exit, log_step, log_ok, log_warn,
     log_error, log_state, log_phase, log_pipeline_start,
-    log_pipeline_end, log_diff_table
+    log_pipeline_end, log_diff_table, log_batch_summary, new_run_id, set_run_id
 )
 
 AGENT = "ORCH"
@@ -28,17 +44,25 @@ class OrchestraterData(TypedDict):
     pull_number:         int
     changed_files:       List[Dict]
     diffs:               List[Dict]
+    skipped_files:       List[Dict]                 # not sent to the LLM, with reason (review_filter.py)
 
     # ── LLM REVIEW outputs ────────────────────────────────────────────────────
     llm_review_result:   Optional[Dict[str, Any]]   # {bugs, comments, test_suggetions}
+    review_history:      Optional[Dict[str, Any]]   # per-file fingerprints + findings (review_history.py)
+    reused_files:        List[str]                  # unchanged since last run — not re-reviewed
 
     # ── JIRA outputs ──────────────────────────────────────────────────────────
+    streamed_tickets:    List[Dict]                 # created during LLM streaming (LLM_STREAMING)
     jira_ticket_details: Optional[List[Dict]]
 
-    # ── GIT WRITE outputs ─────────────────────────────────────────────────────
-    comment_posted:      bool
-    tests_committed:     bool
-    pr_tagged:           bool
+    # ── GIT WRITE staging — artifacts built by each write branch ────────────
+    write_artifacts:     List[Dict]                 # tests + tags (GIT_WRITE_AGENT)
+    comment_artifacts:   List[Dict]                 # review comment (GIT_COMMENT_AGENT)
+
+    # ── GIT WRITE outputs — OR-reduced ────────────────────────────────────────
+    comment_posted:      Annotated[bool, operator.or_]
+    tests_committed:     Annotated[bool, operator.or_]
+    pr_tagged:           Annotated[bool, operator.or_]
 
 
 # ============================================================================
@@ -52,26 +76,33 @@ async def invoke_git_read(pr_url: str) -> Dict:
 
     changed = result.get("changed_files", [])
     diffs   = result.get("diffs", [])
-    log_ok(AGENT, f"GIT-READ done  changed_files={len(changed)}  diffs={len(diffs)}")
+    skipped = result.get("skipped_files", [])
+    log_ok(AGENT, f"GIT-READ done  changed_files={len(changed)}  diffs={len(diffs)}  "
+                  f"skipped={len(skipped)}")
     for d in diffs:
         log_step(AGENT, f"  {d['filename']}  [{d['language']}]  +{d['additions']}/-{d['deletions']}")
-    return {"changed_files": changed, "diffs": diffs,
+    return {"changed_files": changed, "diffs": diffs, "skipped_files": skipped,
             "owner": result.get("owner"), "repo": result.get("repo"),
             "pull_number": result.get("pull_number")}
 
 
-def invoke_llm_review(file_list: list, patches: list) -> Dict:
-    """Invoke LLMReviewAgent → returns bugs, comments, test_suggetions."""
-    log_step(AGENT, f"→ LLM-REVIEW  files={len(file_list)}")
-    result = llm_review_graph.invoke({"file_list": file_list, "difference": patches})
+async def invoke_llm_review(diffs: List[Dict], bug_queue: Optional[asyncio.Queue] = None) -> Dict:
+    """
+    Invoke LLMReviewAgent on GitReadAgent diff records (patch_id handles, not
+    patch text) → returns bugs, comments, test_suggetions.
+    With bug_queue, each bug is also put on the queue as soon as Gemini emits it.
+    """
+    log_step(AGENT, f"→ LLM-REVIEW  files={len(diffs)}  streaming={bug_queue is not None}")
+    result = await llm_review_graph.ainvoke({"diffs": diffs}, config={"configurable": {"bug_queue": bug_queue}} if bug_queue is not None else None)
 
-    bugs    = result.get("bugs", [])
+    bugs     = result.get("bugs", [])
     comments = result.get("comments", {})
-    tests   = result.get("test_suggetions", {})
+    tests    = result.get("test_suggetions", {})
+    reviewed = result.get("reviewed_files") or []
     log_ok(AGENT, f"LLM-REVIEW done  bugs={len(bugs)}  "
                   f"test_cases={len(tests.get('test_cases', []) if isinstance(tests, dict) else [])}  "
                   f"comment_keys={list(comments.keys()) if isinstance(comments, dict) else '?'}")
-    return {"bugs": bugs, "comments": comments, "test_suggetions": tests}
+    return {"bugs": bugs, "comments": comments, "test_suggetions": tests, "reviewed_files": reviewed}
 
 
 async def invoke_jira(owner: str, repo: str, pull_number: int, bugs: list) -> List:
@@ -91,11 +122,54 @@ async def invoke_jira(owner: str, repo: str, pull_number: int, bugs: list) -> Li
     return tickets
 
 
+async def stream_jira_tickets(owner: str, repo: str, pull_number: int,
+                             bug_queue: asyncio.Queue, diffs: List[Dict], history: Dict) -> List:
+    """
+    Consume bugs from bug_queue while the LLM review is still running and start
+    a Jira ticket for each one right away. Bugs outside the changed hunks are
+    skipped; already-ticketed ones resolve to their existing ticket
+    (bug_index.find). Ends on a None sentinel.
+    """
+    batch = await open_ticket_batch(owner, repo, pull_number, history=history)
+    while True:
+        bug = await bug_queue.get()
+        if bug is None:
+            break
+        if batch is None:
+            continue
+        kept, _ = filter_bugs_to_changed_lines([bug], diffs)
+        if kept:
+            batch.submit(bug)
+
+    if batch is None:
+        return []
+    tickets = await batch.results()
+    if batch.first_ticket_ms is not None:
+        log_ok(AGENT, f"Streamed Jira: {len(tickets)} ticket(s), first after {batch.first_ticket_ms:.0f}ms")
+    return tickets
+
+
+async def finish_streamed_tickets(consumer: asyncio.Task) -> List:
+    """Result of a stream_jira_tickets task whose queue got its sentinel; [] if it failed."""
+    try:
+        return await consumer
+    except Exception as e:
+        log_error(AGENT, f"Streamed Jira ticket creation failed: {e}")
+        return []
+
+
 async def invoke_git_write(owner: str, repo: str, pull_number: int,
                            review_comments: dict, bugs: list,
-                           test_suggetions: dict, jira_tickets: list) -> Dict:
-    """Invoke GitWriteAgent → posts comment, commits tests, tags PR."""
-    log_step(AGENT, f"→ GIT-WRITE  PR#{pull_number}  "
+                           test_suggetions: dict, jira_tickets: list,
+                           tasks: List[str], staged_files: Optional[List[Dict]] = None,
+                           defer_commit: bool = False) -> Dict:
+    """
+    Invoke GitWriteAgent for the given write tasks (post comment / commit tests / tag PR).
+    defer_commit=True only builds the artifacts (returned as pending_files);
+    pass them back as staged_files to write everything in one commit.
+    """
+    log_step(AGENT, f"→ GIT-WRITE  PR#{pull_number}  tasks={tasks}  "
+                    f"staged={len(staged_files or [])}  defer={defer_commit}  "
                     f"bugs={len(bugs)}  "
                     f"test_cases={len(test_suggetions.get('test_cases', []) if isinstance(test_suggetions, dict) else [])}  "
                     f"jira={len(jira_tickets)}")
@@ -108,8 +182,11 @@ async def invoke_git_write(owner: str, repo: str, pull_number: int,
         "bugs":                bugs,
         "test_suggetions":     test_suggetions,
         "jira_ticket_details": jira_tickets,
+        "write_tasks":         tasks,
+        "staged_files":        staged_files or [],
+        "defer_commit":        defer_commit,
     })
-    log_ok(AGENT, f"GIT-WRITE done  "
+    log_ok(AGENT, f"GIT-WRITE done  pending={len(result.get('pending_files') or [])}  "
                   f"comment_posted={result.get('comment_posted')}  "
                   f"tests_committed={result.get('tests_committed')}  "
                   f"pr_tagged={result.get('pr_tagged')}")
@@ -130,8 +207,14 @@ def orchestrator_init_node(state: OrchestraterData) -> OrchestraterData:
     state["pull_number"]         = 0
     state["changed_files"]       = []
     state["diffs"]               = []
+    state["skipped_files"]       = []
     state["llm_review_result"]   = {}
+    state["review_history"]      = {}
+    state["reused_files"]        = []
+    state["streamed_tickets"]    = []
     state["jira_ticket_details"] = []
+    state["write_artifacts"]     = []
+    state["comment_artifacts"]   = []
     state["comment_posted"]      = False
     state["tests_committed"]     = False
     state["pr_tagged"]           = False
@@ -143,7 +226,7 @@ def orchestrator_init_node(state: OrchestraterData) -> OrchestraterData:
 
 # ─── NODE 2 — Git Read ───────────────────────────────────────────────────────
 async def git_read_agent_node(state: OrchestraterData) -> OrchestraterData:
-    log_phase("1 of 4  —  GIT READ")
+    log_phase("1 of 5  —  GIT READ")
     log_node_enter(AGENT, "GIT_READ_AGENT", "fetch PR files & diffs")
 
     read_result = await invoke_git_read(state["pr_details"])
@@ -153,6 +236,7 @@ async def git_read_agent_node(state: OrchestraterData) -> OrchestraterData:
     state["pull_number"]   = read_result["pull_number"]
     state["changed_files"] = read_result["changed_files"]
     state["diffs"]         = read_result["diffs"]
+    state["skipped_files"] = read_result["skipped_files"]
 
     log_diff_table(AGENT, state["diffs"])
     log_ok(AGENT, f"GIT_READ_AGENT complete — {len(state['diffs'])} diff(s)")
@@ -160,9 +244,19 @@ async def git_read_agent_node(state: OrchestraterData) -> OrchestraterData:
     return state
 
 
+# ─── ROUTER — after GIT_READ_AGENT ───────────────────────────────────────────
+def should_review(state: OrchestraterData) -> str:
+    """Route to LLM_REVIEW_AGENT, or straight to ORCHESTRATOR_END when no file is reviewable."""
+    if state.get("diffs"):
+        return "REVIEW"
+    skipped = state.get("skipped_files") or []
+    log_warn(AGENT, f"Router: no reviewable file ({len(skipped)} skipped) — bypassing LLM, Jira and Git write")
+    return "SKIP"
+
+
 # ─── NODE 3 — LLM Review ─────────────────────────────────────────────────────
-def llm_agent_node(state: OrchestraterData) -> OrchestraterData:
-    log_phase("2 of 4  —  LLM REVIEW")
+async def llm_agent_node(state: OrchestraterData) -> OrchestraterData:
+    log_phase("2 of 5  —  LLM REVIEW")
     log_node_enter(AGENT, "LLM_REVIEW_AGENT", "analyze code, find bugs, generate tests")
 
     diffs = state.get("diffs", [])
@@ -171,12 +265,77 @@ def llm_agent_node(state: OrchestraterData) -> OrchestraterData:
         log_node_exit(AGENT, "LLM_REVIEW_AGENT")
         return state
 
-    file_list = [d["filename"] for d in diffs]
-    patches   = [d["patch"]    for d in diffs]
-    for f, p in zip(file_list, patches):
-        log_step(AGENT, f"  {f}  patch_len={len(p)}")
-
-    state["llm_review_result"] = invoke_llm_review(file_list, patches)
+    # ── Incremental: only files whose patch changed since the last run ───────
+    owner, repo, pull_number = state["owner"], state["repo"], state["pull_number"]
+    history              = load_review_history(owner, repo, pull_number)
+    to_review, unchanged = split_diffs_by_history(diffs, history)
+    log_step(AGENT, f"Incremental review: {len(to_review)} changed  {len(unchanged)} unchanged")
+    for f in unchanged:
+        log_step(AGENT, f"  {f}  unchanged — reusing previous findings")
+
+    if to_review and LLM_STREAMING:
+        # Jira tickets start while Gemini is still writing the test suggestions
+        bug_queue = asyncio.Queue()
+        consumer  = asyncio.create_task(
+            stream_jira_tickets(owner, repo, pull_number, bug_queue, to_review, history)
+        )
+        try:
+            fresh = await invoke_llm_review(to_review, bug_queue)
+        except asyncio.CancelledError:
+            consumer.cancel()
+            raise
+        except Exception:
+            # Tickets already created must reach history, or the next run files them again
+            bug_queue.put_nowait(None)
+            streamed = await finish_streamed_tickets(consumer)
+            if streamed:
+                save_review_history(owner, repo, pull_number, record_tickets(history, streamed))
+            raise
+        bug_queue.put_nowait(None)
+        state["streamed_tickets"] = await finish_streamed_tickets(consumer)
+    elif to_review:
+        fresh = await invoke_llm_review(to_review)
+    else:
+        log_ok(AGENT, "No file changed since the last review — skipping LLM call")
+        fresh = {"bugs": [], "comments": {}, "test_suggetions": {}, "reviewed_files": []}
+
+    # ── Drop findings that point outside the changed hunks (never reach Jira) ─
+    kept, dropped = filter_bugs_to_changed_lines(fresh.get("bugs") or [], to_review)
+    for bug in dropped:
+        log_warn(AGENT, f"  Dropped bug outside changed lines: {bug.get('type', '?')} "
+                        f"@ {bug.get('location', '?')}")
+    fresh = {**fresh, "bugs": kept}
+
+    # ── Merge fresh findings with the ones reused from history ───────────────
+    fresh_tests = fresh.get("test_suggetions") or {}
+    merged = merge_review_results([
+        {
+            "review_comments":  fresh.get("comments") or {},
+            "bugs_found":       fresh.get("bugs") or [],
+            "test_suggestions": fresh_tests,
+        },
+        reused_findings(history, unchanged),
+    ]) if unchanged else None
+
+    state["llm_review_result"] = fresh if merged is None else {
+        "bugs":            merged["bugs_found"],
+        "comments":        merged["review_comments"],
+        "test_suggetions": merged["test_suggestions"],
+    }
+    # Only files whose chunk produced a parsed result are fingerprinted; files
+    # of a failed chunk (or a failed call) are reviewed again on the next run
+    ok_files = set(fresh.get("reviewed_files") or [])
+    reviewed = [d for d in to_review if d["filename"] in ok_files]
+    if len(reviewed) < len(to_review):
+        log_warn(AGENT, f"LLM review produced no result for {len(to_review) - len(reviewed)} "
+                        f"file(s) — left out of history")
+
+    state["reused_files"]   = unchanged
+    state["review_history"] = update_history_findings(
+        history, reviewed, unchanged,
+        fresh.get("bugs") or [], fresh_tests.get("test_cases", []),
+    )
+    save_review_history(owner, repo, pull_number, state["review_history"])
 
     result = state["llm_review_result"]
     log_state(AGENT, {
@@ -189,72 +348,158 @@ def llm_agent_node(state: OrchestraterData) -> OrchestraterData:
     return state
 
 
+# Nodes 4 and 5 run in parallel after the LLM review, so each returns only
+# the keys it owns.
+
 # ─── NODE 4 — Jira ───────────────────────────────────────────────────────────
-async def jira_agent_node(state: OrchestraterData) -> OrchestraterData:
-    log_phase("3 of 4  —  JIRA TICKETS")
+async def jira_agent_node(state: OrchestraterData) -> Dict[str, Any]:
+    log_phase("3 of 5  —  JIRA TICKETS  (parallel with GIT WRITE)")
     log_node_enter(AGENT, "JIRA_AGENT", "create Jira tickets for bugs")
 
-    bugs = state.get("llm_review_result", {}).get("bugs", [])
+    # Bugs carried over from an earlier run — or ticketed while the LLM was
+    # still streaming — keep their existing tickets
+    bugs     = state.get("llm_review_result", {}).get("bugs", [])
+    history  = state.get("review_history") or {}
+    streamed = state.get("streamed_tickets") or []
+    if streamed:
+        history = record_tickets(history, streamed)
+        log_step(AGENT, f"{len(streamed)} ticket(s) created during LLM streaming")
     if not bugs:
+        if streamed:
+            save_review_history(state["owner"], state["repo"], state["pull_number"], history)
         log_warn(AGENT, "No bugs — skipping Jira")
         log_node_exit(AGENT, "JIRA_AGENT")
-        return state
+        return {"jira_ticket_details": []}
 
-    state["jira_ticket_details"] = await invoke_jira(
-        state["owner"], state["repo"], state["pull_number"], bugs
-    )
+    reused, remaining = await known_bug_tickets(bugs, history)
+    if reused:
+        log_step(AGENT, f"{len(reused)} bug(s) already ticketed")
+
+    created = await invoke_jira(
+        state["owner"], state["repo"], state["pull_number"], remaining
+    ) if remaining else []
+    tickets = reused + created
 
-    log_ok(AGENT, f"Jira phase complete — {len(state['jira_ticket_details'])} ticket(s)")
+    if tickets or streamed:
+        save_review_history(state["owner"], state["repo"], state["pull_number"],
+                            record_tickets(history, tickets))
+
+    log_ok(AGENT, f"Jira phase complete — {len(tickets)} ticket(s)")
     log_node_exit(AGENT, "JIRA_AGENT")
-    return state
+    return {"jira_ticket_details": tickets}
+
+
+# ─── NODE 5 — Git Write: tests + tags (no Jira dependency) ───────────────────
+async def git_write_agent_node(state: OrchestraterData) -> Dict[str, Any]:
+    log_phase("3 of 5  —  GIT WRITE  (parallel with JIRA)")
+    log_node_enter(AGENT, "GIT_WRITE_AGENT", "stage tests + PR tags")
+
+    llm   = state.get("llm_review_result", {})
+    bugs  = llm.get("bugs", [])
+    tests = llm.get("test_suggetions", {})
+
+    write_result = await invoke_git_write(
+        state["owner"], state["repo"], state["pull_number"],
+        {}, bugs, tests, [], tasks=["COMMIT_TESTS", "TAG_PR"], defer_commit=True
+    )
+
+    log_node_exit(AGENT, "GIT_WRITE_AGENT")
+    return {"write_artifacts": write_result.get("pending_files") or []}
 
 
-# ─── NODE 5 — Git Write ──────────────────────────────────────────────────────
-async def git_write_agent_node(state: OrchestraterData) -> OrchestraterData:
-    log_phase("4 of 4  —  GIT WRITE")
-    log_node_enter(AGENT, "GIT_WRITE_AGENT", "post comment, commit tests, tag PR")
+# ─── NODE 6 — Git Write: review comment (waits for Jira ticket keys) ─────────
+async def git_comment_agent_node(state: OrchestraterData) -> Dict[str, Any]:
+    log_phase("4 of 5  —  GIT WRITE  (review comment)")
+    log_node_enter(AGENT, "GIT_COMMENT_AGENT", "stage review comment with Jira links")
 
     llm      = state.get("llm_review_result", {})
     comments = llm.get("comments", {})
     bugs     = llm.get("bugs", [])
-    tests    = llm.get("test_suggetions", {})
     tickets  = state.get("jira_ticket_details") or []
 
     write_result = await invoke_git_write(
         state["owner"], state["repo"], state["pull_number"],
-        comments, bugs, tests, tickets
+        comments, bugs, {}, tickets, tasks=["POST_COMMENTS"], defer_commit=True
     )
 
-    state["comment_posted"]  = write_result.get("comment_posted", False)
-    state["tests_committed"] = write_result.get("tests_committed", False)
-    state["pr_tagged"]       = write_result.get("pr_tagged", False)
+    log_node_exit(AGENT, "GIT_COMMENT_AGENT")
+    return {"comment_artifacts": write_result.get("pending_files") or []}
 
+
+# ─── NODE 7 — join: one commit for every staged artifact ─────────────────────
+async def git_commit_agent_node(state: OrchestraterData) -> Dict[str, Any]:
+    log_phase("5 of 5  —  GIT WRITE  (single batched commit)")
+    log_node_enter(AGENT, "GIT_COMMIT_AGENT", "commit all staged artifacts at once")
+
+    staged = (state.get("write_artifacts") or []) + (state.get("comment_artifacts") or [])
+    write_result = await invoke_git_write(
+        state["owner"], state["repo"], state["pull_number"],
+        {}, [], {}, [], tasks=[], staged_files=staged
+    )
+
+    log_node_exit(AGENT, "GIT_COMMIT_AGENT")
+    return {
+        "comment_posted":  write_result.get("comment_posted", False),
+        "tests_committed": write_result.get("tests_committed", False),
+        "pr_tagged":       write_result.get("pr_tagged", False),
+    }
+
+
+# ─── NODE 8 — end ────────────────────────────────────────────────────────────
+def orchestrator_end_node(state: OrchestraterData) -> Dict[str, Any]:
+    log_node_enter(AGENT, "ORCHESTRATOR_END", "log pipeline result")
     log_pipeline_end(state)
-    log_node_exit(AGENT, "GIT_WRITE_AGENT")
-    return state
+    log_node_exit(AGENT, "ORCHESTRATOR_END")
+    return {}
 
 
 # ============================================================================
 # GRAPH
 # ============================================================================
 
-def graph_Builder():
-    Ograph = StateGraph(OrchestraterData)
+def graph_Builder(checkpointer=None):
+    """
+    Build the orchestrator graph. With a checkpointer (see checkpointing.py)
+    every completed node is persisted per thread_id, so resume() can pick up
+    a failed run at the node that failed.
+    """
+    Ograph = TimedStateGraph(OrchestraterData, AGENT)
 
     Ograph.add_node("ORCHESTRATOR_INIT", orchestrator_init_node)  # sync
     Ograph.add_node("GIT_READ_AGENT",    git_read_agent_node)     # async
-    Ograph.add_node("LLM_REVIEW_AGENT",  llm_agent_node)          # sync
+    Ograph.add_node("LLM_REVIEW_AGENT",  llm_agent_node)          # async
     Ograph.add_node("JIRA_AGENT",        jira_agent_node)         # async
     Ograph.add_node("GIT_WRITE_AGENT",   git_write_agent_node)    # async
+    Ograph.add_node("GIT_COMMENT_AGENT", git_comment_agent_node)  # async
+    Ograph.add_node("GIT_COMMIT_AGENT",  git_commit_agent_node)   # async
+    Ograph.add_node("ORCHESTRATOR_END",  orchestrator_end_node)   # sync
 
     Ograph.add_edge(START,               "ORCHESTRATOR_INIT")
     Ograph.add_edge("ORCHESTRATOR_INIT", "GIT_READ_AGENT")
-    Ograph.add_edge("GIT_READ_AGENT",    "LLM_REVIEW_AGENT")
+
+    # Conditional: nothing left after the reviewability filter → nothing to review or write
+    Ograph.add_conditional_edges(
+        "GIT_READ_AGENT",
+        should_review,
+        {
+            "REVIEW": "LLM_REVIEW_AGENT",
+            "SKIP":   "ORCHESTRATOR_END",
+        }
+    )
+
+    # Fan-out: Jira tickets ∥ test commit + tagging
     Ograph.add_edge("LLM_REVIEW_AGENT",  "JIRA_AGENT")
-    Ograph.add_edge("JIRA_AGENT",        "GIT_WRITE_AGENT")
-    Ograph.add_edge("GIT_WRITE_AGENT",   END)
+    Ograph.add_edge("LLM_REVIEW_AGENT",  "GIT_WRITE_AGENT")
+
+    # Only the review comment waits for the ticket keys
+    Ograph.add_edge("JIRA_AGENT",        "GIT_COMMENT_AGENT")
 
-    graph = Ograph.compile()
+    # Fan-in: both write branches' artifacts go out in one commit
+    Ograph.add_edge(["GIT_WRITE_AGENT", "GIT_COMMENT_AGENT"], "GIT_COMMIT_AGENT")
+    Ograph.add_edge("GIT_COMMIT_AGENT",  "ORCHESTRATOR_END")
+    Ograph.add_edge("ORCHESTRATOR_END",  END)
+
+    graph = Ograph.compile(checkpointer=checkpointer)
     save_graph_as_png(graph, __file__)
     return graph
 
@@ -262,13 +507,262 @@ def graph_Builder():
 orchestrator_graph = graph_Builder()
 
 
+# ============================================================================
+# CHECKPOINTING — resume a failed run without redoing completed phases
+# ============================================================================
+
+def run_config(run_id: str) -> Dict:
+    """Invocation config; the run id is the checkpoint thread."""
+    return {"configurable": {"thread_id": run_id}}
+
+
+async def enable_checkpointing(path: str = CHECKPOINT_DB):
+    """Recompile orchestrator_graph with the SQLite checkpointer at path."""
+    global orchestrator_graph
+    orchestrator_graph = graph_Builder(await open_checkpointer(path))
+
+
+async def resume(run_id: str) -> Dict:
+    """
+    Continue a checkpointed run from the node that failed. Completed phases
+    (Git read, LLM review, Jira tickets, ...) are replayed from the checkpoint,
+    not executed again. Returns the final state.
+    """
+    if orchestrator_graph.checkpointer is None:
+        raise RuntimeError("checkpointing is disabled — set CHECKPOINT_DB or call enable_checkpointing()")
+
+    set_run_id(run_id)
+    config   = run_config(run_id)
+    snapshot = await orchestrator_graph.aget_state(config)
+    if not snapshot.values:
+        raise KeyError(f"no checkpoint for run {run_id}")
+    if not snapshot.next:
+        log_ok(AGENT, f"Run {run_id} already completed — nothing to resume")
+        return snapshot.values
+
+    log_step(AGENT, f"Resuming run {run_id} at {list(snapshot.next)}")
+    try:
+        result = await orchestrator_graph.ainvoke(None, config)
+        await forget_run(orchestrator_graph.checkpointer, run_id)
+        return result
+    finally:
+        release_run_store(run_id)
+
+
+# ============================================================================
+# BATCH REVIEW — many PRs concurrently on one event loop
+# ============================================================================
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("REVIEW_MAX_CONCURRENCY", "8"))
+
+
+def read_pr_urls(source: str) -> List[str]:
+    """
+    Read PR URLs from a file path, or from stdin when source is "-".
+    Each non-empty line is either a bare URL or a JSON object carrying
+    the URL under "pr_url", "url" or "pr_details" (JSONL stream).
+    Lines starting with '#' are ignored.
+    """
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    urls   = []
+    try:
+        for lineno, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    log_warn(AGENT, f"{source}:{lineno} invalid JSON — skipped ({e})")
+                    continue
+                url = record.get("pr_url") or record.get("url") or record.get("pr_details")
+                if not url:
+                    log_warn(AGENT, f"{source}:{lineno} no pr_url/url/pr_details key — skipped")
+                    continue
+                urls.append(url)
+            else:
+                urls.append(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    log_step(AGENT, f"Read {len(urls)} PR URL(s) from {source}")
+    return urls
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank    = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def review_pr(pr_url: str, semaphore: asyncio.Semaphore) -> Dict:
+    """
+    Run one orchestrator_graph invocation under the shared semaphore.
+    Never raises — any failure is captured in the returned result record.
+    """
+    async with semaphore:
+        record = {
+            "pr_url":          pr_url,
+            "run_id":          None,
+            "ok":              False,
+            "error":           None,
+            "elapsed_ms":      0.0,
+            "files_reviewed":  0,
+            "files_skipped":   0,
+            "bugs":            0,
+            "jira_tickets":    0,
+            "comment_posted":  False,
+            "tests_committed": False,
+            "pr_tagged":       False,
+        }
+        # gather() runs each review in its own context, so the id is per PR
+        record["run_id"] = new_run_id()
+        t0 = time.perf_counter()
+        try:
+            result = await orchestrator_graph.ainvoke({"pr_details": pr_url},
+                                                      run_config(record["run_id"]))
+            await forget_run(orchestrator_graph.checkpointer, record["run_id"])
+            llm    = result.get("llm_review_result") or {}
+            record.update({
+                "ok":              True,
+                "files_reviewed":  len(result.get("diffs") or []),
+                "files_skipped":   len(result.get("skipped_files") or []),
+                "bugs":            len(llm.get("bugs") or []),
+                "jira_tickets":    len(result.get("jira_ticket_details") or []),
+                "comment_posted":  bool(result.get("comment_posted")),
+                "tests_committed": bool(result.get("tests_committed")),
+                "pr_tagged":       bool(result.get("pr_tagged")),
+            })
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            log_error(AGENT, f"Review failed for {pr_url}: {record['error']}")
+        finally:
+            release_run_store(record["run_id"])
+        record["elapsed_ms"] = (time.perf_counter() - t0) * 1000
+        return record
+
+
+def summarize_batch(records: List[Dict], wall_s: float) -> Dict:
+    """Aggregate throughput and latency figures for a finished batch."""
+    latencies = [r["elapsed_ms"] for r in records if r["ok"]]
+    succeeded = len(latencies)
+    return {
+        "prs_total":      len(records),
+        "prs_ok":         succeeded,
+        "prs_failed":     len(records) - succeeded,
+        "wall_s":         round(wall_s, 3),
+        "prs_per_minute": round(len(records) / wall_s * 60, 2) if wall_s > 0 else 0.0,
+        "latency_ms": {
+            "min":  round(min(latencies), 1) if latencies else 0.0,
+            "mean": round(sum(latencies) / succeeded, 1) if latencies else 0.0,
+            "p50":  round(_percentile(latencies, 50), 1),
+            "p95":  round(_percentile(latencies, 95), 1),
+            "max":  round(max(latencies), 1) if latencies else 0.0,
+        },
+    }
+
+
+async def review_prs(urls: List[str], max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                     schedule: bool = False) -> Dict:
+    """
+    Review many PRs concurrently, at most max_concurrency at a time.
+    schedule=True starts them in review_scheduler priority order (urgent and
+    small PRs first) instead of input order.
+    Returns {"results": [one record per URL, input order], "summary": {...}}.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be >= 1")
+
+    log_step(AGENT, f"Batch review: {len(urls)} PR(s)  max_concurrency={max_concurrency}  "
+                    f"schedule={'priority' if schedule else 'input order'}")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    t0    = time.perf_counter()
+    order = await priority_order(urls) if schedule else range(len(urls))
+    # Tasks start, and queue on the semaphore, in creation order
+    tasks   = {i: asyncio.ensure_future(review_pr(urls[i], semaphore)) for i in order}
+    records = await asyncio.gather(*(tasks[i] for i in range(len(urls))))
+    summary = summarize_batch(records, time.perf_counter() - t0)
+
+    log_batch_summary(summary)
+    return {"results": list(records), "summary": summary}
+
+
 # ============================================================================
 # MAIN
 # ============================================================================
 
-async def main():
-    data = {"pr_details": "https://github.com/promptlyaig/issue-tracker/pull/1"}
-    await orchestrator_graph.ainvoke(data)
+DEFAULT_PR_URL = "https://github.com/promptlyaig/issue-tracker/pull/1"
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-agent PR review pipeline")
+    parser.add_argument("--pr", action="append", default=[],
+                        help="GitHub PR URL to review (repeatable)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="file of PR URLs or JSONL records ('-' reads stdin)")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help=f"max PRs reviewed at once (default {DEFAULT_MAX_CONCURRENCY})")
+    parser.add_argument("--results", metavar="FILE",
+                        help="write one JSON result record per PR to FILE")
+    parser.add_argument("--metrics-dir", metavar="DIR", default=os.getenv("METRICS_DIR"),
+                        help="write latency histograms (metrics.prom, metrics.json) to DIR")
+    parser.add_argument("--schedule", action="store_true",
+                        help="review urgent and small PRs first (cost from PR metadata)")
+    parser.add_argument("--checkpoint-db", metavar="FILE", default=CHECKPOINT_DB,
+                        help="persist every completed node to this SQLite file (enables --resume)")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="continue a failed checkpointed run from its failed node")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = _parse_args(argv)
+
+    urls = list(args.pr)
+    if args.batch:
+        urls.extend(read_pr_urls(args.batch))
+
+    try:
+        if args.checkpoint_db:
+            await enable_checkpointing(args.checkpoint_db)
+        elif args.resume:
+            raise SystemExit("--resume needs --checkpoint-db (or CHECKPOINT_DB)")
+
+        if args.resume:
+            await resume(args.resume)
+            return
+
+        if not urls and not args.batch:
+            data   = {"pr_details": DEFAULT_PR_URL}
+            run_id = new_run_id()
+            try:
+                await orchestrator_graph.ainvoke(data, run_config(run_id))
+                await forget_run(orchestrator_graph.checkpointer, run_id)
+            finally:
+                release_run_store(run_id)
+            return
+
+        batch = await review_prs(urls, max_concurrency=args.max_concurrency,
+                                 schedule=args.schedule)
+    finally:
+        await mcp_sessions.close_all()
+        if args.checkpoint_db:
+            await close_checkpointer(args.checkpoint_db)
+        if args.metrics_dir:
+            prom_path, json_path = write_metrics(args.metrics_dir)
+            log_ok(AGENT, f"Metrics written to {prom_path} and {json_path}")
+
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            for record in batch["results"]:
+                f.write(json.dumps(record) + "\n")
+        log_ok(AGENT, f"Results written to {args.results}")
 
 if __name__ == "__main__":
     asyncio.run(main())
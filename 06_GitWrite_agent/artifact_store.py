@@ -0,0 +1,164 @@
+"""
+artifact_store.py — Per-run, content-addressed store for patch text
+
+GitReadAgent puts every patch here once; graph state and sub-graph inputs
+carry only its id ("patch_id", the sha256 of the UTF-8 text — the same
+value review_history fingerprints files with and the checkpoint blob table
+is keyed by). Anything that needs the text or the parsed hunks asks the
+store for the current run:
+
+    patch_id = run_store().put(patch)
+    text     = patch_text(diff)             # diff["patch"] or the stored text
+    parsed   = run_store().derived(patch_id, parse_patch)   # computed once per run
+
+Each run (log_backend run id) gets its own store, released by the caller
+when the run ends. A store keeps up to ARTIFACT_MEMORY_MB of text in
+memory and spills the oldest entries to ARTIFACT_SPILL_DIR beyond that
+(ARTIFACT_MEMORY_MB=0 → never spill). With checkpointing enabled, puts
+are also written to the checkpoint database, so a resumed run in a new
+process still finds its patches.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from debug_utils import log_step, get_run_id
+
+AGENT = "ARTIFACTS"
+
+ARTIFACT_MEMORY_MB = float(os.getenv("ARTIFACT_MEMORY_MB", "64"))       # per run
+ARTIFACT_SPILL_DIR = os.getenv("ARTIFACT_SPILL_DIR") or os.path.join(tempfile.gettempdir(),
+                                                                     "pr-review-artifacts")
+
+
+class ArtifactStore:
+    """Content-addressed text for one run: memory first, spill files past the limit."""
+
+    def __init__(self, run_id: str,
+                 memory_limit_mb: float = ARTIFACT_MEMORY_MB,
+                 spill_dir: str = ARTIFACT_SPILL_DIR,
+                 durable=None):
+        self.run_id        = run_id
+        self.memory_limit  = int(memory_limit_mb * 1024 * 1024)
+        self.spill_dir     = os.path.join(spill_dir, run_id)
+        self.durable       = durable        # checkpointing.BlobStore, or None
+
+        self._memory:  "OrderedDict[str, str]" = OrderedDict()   # id → text, oldest first
+        self._sizes:   Dict[str, int]          = {}              # id → UTF-8 bytes
+        self._spilled: Dict[str, str]          = {}              # id → file path
+        self._derived: Dict[Tuple[str, Callable], Any] = {}
+        self.memory_bytes = 0
+        self.puts         = 0
+        self.dedup_hits   = 0
+
+    # ── public API ───────────────────────────────────────────────────────────
+
+    def put(self, text: str) -> str:
+        data = text.encode("utf-8")
+        aid  = hashlib.sha256(data).hexdigest()
+        self.puts += 1
+        if aid in self._sizes:
+            self.dedup_hits += 1
+            return aid
+
+        self._memory[aid]  = text
+        self._sizes[aid]   = len(data)
+        self.memory_bytes += len(data)
+        if self.durable is not None:
+            self.durable.put(text, self.run_id)
+        if self.memory_limit > 0:
+            while self.memory_bytes > self.memory_limit and len(self._memory) > 1:
+                self._spill_oldest()
+        return aid
+
+    def get(self, aid: str) -> str:
+        text = self._memory.get(aid)
+        if text is not None:
+            return text
+        path = self._spilled.get(aid)
+        if path is not None:
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        if self.durable is not None:
+            return self.durable.get(aid)        # resumed run: written by an earlier process
+        raise KeyError(f"artifact {aid[:12]}… not in run {self.run_id}")
+
+    def derived(self, aid: str, fn: Callable[[str], Any]) -> Any:
+        """fn(text), computed once per artifact and run (e.g. diff_hunks.parse_patch)."""
+        key = (aid, fn)
+        if key not in self._derived:
+            self._derived[key] = fn(self.get(aid))
+        return self._derived[key]
+
+    def close(self):
+        if self._spilled:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+        self._memory.clear()
+        self._spilled.clear()
+        self._derived.clear()
+        self.memory_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "artifacts":    len(self._sizes),
+            "puts":         self.puts,
+            "dedup_hits":   self.dedup_hits,
+            "memory_bytes": self.memory_bytes,
+            "spilled":      len(self._spilled),
+        }
+
+    # ── internals ────────────────────────────────────────────────────────────
+
+    def _spill_oldest(self):
+        aid, text = self._memory.popitem(last=False)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, aid)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        self._spilled[aid]  = path
+        self.memory_bytes  -= self._sizes[aid]
+
+
+# ============================================================================
+# PER-RUN REGISTRY
+# ============================================================================
+
+_stores:  Dict[str, ArtifactStore] = {}
+_durable = None
+
+
+def set_durable_store(blobs):
+    """Write every artifact through to blobs (checkpointing.BlobStore); None to stop."""
+    global _durable
+    _durable = blobs
+    for store in _stores.values():
+        store.durable = blobs
+
+
+def run_store(run_id: Optional[str] = None) -> ArtifactStore:
+    """The store of run_id (default: the current run), created on first use."""
+    run_id = run_id or get_run_id()
+    store  = _stores.get(run_id)
+    if store is None:
+        store = _stores[run_id] = ArtifactStore(run_id, durable=_durable)
+    return store
+
+
+def release_run_store(run_id: Optional[str] = None):
+    """Drop a finished run's artifacts (and its spill files)."""
+    store = _stores.pop(run_id or get_run_id(), None)
+    if store is None:
+        return
+    log_step(AGENT, f"Run {store.run_id} artifacts released  {store.stats()}")
+    store.close()
+
+
+def patch_text(record: Dict) -> str:
+    """Patch of a changed-file / diff record: inline "patch", else its "patch_id" artifact."""
+    if record.get("patch") is not None:
+        return record["patch"]
+    aid = record.get("patch_id")
+    return run_store().get(aid) if aid else ""
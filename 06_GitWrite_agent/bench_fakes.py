@@ -0,0 +1,334 @@
+"""
+bench_fakes.py — Offline stand-ins for GitHub MCP, Jira MCP and Gemini
+
+Used by bench_pipeline.py to drive the whole pipeline without network
+access. Every stand-in takes a FaultProfile (latency, jitter, error rate),
+so slow or flaky dependencies can be simulated deterministically.
+
+  GitHub  FastMCP server with the GITHUB_* tools the read and write agents
+          call. Pull requests are synthesised from (owner, repo, number), so
+          any PR URL works and the same URL always yields the same diff.
+  Jira    FastMCP server with CREATE_ISSUE.
+  Gemini  FakeGemini, installed with LLMReviewAgent.set_llm_backend. Its
+          answer names one bug per file inside a changed hunk and streams
+          at a fixed token rate.
+
+Run a server on its own:
+    python bench_fakes.py github --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+    python bench_fakes.py jira   --port 8766
+"""
+
+import re
+import sys
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Callable, Dict, List, Optional
+
+CHARS_PER_TOKEN = 4
+
+EXTENSIONS = ["py", "js", "ts", "go", "java"]
+
+
+class InjectedFault(RuntimeError):
+    """Raised by a stand-in when its FaultProfile decides a call fails."""
+
+
+class FaultProfile:
+    """
+    profile = FaultProfile(latency_ms=80, jitter_ms=40, error_rate=0.02, seed=7)
+    await profile.apply("GITHUB_GET_A_PULL_REQUEST")   # sleeps, may raise InjectedFault
+
+    Each call sleeps latency_ms ± uniform(jitter_ms), then fails with
+    probability error_rate.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms  = jitter_ms
+        self.error_rate = error_rate
+        self.calls      = 0
+        self.failures   = 0
+        self._rng       = random.Random(seed)
+
+    def delay_s(self) -> float:
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    async def apply(self, name: str):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s())
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.failures += 1
+            raise InjectedFault(f"injected failure in {name}")
+
+    @classmethod
+    def from_args(cls, args, prefix: str = "") -> "FaultProfile":
+        return cls(getattr(args, f"{prefix}latency_ms"), getattr(args, f"{prefix}jitter_ms"),
+                   getattr(args, f"{prefix}error_rate"), getattr(args, "seed", None))
+
+    def as_dict(self) -> Dict:
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms,
+                "error_rate": self.error_rate}
+
+
+# ============================================================================
+# SYNTHETIC PULL REQUESTS
+# ============================================================================
+
+def _pr_rng(owner: str, repo: str, pull_number: int, seed: int) -> random.Random:
+    digest = hashlib.sha256(f"{seed}:{owner}/{repo}#{pull_number}".encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _synthetic_patch(rng: random.Random, hunks: int, lines_per_hunk: int) -> Dict:
+    parts, additions, deletions, line = [], 0, 0, 1
+    for h in range(hunks):
+        line += rng.randint(5, 40)
+        added   = rng.randint(1, lines_per_hunk)
+        removed = rng.randint(0, added)
+        body    = ["     context_before()"]
+        body   += [f"-    old_call_{h}_{i}(value)" for i in range(removed)]
+        body   += [f"+    result_{h}_{i} = compute(value, {rng.randint(0, 99)})" for i in range(added)]
+        body   += ["     context_after()"]
+        parts.append(f"@@ -{line},{removed + 2} +{line},{added + 2} @@ def handler_{h}(value):")
+        parts.extend(body)
+        additions += added
+        deletions += removed
+        line      += added + 2
+    return {"patch": "\n".join(parts) + "\n", "additions": additions, "deletions": deletions}
+
+
+def synthetic_pr_files(owner: str, repo: str, pull_number: int, seed: int = 0,
+                       min_files: int = 1, max_files: int = 12,
+                       max_hunks: int = 4, lines_per_hunk: int = 12) -> List[Dict]:
+    """GitHub-shaped file records for a PR, fully determined by its arguments."""
+    rng   = _pr_rng(owner, repo, pull_number, seed)
+    files = []
+    for i in range(rng.randint(min_files, max_files)):
+        ext    = rng.choice(EXTENSIONS)
+        diff   = _synthetic_patch(rng, rng.randint(1, max_hunks), lines_per_hunk)
+        files.append({
+            "filename":  f"src/module_{pull_number}_{i}.{ext}",
+            "status":    "modified" if rng.random() < 0.8 else "added",
+            "additions": diff["additions"],
+            "deletions": diff["deletions"],
+            "changes":   diff["additions"] + diff["deletions"],
+            "patch":     diff["patch"],
+        })
+    return files
+
+
+def _envelope(details) -> str:
+    """Composio-style response body, as the real GitHub MCP server returns it."""
+    return json.dumps({"data": {"details": details}, "successful": True, "error": None})
+
+
+def _sha(*parts) -> str:
+    return hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()
+
+
+# ============================================================================
+# MCP SERVERS
+# ============================================================================
+
+def build_github_server(profile: FaultProfile, seed: int = 0,
+                        min_files: int = 1, max_files: int = 12):
+    """FastMCP server implementing the GITHUB_* tools used by the agents."""
+    from fastmcp import FastMCP
+
+    mcp = FastMCP("fake-github")
+
+    def files_for(owner: str, repo: str, pull_number: int) -> List[Dict]:
+        return synthetic_pr_files(owner, repo, pull_number, seed, min_files, max_files)
+
+    @mcp.tool(name="GITHUB_LIST_PULL_REQUESTS_FILES")
+    async def list_files(owner: str, repo: str, pull_number: int,
+                         page: int = 1, per_page: int = 30) -> str:
+        await profile.apply("GITHUB_LIST_PULL_REQUESTS_FILES")
+        files = files_for(owner, repo, pull_number)
+        return _envelope(files[(page - 1) * per_page: page * per_page])
+
+    @mcp.tool(name="GITHUB_GET_A_PULL_REQUEST")
+    async def get_pull_request(owner: str, repo: str, pull_number: int) -> str:
+        await profile.apply("GITHUB_GET_A_PULL_REQUEST")
+        files = files_for(owner, repo, pull_number)
+        return _envelope({
+            "number":        pull_number,
+            "state":         "open",
+            "changed_files": len(files),
+            "additions":     sum(f["additions"] for f in files),
+            "deletions":     sum(f["deletions"] for f in files),
+            "head":          {"sha": _sha(owner, repo, pull_number, "head")},
+            "base":          {"repo": {"default_branch": "main"}},
+        })
+
+    @mcp.tool(name="GITHUB_CREATE_A_BLOB")
+    async def create_blob(owner: str, repo: str, content: str, encoding: str = "utf-8") -> str:
+        await profile.apply("GITHUB_CREATE_A_BLOB")
+        return _envelope({"sha": _sha("blob", content)})
+
+    @mcp.tool(name="GITHUB_GET_A_REFERENCE")
+    async def get_reference(owner: str, repo: str, ref: str) -> str:
+        await profile.apply("GITHUB_GET_A_REFERENCE")
+        return _envelope({"ref": f"refs/{ref}", "object": {"sha": _sha(owner, repo, ref)}})
+
+    @mcp.tool(name="GITHUB_GET_A_TREE")
+    async def get_tree(owner: str, repo: str, tree_sha: str, recursive: bool = False) -> str:
+        await profile.apply("GITHUB_GET_A_TREE")
+        return _envelope({"sha": _sha("tree", tree_sha), "tree": []})
+
+    @mcp.tool(name="GITHUB_CREATE_A_TREE")
+    async def create_tree(owner: str, repo: str, tree: list, base_tree: str = "") -> str:
+        await profile.apply("GITHUB_CREATE_A_TREE")
+        return _envelope({"sha": _sha("tree", base_tree, json.dumps(tree, sort_keys=True))})
+
+    @mcp.tool(name="GITHUB_CREATE_A_COMMIT")
+    async def create_commit(owner: str, repo: str, message: str, tree: str,
+                            parents: Optional[list] = None) -> str:
+        await profile.apply("GITHUB_CREATE_A_COMMIT")
+        return _envelope({"sha": _sha("commit", tree, parents)})
+
+    @mcp.tool(name="GITHUB_UPDATE_A_REFERENCE")
+    async def update_reference(owner: str, repo: str, ref: str, sha: str, force: bool = False) -> str:
+        await profile.apply("GITHUB_UPDATE_A_REFERENCE")
+        return _envelope({"ref": f"refs/{ref}", "object": {"sha": sha}})
+
+    @mcp.tool(name="GITHUB_CREATE_OR_UPDATE_FILE_CONTENTS")
+    async def create_or_update_file(owner: str, repo: str, path: str, message: str,
+                                    content: str, branch: str = "", sha: str = "") -> str:
+        await profile.apply("GITHUB_CREATE_OR_UPDATE_FILE_CONTENTS")
+        return _envelope({"content": {"path": path, "sha": _sha("blob", content)},
+                          "commit":  {"sha": _sha("commit", path, content)}})
+
+    return mcp
+
+
+def build_jira_server(profile: FaultProfile, project_key: str = "PROM"):
+    """FastMCP server implementing CREATE_ISSUE with sequential ticket keys."""
+    from fastmcp import FastMCP
+
+    mcp     = FastMCP("fake-jira")
+    counter = {"next": 1}
+
+    @mcp.tool(name="CREATE_ISSUE")
+    async def create_issue(project_key: str, summary: str, description: str = "",
+                           issuetype: str = "Bug", priority: str = "Medium") -> str:
+        await profile.apply("CREATE_ISSUE")
+        key = f"{project_key}-{counter['next']}"
+        counter["next"] += 1
+        return json.dumps({"key": key, "summary": summary, "priority": priority})
+
+    return mcp
+
+
+# ============================================================================
+# GEMINI
+# ============================================================================
+
+_FILE_HEADER = re.compile(r"^=== File: (.+?) ===$", re.MULTILINE)
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@", re.MULTILINE)
+
+
+class FakeGemini:
+    """
+    set_llm_backend(FakeGemini(FaultProfile(latency_ms=900, jitter_ms=300)))
+
+    Answers a review prompt (combined or per-language) with valid JSON: one
+    bug and one test per file found in the prompt, located on the file's
+    first changed line. After the profile's latency (time to first token), the text is
+    produced at tokens_per_s, in pieces when the caller streams.
+    """
+
+    def __init__(self, profile: FaultProfile, tokens_per_s: float = 400.0,
+                 stream_pieces: int = 16):
+        self.profile       = profile
+        self.tokens_per_s  = tokens_per_s
+        self.stream_pieces = stream_pieces
+
+    def respond(self, prompt: str) -> str:
+        headers   = list(_FILE_HEADER.finditer(prompt))
+        bugs, tests = [], []
+        for i, m in enumerate(headers):
+            section = prompt[m.end(): headers[i + 1].start() if i + 1 < len(headers) else len(prompt)]
+            hunk    = _HUNK_HEADER.search(section)
+            line    = int(hunk.group(1)) + 1 if hunk else 1
+            fname   = m.group(1)
+            bugs.append({
+                "severity":    ("high", "medium", "low")[i % 3],
+                "type":        f"unchecked_value_{i}",
+                "description": f"Return value of compute() in {fname} is used without validation.",
+                "location":    f"{fname}:{line}",
+                "suggestion":  "Validate the result before using it.",
+            })
+            tests.append({
+                "test_name":   f"test_compute_result_{i}",
+                "description": f"compute() result in {fname} is validated",
+                "test_code":   f"def test_compute_result_{i}():\n    assert compute(1, 2) is not None\n",
+                "covers_bug":  f"unchecked_value_{i}",
+            })
+        return json.dumps({
+            "review_comments": {
+                "summary":           f"Synthetic review of {len(headers)} file(s).",
+                "bugs":              [{"severity": b["severity"], "title": b["type"],
+                                       "description": b["description"],
+                                       "suggestion": b["suggestion"]} for b in bugs],
+                "quality_issues":    [],
+                "security_issues":   [],
+                "positive_feedback": ["Consistent naming."],
+            },
+            "bugs_found":       bugs,
+            "test_suggestions": {"test_framework": "pytest", "test_cases": tests},
+        }, indent=2)
+
+    async def __call__(self, prompt: str, on_text: Optional[Callable[[str], None]] = None) -> str:
+        await self.profile.apply("gemini")
+        text     = self.respond(prompt)
+        duration = len(text) / CHARS_PER_TOKEN / self.tokens_per_s if self.tokens_per_s else 0.0
+        if on_text is None:
+            await asyncio.sleep(duration)
+            return text
+        step = max(1, -(-len(text) // self.stream_pieces))
+        for start in range(0, len(text), step):
+            await asyncio.sleep(duration / self.stream_pieces)
+            on_text(text[start:start + step])
+        return text
+
+
+# ============================================================================
+# MAIN — run one MCP stand-in
+# ============================================================================
+
+def add_fault_args(parser: argparse.ArgumentParser, prefix: str = "",
+                   latency_ms: float = 0.0, jitter_ms: float = 0.0):
+    flag = f"--{prefix.replace('_', '-')}"
+    parser.add_argument(f"{flag}latency-ms", type=float, default=latency_ms)
+    parser.add_argument(f"{flag}jitter-ms",  type=float, default=jitter_ms)
+    parser.add_argument(f"{flag}error-rate", type=float, default=0.0)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run an offline MCP stand-in.")
+    parser.add_argument("server", choices=["github", "jira"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-files", type=int, default=1)
+    parser.add_argument("--max-files", type=int, default=12)
+    add_fault_args(parser)
+    args = parser.parse_args(argv)
+
+    profile = FaultProfile.from_args(args)
+    if args.server == "github":
+        mcp = build_github_server(profile, args.seed, args.min_files, args.max_files)
+    else:
+        mcp = build_jira_server(profile)
+    mcp.run(transport="http", host=args.host, port=args.port, path="/mcp")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+bench_pipeline.py — Offline end-to-end throughput benchmark
+
+Starts the GitHub and Jira stand-ins from bench_fakes.py as local MCP
+servers, swaps Gemini for FakeGemini, and drives orchestrator_graph over a
+synthetic PR corpus with review_prs(). Reports PRs/minute, end-to-end
+latency, per-phase (orchestrator node) latency and external-call latency
+from the metrics registry.
+
+Caches, the bug index and incremental review are disabled so every run
+does the full amount of work.
+
+Usage:
+    python bench_pipeline.py [--prs 40] [--concurrency 8] [--max-files 12]
+                             [--github-latency-ms 80] [--gemini-latency-ms 900]
+                             [--gemini-error-rate 0.05] [--stream] [--out report.json]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+from bench_fakes import FaultProfile, FakeGemini, add_fault_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Applied before the pipeline modules are imported (they read env at import)
+BENCH_ENV = {
+    "RENDER_GRAPHS":      "0",
+    "LLM_CACHE_BYPASS":   "1",
+    "BUG_INDEX_BYPASS":   "1",
+    "INCREMENTAL_REVIEW": "0",
+    "GEMINI_API_KEY":     "offline-benchmark",
+    "LOG_LEVEL":          "WARNING",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, proc: subprocess.Popen, timeout_s: float = 20.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"stand-in on port {port} exited with code {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"stand-in on port {port} did not start within {timeout_s:.0f}s")
+
+
+def start_stand_in(server: str, profile: FaultProfile, extra: List[str]) -> Tuple[subprocess.Popen, str]:
+    """Launch one bench_fakes MCP server; returns (process, MCP URL)."""
+    port = _free_port()
+    cmd  = [sys.executable, os.path.join(HERE, "bench_fakes.py"), server, "--port", str(port),
+            "--latency-ms", str(profile.latency_ms), "--jitter-ms", str(profile.jitter_ms),
+            "--error-rate", str(profile.error_rate), *extra]
+    proc = subprocess.Popen(cmd, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_for_port(port, proc)
+    return proc, f"http://127.0.0.1:{port}/mcp"
+
+
+def synthetic_pr_urls(count: int, repos: int) -> List[str]:
+    return [f"https://github.com/bench-org/repo-{i % repos}/pull/{i + 1}" for i in range(count)]
+
+
+def phase_report(exported: Dict, graph: str) -> Dict[str, Dict]:
+    """Node latency summaries of one graph, keyed by node name."""
+    from metrics import NODE_METRIC
+    return {s["labels"]["node"]: {k: v for k, v in s.items() if k != "labels"}
+            for s in exported.get(NODE_METRIC, []) if s["labels"].get("graph") == graph}
+
+
+def call_report(exported: Dict) -> Dict[str, Dict]:
+    """External call summaries keyed by "kind:name:outcome"."""
+    from metrics import CALL_METRIC
+    return {f"{s['labels']['kind']}:{s['labels']['name']}:{s['labels']['outcome']}":
+            {k: v for k, v in s.items() if k != "labels"}
+            for s in exported.get(CALL_METRIC, [])}
+
+
+async def run_benchmark(args) -> Dict:
+    from Orchestrator import review_prs, AGENT as ORCH_GRAPH
+    from LLMReviewAgent import set_llm_backend
+    from mcp_session_manager import mcp_sessions
+    from metrics import metrics
+
+    gemini = FakeGemini(FaultProfile.from_args(args, "gemini_"), tokens_per_s=args.gemini_tokens_per_s)
+    set_llm_backend(gemini)
+    metrics.reset()
+    try:
+        batch = await review_prs(synthetic_pr_urls(args.prs, args.repos),
+                                 max_concurrency=args.concurrency)
+    finally:
+        set_llm_backend(None)
+        await mcp_sessions.close_all()
+
+    exported = metrics.export_json()
+    return {
+        "config": {
+            "prs":         args.prs,
+            "concurrency": args.concurrency,
+            "files":       [args.min_files, args.max_files],
+            "streaming":   args.stream,
+            "github":      FaultProfile.from_args(args, "github_").as_dict(),
+            "jira":        FaultProfile.from_args(args, "jira_").as_dict(),
+            "gemini":      {**gemini.profile.as_dict(), "tokens_per_s": args.gemini_tokens_per_s},
+        },
+        "summary":  batch["summary"],
+        "phases":   phase_report(exported, ORCH_GRAPH),
+        "calls":    call_report(exported),
+        "failures": [r for r in batch["results"] if not r["ok"]][:10],
+    }
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark.")
+    parser.add_argument("--prs", type=int, default=40)
+    parser.add_argument("--repos", type=int, default=4, help="spread PRs over this many repos")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-files", type=int, default=1)
+    parser.add_argument("--max-files", type=int, default=12)
+    parser.add_argument("--stream", action="store_true", help="set LLM_STREAMING=1")
+    parser.add_argument("--gemini-tokens-per-s", type=float, default=400.0)
+    parser.add_argument("--out", metavar="FILE", help="also write the JSON report to FILE")
+    add_fault_args(parser, "github_", latency_ms=80, jitter_ms=40)
+    add_fault_args(parser, "jira_",   latency_ms=150, jitter_ms=50)
+    add_fault_args(parser, "gemini_", latency_ms=900, jitter_ms=300)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+
+    corpus = ["--seed", str(args.seed), "--min-files", str(args.min_files),
+              "--max-files", str(args.max_files)]
+    procs  = []
+    try:
+        github, github_url = start_stand_in("github", FaultProfile.from_args(args, "github_"), corpus)
+        procs.append(github)
+        jira, jira_url     = start_stand_in("jira", FaultProfile.from_args(args, "jira_"), [])
+        procs.append(jira)
+
+        os.environ.update(BENCH_ENV)
+        os.environ["GITHUB_MCP_SERVER_URL"] = github_url
+        os.environ["JIRA_MCP_SERVER_URL"]   = jira_url
+        os.environ["LLM_STREAMING"]         = "1" if args.stream else "0"
+
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0 if report["summary"]["prs_ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+bench_startup.py — Cold-start benchmark for a review worker
+
+Imports Orchestrator (which builds all five graphs) in a fresh interpreter
+several times and reports the wall time. Fails when the median exceeds
+the target, or when a heavy dependency is imported eagerly.
+
+Usage:
+    python bench_startup.py [--runs 5] [--target-ms 1500] [--module Orchestrator]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Loaded only when a real call needs them — must not be imported at startup
+LAZY_MODULES = ["google.generativeai", "fastmcp"]
+
+STARTUP_TARGET_MS = float(os.getenv("STARTUP_TARGET_MS", "1500"))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{
+    "import_ms": elapsed_ms,
+    "eager":     [m for m in {lazy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_once(module: str) -> dict:
+    """Import module in a fresh interpreter with graph rendering disabled."""
+    env = {**os.environ, "RENDER_GRAPHS": "0"}
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True,
+    )
+    # Module-level logging may print first — the probe's JSON is the last line
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure worker cold-start time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=STARTUP_TARGET_MS)
+    parser.add_argument("--module", default="Orchestrator")
+    args = parser.parse_args(argv)
+
+    samples, eager = [], set()
+    for _ in range(args.runs):
+        result = measure_once(args.module)
+        samples.append(result["import_ms"])
+        eager.update(result["eager"])
+
+    median = statistics.median(samples)
+    print(json.dumps({
+        "module":    args.module,
+        "runs":      args.runs,
+        "min_ms":    round(min(samples), 1),
+        "median_ms": round(median, 1),
+        "max_ms":    round(max(samples), 1),
+        "target_ms": args.target_ms,
+        "eager":     sorted(eager),
+    }, indent=2))
+
+    if eager:
+        print(f"FAIL: heavy modules imported at startup: {sorted(eager)}")
+        return 1
+    if median > args.target_ms:
+        print(f"FAIL: median cold start {median:.0f}ms > target {args.target_ms:.0f}ms")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+bug_index.py — Persistent duplicate-bug index for the Jira agent
+
+Maps bug fingerprints to the Jira tickets already filed for them, so
+re-reviews and findings that recur across stacked PRs reuse the existing
+ticket instead of calling CREATE_ISSUE again.
+
+Fingerprint = normalized type + normalized location (file path, line number
+dropped so shifted code still matches) + MinHash signature over word
+shingles of the description. A bug matches an indexed one when type and
+path are equal and the estimated Jaccard similarity of the descriptions is
+at least BUG_INDEX_SIMILARITY.
+
+find() is the one answer to "is this bug already ticketed?" for both the
+orchestrator and the Jira agent. Its fast path is the PR's review history
+(review_history.known_tickets, exact type + location); a hit there is
+copied into the index so both stay in agreement. SQLite work runs in a
+worker thread (asyncio.to_thread), off the event loop.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+from review_history import known_tickets
+from debug_utils import log_step, log_warn
+
+AGENT = "BUG-INDEX"
+
+BUG_INDEX_PATH       = os.getenv("BUG_INDEX_PATH", ".cache/bug_index.sqlite3")
+BUG_INDEX_SIMILARITY = float(os.getenv("BUG_INDEX_SIMILARITY", "0.7"))
+BUG_INDEX_BYPASS     = os.getenv("BUG_INDEX_BYPASS", "").lower() in ("1", "true", "yes")
+
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE         = 2
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH       = (1 << 32) - 1
+_rng            = random.Random(0x5EED)          # fixed seed → stable signatures across runs
+_PERMUTATIONS   = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                   for _ in range(MINHASH_PERMUTATIONS)]
+
+
+# ============================================================================
+# FINGERPRINTS
+# ============================================================================
+
+def normalize_type(bug: Dict) -> str:
+    raw = str(bug.get("type") or bug.get("bug_type") or "").lower()
+    return re.sub(r"[^a-z0-9]+", "_", raw).strip("_")
+
+
+def normalize_location(bug: Dict) -> str:
+    """File path of "path/to/file.py:42" — lowercased, slashes unified, line dropped."""
+    location = str(bug.get("location") or "").strip().lower().replace("\\", "/")
+    path     = re.sub(r"(:\d+)+(-\d+)?$", "", location)
+    return re.sub(r"^(\./)+", "", path)
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9_]+", text.lower())
+
+
+def minhash_signature(text: str) -> array:
+    """MinHash over word shingles; short texts fall back to single tokens."""
+    tokens   = _tokens(text)
+    n        = SHINGLE_SIZE if len(tokens) >= SHINGLE_SIZE else 1
+    shingles = {" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)} or {""}
+    hashes   = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                for s in shingles]
+    return array("Q", [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ])
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    if len(sig_a) != len(sig_b) or not sig_a:
+        return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class BugFingerprint:
+    __slots__ = ("bug_type", "path", "desc_hash", "signature")
+
+    def __init__(self, bug: Dict):
+        description    = " ".join(_tokens(str(bug.get("description") or "")))
+        self.bug_type  = normalize_type(bug)
+        self.path      = normalize_location(bug)
+        self.desc_hash = hashlib.sha256(description.encode("utf-8")).hexdigest()
+        self.signature = minhash_signature(description)
+
+    def matches(self, other: "BugFingerprint", threshold: float = BUG_INDEX_SIMILARITY) -> bool:
+        if (self.bug_type, self.path) != (other.bug_type, other.path):
+            return False
+        return self.desc_hash == other.desc_hash or \
+               similarity(self.signature, other.signature) >= threshold
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bugs (
+    id           INTEGER PRIMARY KEY,
+    project_key  TEXT NOT NULL,
+    bug_type     TEXT NOT NULL,
+    path         TEXT NOT NULL,
+    desc_hash    TEXT NOT NULL,
+    signature    BLOB NOT NULL,
+    ticket_key   TEXT NOT NULL,
+    ticket_url   TEXT NOT NULL,
+    severity     TEXT,
+    created_at   REAL NOT NULL,
+    last_seen_at REAL NOT NULL,
+    hits         INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS bugs_lookup ON bugs (project_key, bug_type, path);
+"""
+
+
+class BugIndex:
+    """
+    index = BugIndex()
+    hit   = await index.find(project_key, bug, history=history)   # {"ticket_key", "ticket_url", ...} or None
+    await index.remember(project_key, fingerprint, ticket)       # after CREATE_ISSUE succeeds
+
+    lookup() / add() are the blocking versions (sqlite3, serialised by a lock).
+    """
+
+    def __init__(self,
+                 path: str = BUG_INDEX_PATH,
+                 threshold: float = BUG_INDEX_SIMILARITY,
+                 bypass: bool = BUG_INDEX_BYPASS):
+        self.path      = path
+        self.threshold = threshold
+        self.bypass    = bypass
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock      = threading.Lock()
+
+        self.hits   = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            try:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.executescript(_SCHEMA)
+            except sqlite3.Error as e:
+                log_warn(AGENT, f"Bug index unavailable at {self.path}: {e}")
+                self.bypass = True
+                return None
+        return self._conn
+
+    # ── async API (event loop) ───────────────────────────────────────────────
+
+    async def find(self, project_key: str, bug: Dict, fp: Optional[BugFingerprint] = None,
+                   history: Optional[Dict] = None) -> Optional[Dict]:
+        """Ticket already filed for bug: the PR's history first, then the index."""
+        fp = fp or BugFingerprint(bug)
+        if history:
+            recorded, _ = known_tickets(history, [bug])
+            if recorded:
+                ticket = recorded[0]
+                self.hits += 1
+                await asyncio.to_thread(self.add, project_key, fp, ticket, True)
+                return {"ticket_key": ticket["ticket_key"], "ticket_url": ticket["ticket_url"],
+                        "severity": ticket.get("severity"), "similarity": 1.0}
+        return await asyncio.to_thread(self.lookup, project_key, fp)
+
+    async def remember(self, project_key: str, fp: BugFingerprint, ticket: Dict):
+        await asyncio.to_thread(self.add, project_key, fp, ticket)
+
+    # ── blocking API (worker thread) ─────────────────────────────────────────
+
+    def lookup(self, project_key: str, fp: BugFingerprint) -> Optional[Dict]:
+        """Best indexed ticket for fp (exact description first, then nearest MinHash)."""
+        with self._lock:
+            return self._lookup(project_key, fp)
+
+    def _lookup(self, project_key: str, fp: BugFingerprint) -> Optional[Dict]:
+        conn = None if self.bypass else self._connect()
+        if conn is None:
+            self.misses += 1
+            return None
+
+        rows = conn.execute(
+            "SELECT id, desc_hash, signature, ticket_key, ticket_url, severity "
+            "FROM bugs WHERE project_key = ? AND bug_type = ? AND path = ?",
+            (project_key, fp.bug_type, fp.path),
+        ).fetchall()
+
+        best: Optional[Tuple[float, tuple]] = None
+        for row in rows:
+            if row[1] == fp.desc_hash:
+                best = (1.0, row)
+                break
+            score = similarity(fp.signature, array("Q", row[2]))
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, row)
+
+        if best is None:
+            self.misses += 1
+            return None
+
+        score, row = best
+        with conn:
+            conn.execute("UPDATE bugs SET hits = hits + 1, last_seen_at = ? WHERE id = ?",
+                         (time.time(), row[0]))
+        self.hits += 1
+        log_step(AGENT, f"Duplicate of {row[3]}  (similarity {score:.2f})")
+        return {"ticket_key": row[3], "ticket_url": row[4], "severity": row[5],
+                "similarity": round(score, 3)}
+
+    def add(self, project_key: str, fp: BugFingerprint, ticket: Dict, if_missing: bool = False):
+        """Index ticket under fp; if_missing → only when the ticket is not indexed yet."""
+        with self._lock:
+            self._add(project_key, fp, ticket, if_missing)
+
+    def _add(self, project_key: str, fp: BugFingerprint, ticket: Dict, if_missing: bool):
+        conn = None if self.bypass else self._connect()
+        if conn is None:
+            return
+        if if_missing and conn.execute(
+                "SELECT 1 FROM bugs WHERE project_key = ? AND ticket_key = ? LIMIT 1",
+                (project_key, ticket["ticket_key"])).fetchone():
+            return
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT INTO bugs (project_key, bug_type, path, desc_hash, signature, "
+                "ticket_key, ticket_url, severity, created_at, last_seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (project_key, fp.bug_type, fp.path, fp.desc_hash, fp.signature.tobytes(),
+                 ticket["ticket_key"], ticket["ticket_url"], ticket.get("severity"), now, now),
+            )
+        self.writes += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits":   self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Process-wide index used by JiraTicketAgent
+bug_index = BugIndex()
@@ -0,0 +1,330 @@
+"""
+checkpointing.py — Durable, compact LangGraph checkpoints for the orchestrator
+
+With CHECKPOINT_DB set, orchestrator_graph is compiled with a SQLite
+checkpointer (langgraph-checkpoint-sqlite + aiosqlite, imported only then).
+Every completed node is persisted under the run's thread_id (= run id), so a
+run that failed in GIT_WRITE_AGENT can be resumed with Orchestrator.resume()
+without redoing the Git read, the Gemini review or the Jira tickets.
+
+LangGraph stores the full state at every step. To keep that compact,
+CompactSerializer moves every long string (review comments, generated
+tests) into a content-addressed `checkpoint_blobs` table in the same
+database and leaves a {"__blob__": sha} reference in the checkpoint, so a
+string is written once per run no matter how many steps or state keys hold
+it. Patches are not in the state at all: the run's artifact store writes
+them through to the same table, keyed by their patch_id, so a resumed run
+reads them back from there. Parsed hunks (diff_hunks.ParsedPatch) are
+dropped and re-parsed from the patch on demand.
+
+Blobs are written by a background thread (WAL mode, so it and the saver's
+aiosqlite connection never trip over each other's locks), and each one is
+referenced by the run that stored it. A completed run's checkpoints are
+deleted along with the blobs only it used (forget_run); blobs of runs whose
+checkpoints are gone are pruned when the checkpointer opens.
+"""
+
+import os
+import queue
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from diff_hunks import ParsedPatch
+from artifact_store import set_durable_store
+from debug_utils import log_ok, log_step, log_warn, get_run_id
+
+AGENT = "CHECKPOINT"
+
+CHECKPOINT_DB             = os.getenv("CHECKPOINT_DB")        # unset → no checkpointing
+CHECKPOINT_BLOB_MIN_CHARS = int(os.getenv("CHECKPOINT_BLOB_MIN_CHARS", "1024"))
+CHECKPOINT_KEEP_COMPLETED = os.getenv("CHECKPOINT_KEEP_COMPLETED", "").lower() in ("1", "true", "yes")
+
+BLOB_KEY = "__blob__"
+
+# WAL: readers never block the writer, and the blob writer and the saver's
+# aiosqlite connection wait for each other instead of failing with "locked"
+_PRAGMAS = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous  = NORMAL;
+PRAGMA busy_timeout = 10000;
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+    sha  TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint_blob_refs (
+    sha       TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    PRIMARY KEY (sha, thread_id)
+);
+CREATE INDEX IF NOT EXISTS checkpoint_blob_refs_thread ON checkpoint_blob_refs (thread_id);
+"""
+
+_STOP = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.executescript(_PRAGMAS)
+    return conn
+
+
+class BlobStore:
+    """
+    Content-addressed strings in the checkpoint database. put() only queues:
+    a writer thread with its own connection inserts the blob together with a
+    reference from the run (checkpoint thread) that stored it, so the event
+    loop never waits on SQLite. Blobs still queued are served from memory.
+    drop_thread() / prune() delete blobs no retained checkpoint references.
+    """
+
+    def __init__(self, path: str):
+        self.path    = path
+        self._reader = _connect(path)
+        self._reader.executescript(_SCHEMA)
+        self._read_lock = threading.Lock()
+
+        self._pending: Dict[str, str] = {}    # sha → text queued, not yet committed
+        self._pending_lock            = threading.Lock()
+        self._refs: set               = set()  # (sha, thread_id) queued this process
+        self._queue: "queue.Queue"    = queue.Queue()
+        self._thread = threading.Thread(target=self._drain, name="checkpoint-blobs", daemon=True)
+        self._thread.start()
+        self.writes  = 0
+        self.deleted = 0
+
+    # ── event-loop side ──────────────────────────────────────────────────────
+
+    def put(self, text: str, thread_id: Optional[str] = None) -> str:
+        sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        ref = (sha, thread_id or get_run_id())
+        with self._pending_lock:
+            if ref in self._refs:
+                return sha
+            self._refs.add(ref)
+            self._pending.setdefault(sha, text)
+        self._queue.put((ref, text))
+        return sha
+
+    def get(self, sha: str) -> str:
+        with self._pending_lock:
+            text = self._pending.get(sha)
+        if text is not None:
+            return text
+        with self._read_lock:
+            row = self._reader.execute("SELECT data FROM checkpoint_blobs WHERE sha = ?", (sha,)).fetchone()
+        if row is None:
+            raise KeyError(f"checkpoint blob {sha[:12]}… missing from {self.path}")
+        return row[0]
+
+    # ── blocking (call through asyncio.to_thread) ────────────────────────────
+
+    def flush(self, timeout: float = 30.0):
+        """Block until every blob queued so far is committed."""
+        self._call(lambda conn: None, timeout)
+
+    def drop_thread(self, thread_id: str) -> int:
+        """Forget thread_id's references; delete the blobs nothing else references."""
+        with self._pending_lock:
+            self._refs = {r for r in self._refs if r[1] != thread_id}
+        return self._call(lambda conn: self._delete_refs(
+            conn, "SELECT sha FROM checkpoint_blob_refs WHERE thread_id = ?", (thread_id,),
+            "DELETE FROM checkpoint_blob_refs WHERE thread_id = ?"))
+
+    def prune(self) -> int:
+        """Drop references of threads with no checkpoint left (and their unshared blobs)."""
+        dead = "thread_id NOT IN (SELECT DISTINCT thread_id FROM checkpoints)"
+        return self._call(lambda conn: self._delete_refs(
+            conn, f"SELECT sha FROM checkpoint_blob_refs WHERE {dead}", (),
+            f"DELETE FROM checkpoint_blob_refs WHERE {dead}"))
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=30.0)
+        self._reader.close()
+
+    # ── writer thread ────────────────────────────────────────────────────────
+
+    def _call(self, fn, timeout: Optional[float] = None):
+        done, box = threading.Event(), {}
+        self._queue.put((fn, done, box))
+        done.wait(timeout)
+        if "error" in box:
+            raise box["error"]
+        return box.get("result")
+
+    def _delete_refs(self, conn: sqlite3.Connection, select_sql: str, params: tuple,
+                     delete_sql: str) -> int:
+        shas = [r[0] for r in conn.execute(select_sql, params).fetchall()]
+        with conn:
+            conn.execute(delete_sql, params)
+            deleted = conn.executemany(
+                "DELETE FROM checkpoint_blobs WHERE sha = ? AND sha NOT IN "
+                "(SELECT sha FROM checkpoint_blob_refs)", [(sha,) for sha in set(shas)]).rowcount
+        self.deleted += max(deleted, 0)
+        return max(deleted, 0)
+
+    def _drain(self):
+        conn = _connect(self.path)
+        try:
+            while True:
+                items = [self._queue.get()]
+                while not self._queue.empty():       # commit everything queued at once
+                    items.append(self._queue.get_nowait())
+                blobs = [item for item in items if item is not _STOP and len(item) == 2]
+                if blobs:
+                    self._write(conn, blobs)
+                for item in items:
+                    if item is _STOP:
+                        return
+                    if len(item) == 3:
+                        fn, done, box = item
+                        try:
+                            box["result"] = fn(conn)
+                        except Exception as e:
+                            box["error"] = e
+                        done.set()
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, blobs: list):
+        try:
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO checkpoint_blobs (sha, data) VALUES (?, ?)",
+                                 [(sha, text) for (sha, _), text in blobs])
+                conn.executemany("INSERT OR IGNORE INTO checkpoint_blob_refs (sha, thread_id) "
+                                 "VALUES (?, ?)", [ref for ref, _ in blobs])
+        except sqlite3.Error as e:
+            log_warn(AGENT, f"Could not write {len(blobs)} checkpoint blob(s): {e}")
+            return
+        self.writes += len(blobs)
+        with self._pending_lock:
+            for (sha, _), _ in blobs:
+                self._pending.pop(sha, None)
+
+
+class CompactSerializer:
+    """
+    LangGraph serializer (dumps_typed / loads_typed) that wraps the default
+    JsonPlusSerializer and swaps long strings for blob references.
+    """
+
+    def __init__(self, blobs: BlobStore, inner=None, min_chars: int = CHECKPOINT_BLOB_MIN_CHARS):
+        if inner is None:
+            from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+            inner = JsonPlusSerializer()
+        self.blobs     = blobs
+        self.inner     = inner
+        self.min_chars = min_chars
+
+    def _pack(self, obj: Any) -> Any:
+        if isinstance(obj, str):
+            return {BLOB_KEY: self.blobs.put(obj)} if len(obj) >= self.min_chars else obj
+        if isinstance(obj, ParsedPatch):
+            return None                  # diff_hunks() re-parses it from the patch
+        if isinstance(obj, dict):
+            return {k: self._pack(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [self._pack(v) for v in obj]
+        if isinstance(obj, tuple):
+            return tuple(self._pack(v) for v in obj)
+        return obj
+
+    def _unpack(self, obj: Any) -> Any:
+        if isinstance(obj, dict):
+            if len(obj) == 1 and BLOB_KEY in obj:
+                return self.blobs.get(obj[BLOB_KEY])
+            return {k: self._unpack(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [self._unpack(v) for v in obj]
+        if isinstance(obj, tuple):
+            return tuple(self._unpack(v) for v in obj)
+        return obj
+
+    def dumps_typed(self, obj: Any):
+        return self.inner.dumps_typed(self._pack(obj))
+
+    def loads_typed(self, data) -> Any:
+        return self._unpack(self.inner.loads_typed(data))
+
+    # Untyped API, still used by some saver versions for metadata
+    def dumps(self, obj: Any) -> bytes:
+        return self.inner.dumps(self._pack(obj))
+
+    def loads(self, data: bytes) -> Any:
+        return self._unpack(self.inner.loads(data))
+
+
+_open: Dict[str, Any] = {}     # path → (saver, connection, blobs)
+
+
+def _blob_flushing_saver(saver_cls):
+    """saver_cls whose puts return only once the blobs they reference are committed."""
+
+    class BlobFlushingSaver(saver_cls):
+        async def aput(self, *args, **kwargs):
+            result = await super().aput(*args, **kwargs)
+            await asyncio.to_thread(self.serde.blobs.flush)
+            return result
+
+        async def aput_writes(self, *args, **kwargs):
+            result = await super().aput_writes(*args, **kwargs)
+            await asyncio.to_thread(self.serde.blobs.flush)
+            return result
+
+    return BlobFlushingSaver
+
+
+async def open_checkpointer(path: str = CHECKPOINT_DB):
+    """AsyncSqliteSaver on path with CompactSerializer; call inside the event loop."""
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    if path in _open:
+        return _open[path][0]
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    blobs = BlobStore(path)
+    conn  = await aiosqlite.connect(path)
+    await conn.executescript(_PRAGMAS)
+    saver = _blob_flushing_saver(AsyncSqliteSaver)(conn, serde=CompactSerializer(blobs))
+    await saver.setup()
+    pruned = await asyncio.to_thread(blobs.prune)
+    _open[path] = (saver, conn, blobs)
+    set_durable_store(blobs)
+    log_ok(AGENT, f"Checkpointing to {path}" + (f"  ({pruned} orphaned blob(s) pruned)" if pruned else ""))
+    return saver
+
+
+async def forget_run(saver, run_id: str):
+    """
+    Delete a completed run's checkpoints and the blobs only it referenced
+    (kept with CHECKPOINT_KEEP_COMPLETED=1). Failed runs keep theirs for resume().
+    """
+    if saver is None or CHECKPOINT_KEEP_COMPLETED:
+        return
+    blobs = getattr(saver.serde, "blobs", None)
+    try:
+        await saver.adelete_thread(run_id)
+        if blobs is not None:
+            deleted = await asyncio.to_thread(blobs.drop_thread, run_id)
+            log_step(AGENT, f"Run {run_id} checkpoints deleted  ({deleted} blob(s) freed)")
+    except Exception as e:
+        log_warn(AGENT, f"Could not delete checkpoints of run {run_id}: {e}")
+
+
+async def close_checkpointer(path: Optional[str] = CHECKPOINT_DB):
+    entry = _open.pop(path, None)
+    if entry is None:
+        return
+    _, conn, blobs = entry
+    set_durable_store(None)
+    await conn.close()
+    log_step(AGENT, f"Checkpoint store closed — {blobs.writes} blob(s) written this process")
+    blobs.close()
@@ -1,11 +1,20 @@
 """
-debug_utils.py — Print-based debug helpers for the Multi-Agent PR Review System
+debug_utils.py — Debug logging helpers for the Multi-Agent PR Review System
+
+Every helper builds a LogRecord and hands it to the backend in log_backend.py
+(coloured console by default, JSON lines with LOG_FORMAT=json), written on a
+background thread. Records below LOG_LEVEL are skipped before any formatting.
 """
 
 import time
 import json
 from datetime import datetime
 from typing import Any, Dict, Optional
+from log_backend import (
+    DEBUG, INFO, WARNING, ERROR, LogRecord, emit, is_enabled,
+    new_run_id, set_run_id, get_run_id, flush_logs,
+)
+from metrics import observe_node
 
 # ── ANSI colours ─────────────────────────────────────────────────────────────
 RESET   = "\033[0m"
@@ -18,44 +27,65 @@ RED     = "\033[91m"
 BLUE    = "\033[94m"
 MAGENTA = "\033[95m"
 
-def _ts():
-    return f"{DIM}{datetime.now().strftime('%H:%M:%S.%f')[:-3]}{RESET}"
+def _ts(ts: float):
+    return f"{DIM}{datetime.fromtimestamp(ts).strftime('%H:%M:%S.%f')[:-3]}{RESET}"
 
 def _tag(agent, color=CYAN):
     return f"{color}{BOLD}[{agent}]{RESET}"
 
+def _log(level: int, agent: str, event: str, msg: str = "",
+         data: Optional[Dict[str, Any]] = None, console=None):
+    emit(LogRecord(level, agent, event, msg, data, console))
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Node banners
 # ─────────────────────────────────────────────────────────────────────────────
 
 def log_node_enter(agent: str, node: str, note: str = ""):
+    if not is_enabled(DEBUG):
+        return
     note_str = f"  {DIM}({note}){RESET}" if note else ""
-    print(f"\n{_ts()} {_tag(agent, CYAN)} {BOLD}▶ ENTER {node}{RESET}{note_str}")
-    print(f"         {DIM}{'─'*55}{RESET}")
+    _log(DEBUG, agent, "node_enter", node, {"note": note} if note else None,
+         lambda ts: [f"\n{_ts(ts)} {_tag(agent, CYAN)} {BOLD}▶ ENTER {node}{RESET}{note_str}",
+                     f"         {DIM}{'─'*55}{RESET}"])
 
 def log_node_exit(agent: str, node: str, elapsed_ms: float = None):
+    if not is_enabled(DEBUG):
+        return
     timing = f"  {DIM}⏱  {elapsed_ms:.0f}ms{RESET}" if elapsed_ms else ""
-    print(f"{_ts()} {_tag(agent, GREEN)} {BOLD}◀ EXIT  {node}{RESET}{timing}")
-    print(f"         {DIM}{'─'*55}{RESET}\n")
+    _log(DEBUG, agent, "node_exit", node,
+         {"elapsed_ms": round(elapsed_ms, 1)} if elapsed_ms else None,
+         lambda ts: [f"{_ts(ts)} {_tag(agent, GREEN)} {BOLD}◀ EXIT  {node}{RESET}{timing}",
+                     f"         {DIM}{'─'*55}{RESET}\n"])
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Inline log lines
 # ─────────────────────────────────────────────────────────────────────────────
 
 def log_step(agent: str, msg: str):
-    print(f"{_ts()} {_tag(agent, CYAN)}  ➜  {msg}")
+    if is_enabled(DEBUG):
+        _log(DEBUG, agent, "step", msg, console=lambda ts: [
+            f"{_ts(ts)} {_tag(agent, CYAN)}  ➜  {msg}"])
 
 def log_ok(agent: str, msg: str):
-    print(f"{_ts()} {_tag(agent, GREEN)}  ✅  {GREEN}{msg}{RESET}")
+    if is_enabled(INFO):
+        _log(INFO, agent, "ok", msg, console=lambda ts: [
+            f"{_ts(ts)} {_tag(agent, GREEN)}  ✅  {GREEN}{msg}{RESET}"])
 
 def log_warn(agent: str, msg: str):
-    print(f"{_ts()} {_tag(agent, YELLOW)}  ⚠️   {YELLOW}{msg}{RESET}")
+    if is_enabled(WARNING):
+        _log(WARNING, agent, "warn", msg, console=lambda ts: [
+            f"{_ts(ts)} {_tag(agent, YELLOW)}  ⚠️   {YELLOW}{msg}{RESET}"])
 
 def log_error(agent: str, msg: str):
-    print(f"{_ts()} {_tag(agent, RED)}  ❌  {RED}{msg}{RESET}")
+    if is_enabled(ERROR):
+        _log(ERROR, agent, "error", msg, console=lambda ts: [
+            f"{_ts(ts)} {_tag(agent, RED)}  ❌  {RED}{msg}{RESET}"])
 
 def log_info(agent: str, msg: str):
-    print(f"{_ts()} {_tag(agent, BLUE)}  ℹ️   {msg}")
+    if is_enabled(INFO):
+        _log(INFO, agent, "info", msg, console=lambda ts: [
+            f"{_ts(ts)} {_tag(agent, BLUE)}  ℹ️   {msg}"])
 
 # ─────────────────────────────────────────────────────────────────────────────
 # State snapshot (trimmed — skips large/binary fields)
@@ -64,23 +94,28 @@ def log_info(agent: str, msg: str):
 _LARGE_KEYS = {"client", "patch", "diffs", "changed_files", "git_read_result",
                "llm_review_result", "jira_ticket_details"}
 
+def _display(k: str, v: Any) -> Any:
+    if k in _LARGE_KEYS:
+        if isinstance(v, list):
+            return f"[list · {len(v)} items]"
+        if isinstance(v, dict):
+            return f"{{dict · {len(v)} keys}}"
+        return "(large — hidden)"
+    if isinstance(v, str) and len(v) > 120:
+        return v[:120] + " …"
+    if isinstance(v, list):
+        return f"{v[:3]}{'…' if len(v) > 3 else ''} ({len(v)} items)"
+    return v
+
 def log_state(agent: str, state: Dict, label: str = "State"):
-    print(f"{_ts()} {_tag(agent, MAGENTA)}  📋  {BOLD}{label}{RESET}")
-    for k, v in state.items():
-        if k in _LARGE_KEYS:
-            if isinstance(v, list):
-                display = f"[list · {len(v)} items]"
-            elif isinstance(v, dict):
-                display = f"{{dict · {len(v)} keys}}"
-            else:
-                display = "(large — hidden)"
-        elif isinstance(v, str) and len(v) > 120:
-            display = v[:120] + " …"
-        elif isinstance(v, list):
-            display = f"{v[:3]}{'…' if len(v) > 3 else ''} ({len(v)} items)"
-        else:
-            display = v
-        print(f"         {DIM}│{RESET}  {BOLD}{k}{RESET}: {display}")
+    if not is_enabled(DEBUG):
+        return
+    # Trimmed on the calling thread — the state may change once we return
+    shown = {k: _display(k, v) for k, v in state.items()}
+    _log(DEBUG, agent, "state", label, shown, lambda ts: [
+        f"{_ts(ts)} {_tag(agent, MAGENTA)}  📋  {BOLD}{label}{RESET}",
+        *(f"         {DIM}│{RESET}  {BOLD}{k}{RESET}: {v}" for k, v in shown.items()),
+    ])
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Specialised printers
@@ -90,39 +125,59 @@ def log_diff_table(agent: str, diffs: list):
     if not diffs:
         log_warn(agent, "No diffs found")
         return
-    print(f"{_ts()} {_tag(agent, CYAN)}  📂  Diff summary — {len(diffs)} file(s):")
-    for i, d in enumerate(diffs, 1):
-        fname  = d.get("filename", "?")
-        lang   = d.get("language", "?")
-        status = d.get("status", "?")
-        adds   = d.get("additions", 0)
-        dels   = d.get("deletions", 0)
-        print(f"         {DIM}│{RESET}  {i:>2}. {BOLD}{fname}{RESET}  "
-              f"[{lang}]  {GREEN}+{adds}{RESET} {RED}-{dels}{RESET}  status={status}")
+    if not is_enabled(DEBUG):
+        return
+    rows = [{
+        "filename":  d.get("filename", "?"),
+        "language":  d.get("language", "?"),
+        "status":    d.get("status", "?"),
+        "additions": d.get("additions", 0),
+        "deletions": d.get("deletions", 0),
+    } for d in diffs]
+    _log(DEBUG, agent, "diff_table", f"{len(diffs)} file(s)", {"files": rows}, lambda ts: [
+        f"{_ts(ts)} {_tag(agent, CYAN)}  📂  Diff summary — {len(rows)} file(s):",
+        *(f"         {DIM}│{RESET}  {i:>2}. {BOLD}{r['filename']}{RESET}  "
+          f"[{r['language']}]  {GREEN}+{r['additions']}{RESET} {RED}-{r['deletions']}{RESET}  "
+          f"status={r['status']}" for i, r in enumerate(rows, 1)),
+    ])
 
 def log_llm_result(agent: str, analysis: dict):
+    if not is_enabled(INFO):
+        return
     bugs     = analysis.get("bugs", [])
     quality  = analysis.get("code_quality_issues", [])
     security = analysis.get("security_issues", [])
     summary  = analysis.get("summary", "N/A")
-    print(f"{_ts()} {_tag(agent, MAGENTA)}  🤖  LLM Analysis:")
-    print(f"         {DIM}│{RESET}  Bugs       : {RED}{len(bugs)}{RESET}")
-    print(f"         {DIM}│{RESET}  Quality    : {YELLOW}{len(quality)}{RESET}")
-    print(f"         {DIM}│{RESET}  Security   : {YELLOW}{len(security)}{RESET}")
-    print(f"         {DIM}│{RESET}  Summary    : {summary[:150]}")
-    for i, bug in enumerate(bugs[:5], 1):
-        sev = bug.get("severity", "?").upper()
-        col = RED if sev == "HIGH" else YELLOW if sev == "MEDIUM" else DIM
-        desc = bug.get("description", "")[:80]
-        print(f"         {DIM}│{RESET}    Bug {i}: {col}{sev}{RESET} — {desc}")
+    top      = [(bug.get("severity", "?").upper(), bug.get("description", "")[:80]) for bug in bugs[:5]]
+
+    def _lines(ts):
+        lines = [
+            f"{_ts(ts)} {_tag(agent, MAGENTA)}  🤖  LLM Analysis:",
+            f"         {DIM}│{RESET}  Bugs       : {RED}{len(bugs)}{RESET}",
+            f"         {DIM}│{RESET}  Quality    : {YELLOW}{len(quality)}{RESET}",
+            f"         {DIM}│{RESET}  Security   : {YELLOW}{len(security)}{RESET}",
+            f"         {DIM}│{RESET}  Summary    : {summary[:150]}",
+        ]
+        for i, (sev, desc) in enumerate(top, 1):
+            col = RED if sev == "HIGH" else YELLOW if sev == "MEDIUM" else DIM
+            lines.append(f"         {DIM}│{RESET}    Bug {i}: {col}{sev}{RESET} — {desc}")
+        return lines
+
+    _log(INFO, agent, "llm_result", summary[:150], {
+        "bugs": len(bugs), "quality": len(quality), "security": len(security),
+        "top_bugs": [{"severity": s, "description": d} for s, d in top],
+    }, _lines)
 
 def log_json(agent: str, label: str, data: Any, max_chars: int = 300):
+    if not is_enabled(DEBUG):
+        return
     raw = json.dumps(data, indent=2, default=str)
     if len(raw) > max_chars:
         raw = raw[:max_chars] + "\n  … (truncated)"
-    print(f"{_ts()} {_tag(agent, BLUE)}  📄  {BOLD}{label}{RESET}")
-    for line in raw.splitlines():
-        print(f"         {DIM}│{RESET}  {line}")
+    _log(DEBUG, agent, "json", label, {"json": raw}, lambda ts: [
+        f"{_ts(ts)} {_tag(agent, BLUE)}  📄  {BOLD}{label}{RESET}",
+        *(f"         {DIM}│{RESET}  {line}" for line in raw.splitlines()),
+    ])
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Orchestrator-level banners
@@ -130,28 +185,60 @@ def log_json(agent: str, label: str, data: Any, max_chars: int = 300):
 
 def log_pipeline_start(pr_url: str):
     w = 65
-    print("\n" + f"{BOLD}{CYAN}{'═'*w}{RESET}")
-    print(f"{BOLD}{CYAN}  🚀  PR REVIEW PIPELINE  —  STARTING{RESET}")
-    print(f"  PR  : {pr_url}")
-    print(f"  At  : {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"{BOLD}{CYAN}{'═'*w}{RESET}\n")
+    _log(INFO, "PIPELINE", "pipeline_start", pr_url, None, lambda ts: [
+        "\n" + f"{BOLD}{CYAN}{'═'*w}{RESET}",
+        f"{BOLD}{CYAN}  🚀  PR REVIEW PIPELINE  —  STARTING{RESET}",
+        f"  PR  : {pr_url}",
+        f"  At  : {datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')}",
+        f"{BOLD}{CYAN}{'═'*w}{RESET}\n",
+    ])
 
 def log_phase(name: str):
-    print(f"\n{BOLD}{MAGENTA}{'─'*65}{RESET}")
-    print(f"{BOLD}{MAGENTA}  ● PHASE : {name}{RESET}")
-    print(f"{BOLD}{MAGENTA}{'─'*65}{RESET}\n")
+    _log(INFO, "PIPELINE", "phase", name, None, lambda ts: [
+        f"\n{BOLD}{MAGENTA}{'─'*65}{RESET}",
+        f"{BOLD}{MAGENTA}  ● PHASE : {name}{RESET}",
+        f"{BOLD}{MAGENTA}{'─'*65}{RESET}\n",
+    ])
 
 def log_pipeline_end(state: Dict):
     w = 65
-    print(f"\n{BOLD}{GREEN}{'═'*w}{RESET}")
-    print(f"{BOLD}{GREEN}  🏁  PIPELINE COMPLETE{RESET}")
-    diffs = state.get("git_read_result", {}).get("diffs", [])
-    bugs  = state.get("llm_review_result", {}).get("bugs", [])
-    jira  = state.get("jira_ticket_details", [])
-    print(f"  Files reviewed : {len(diffs)}")
-    print(f"  Bugs found     : {len(bugs)}")
-    print(f"  Jira tickets   : {len(jira) if isinstance(jira, list) else '?'}")
-    print(f"{BOLD}{GREEN}{'═'*w}{RESET}\n")
+    diffs = state.get("diffs") or []
+    bugs  = (state.get("llm_review_result") or {}).get("bugs", [])
+    jira  = state.get("jira_ticket_details") or []
+    data  = {
+        "files_reviewed":  len(diffs),
+        "files_skipped":   len(state.get("skipped_files") or []),
+        "bugs_found":      len(bugs),
+        "jira_tickets":    len(jira) if isinstance(jira, list) else None,
+        "comment_posted":  state.get("comment_posted"),
+        "tests_committed": state.get("tests_committed"),
+        "pr_tagged":       state.get("pr_tagged"),
+    }
+    _log(INFO, "PIPELINE", "pipeline_end", "complete", data, lambda ts: [
+        f"\n{BOLD}{GREEN}{'═'*w}{RESET}",
+        f"{BOLD}{GREEN}  🏁  PIPELINE COMPLETE{RESET}",
+        f"  Files reviewed : {data['files_reviewed']}  (skipped {data['files_skipped']})",
+        f"  Bugs found     : {data['bugs_found']}",
+        f"  Jira tickets   : {data['jira_tickets'] if data['jira_tickets'] is not None else '?'}",
+        f"  Write results  : comment_posted={data['comment_posted']}  "
+        f"tests_committed={data['tests_committed']}  pr_tagged={data['pr_tagged']}",
+        f"{BOLD}{GREEN}{'═'*w}{RESET}\n",
+    ])
+
+def log_batch_summary(summary: Dict):
+    w = 65
+    lat = summary.get("latency_ms", {})
+    _log(INFO, "PIPELINE", "batch_summary", "batch complete", summary, lambda ts: [
+        f"\n{BOLD}{BLUE}{'═'*w}{RESET}",
+        f"{BOLD}{BLUE}  📊  BATCH REVIEW SUMMARY{RESET}",
+        f"  PRs            : {summary.get('prs_total', 0)}  "
+        f"({GREEN}{summary.get('prs_ok', 0)} ok{RESET}, {RED}{summary.get('prs_failed', 0)} failed{RESET})",
+        f"  Wall time      : {summary.get('wall_s', 0):.1f}s",
+        f"  Throughput     : {summary.get('prs_per_minute', 0):.2f} PRs/min",
+        f"  Latency (ms)   : p50={lat.get('p50', 0):.0f}  p95={lat.get('p95', 0):.0f}  "
+        f"mean={lat.get('mean', 0):.0f}  min={lat.get('min', 0):.0f}  max={lat.get('max', 0):.0f}",
+        f"{BOLD}{BLUE}{'═'*w}{RESET}\n",
+    ])
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Timer context manager
@@ -161,7 +248,7 @@ class NodeTimer:
     """
     with NodeTimer("GIT", "FETCH_PR") as t:
         ...
-    # auto-prints enter/exit with elapsed time
+    # auto-prints enter/exit with elapsed time and records it in metrics
     """
     def __init__(self, agent: str, node: str, note: str = ""):
         self.agent = agent
@@ -176,4 +263,5 @@ class NodeTimer:
 
     def __exit__(self, *_):
         self.elapsed_ms = (time.perf_counter() - self._t0) * 1000
+        observe_node(self.agent, self.node, self.elapsed_ms)
         log_node_exit(self.agent, self.node, self.elapsed_ms)
@@ -0,0 +1,160 @@
+"""
+diff_hunks.py — Compact parsed form of a unified-diff patch
+
+Every patch is parsed once per run into a ParsedPatch. Hunks hold only
+integers (line ranges plus character offsets into the patch), so the hunk
+text is a slice of the original string, never a copy. Prompt packing, bug
+location validation and diff statistics all read these records instead of
+rescanning the patch text.
+"""
+
+import re
+from array import array
+from typing import Dict, List, Optional, Tuple
+from review_history import bug_filename
+from artifact_store import run_store
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_LOCATION    = re.compile(r"^(.*?)(?::(\d+)(?:\s*-\s*(\d+))?)?\s*$")
+
+
+class Hunk:
+    __slots__ = ("old_start", "old_len", "new_start", "new_len",
+                 "offset", "end", "additions", "deletions")
+
+    def __init__(self, old_start: int, old_len: int, new_start: int, new_len: int,
+                 offset: int):
+        self.old_start = old_start
+        self.old_len   = old_len
+        self.new_start = new_start
+        self.new_len   = new_len
+        self.offset    = offset        # char offset of the "@@" header in the patch
+        self.end       = offset        # char offset one past the hunk's last line
+        self.additions = 0
+        self.deletions = 0
+
+    @property
+    def new_end(self) -> int:
+        """Last new-file line the hunk covers (new_start for pure deletions)."""
+        return self.new_start + max(self.new_len, 1) - 1
+
+    def text(self, patch: str) -> str:
+        return patch[self.offset:self.end]
+
+    def header(self, patch: str) -> str:
+        nl = patch.find("\n", self.offset, self.end)
+        return patch[self.offset:nl if nl != -1 else self.end]
+
+    def __repr__(self) -> str:
+        return (f"Hunk(-{self.old_start},{self.old_len} +{self.new_start},{self.new_len} "
+                f"+{self.additions}/-{self.deletions})")
+
+
+class ParsedPatch:
+    """
+    Hunks of one file's patch plus the new-file line numbers of added lines
+    (array-backed, sorted).
+    """
+    __slots__ = ("hunks", "added_lines", "additions", "deletions")
+
+    def __init__(self, hunks: List[Hunk], added_lines: array):
+        self.hunks       = hunks
+        self.added_lines = added_lines
+        self.additions   = sum(h.additions for h in hunks)
+        self.deletions   = sum(h.deletions for h in hunks)
+
+    def covers(self, line: int) -> bool:
+        """True if line (new-file numbering) lies inside one of the hunks."""
+        return any(h.new_start <= line <= h.new_end for h in self.hunks)
+
+    def __repr__(self) -> str:
+        return f"ParsedPatch({len(self.hunks)} hunk(s) +{self.additions}/-{self.deletions})"
+
+
+def parse_patch(patch: str) -> ParsedPatch:
+    """Single pass over a unified-diff patch (GitHub "patch" field, no file headers)."""
+    hunks: List[Hunk] = []
+    added = array("I")
+    current: Optional[Hunk] = None
+    new_line = 0
+    pos = 0
+
+    for line in patch.splitlines(keepends=True):
+        start, pos = pos, pos + len(line)
+        if line.startswith("@@"):
+            m = _HUNK_HEADER.match(line)
+            if m:
+                old_start, old_len, new_start, new_len = m.groups()
+                current = Hunk(int(old_start), int(old_len or 1),
+                               int(new_start), int(new_len or 1), start)
+                hunks.append(current)
+                new_line = current.new_start
+                current.end = pos
+                continue
+        if current is None:
+            continue
+        current.end = pos
+        tag = line[:1]
+        if tag == "+":
+            current.additions += 1
+            added.append(new_line)
+            new_line += 1
+        elif tag == "-":
+            current.deletions += 1
+        elif tag == "\\":                         # "\ No newline at end of file"
+            pass
+        else:
+            new_line += 1
+
+    return ParsedPatch(hunks, added)
+
+
+def diff_hunks(diff: Dict) -> ParsedPatch:
+    """
+    The diff's ParsedPatch — inline "hunks", else parsed once per run from
+    its patch_id artifact, else parsed now from an inline "patch".
+    """
+    parsed = diff.get("hunks")
+    if parsed is not None:
+        return parsed
+    if diff.get("patch") is None and diff.get("patch_id"):
+        return run_store().derived(diff["patch_id"], parse_patch)
+    return parse_patch(diff.get("patch") or "")
+
+
+# ============================================================================
+# BUG LOCATION VALIDATION
+# ============================================================================
+
+def parse_location(location: str) -> Tuple[str, Optional[int], Optional[int]]:
+    """"path:12" / "path:12-15" / "path" → (path, first_line, last_line)."""
+    m = _LOCATION.match(str(location or "").strip())
+    path, first, last = m.group(1).strip(), m.group(2), m.group(3)
+    first_line = int(first) if first else None
+    return path, first_line, int(last) if last else first_line
+
+
+def bug_in_changed_lines(bug: Dict, by_file: Dict[str, ParsedPatch]) -> bool:
+    """
+    True if the bug's location names a file of the diff and (when it has a
+    line number) a line range overlapping one of that file's hunks. Bugs
+    without a location cannot be checked and are kept.
+    """
+    if not str(bug.get("location") or "").strip():
+        return True
+    fname = bug_filename(bug, list(by_file))
+    if fname is None:
+        return False
+    _, first, last = parse_location(bug.get("location", ""))
+    if first is None:
+        return True
+    return any(h.new_start <= last and first <= h.new_end for h in by_file[fname].hunks)
+
+
+def filter_bugs_to_changed_lines(bugs: List[Dict], diffs: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Split bugs into (located inside the diffs' hunks, located elsewhere)."""
+    by_file = {d["filename"]: diff_hunks(d) for d in diffs}
+    kept, dropped = [], []
+    for bug in bugs:
+        (kept if bug_in_changed_lines(bug, by_file) else dropped).append(bug)
+    return kept, dropped
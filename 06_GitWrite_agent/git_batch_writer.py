@@ -0,0 +1,182 @@
+"""
+git_batch_writer.py — Write all bot artifacts to GitHub in a single commit
+
+Uses the Git data API through the GitHub MCP server:
+  blobs (concurrent) → tree → commit → move the branch ref once.
+Falls back to one GITHUB_CREATE_OR_UPDATE_FILE_CONTENTS call per file when
+the server lacks one of the data-API tools or any step fails.
+
+An artifact is a dict:
+  {"path": str, "content": str, "message": str, "flag": str, "blob_sha": str | None}
+where "flag" names the GitWriteAgent output it satisfies (e.g. "tests_committed").
+"""
+
+import os
+import json
+import asyncio
+from typing import Dict, List
+from mcp_resilience import call_tool
+from debug_utils import log_step, log_ok, log_warn, log_error
+
+AGENT = "GIT-BATCH"
+
+BATCH_COMMIT_TOOLS = [
+    "GITHUB_CREATE_A_BLOB",
+    "GITHUB_CREATE_A_TREE",
+    "GITHUB_CREATE_A_COMMIT",
+    "GITHUB_GET_A_REFERENCE",
+    "GITHUB_GET_A_TREE",
+    "GITHUB_UPDATE_A_REFERENCE",
+]
+
+# Branch the bot writes to; unset → the repository's default branch
+GITHUB_BOT_BRANCH = os.getenv("GITHUB_BOT_BRANCH")
+
+_tool_support: Dict[int, bool] = {}   # id(client) → has every BATCH_COMMIT_TOOLS entry
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+async def _call_json(client, tool_name: str, arguments: dict) -> dict:
+    """Call an MCP tool and return the unwrapped `data` payload; raise on failure."""
+    log_step(AGENT, f"MCP call: {tool_name}")
+    result   = await call_tool(client, tool_name, arguments)
+    text     = result.content[0].text
+    response = json.loads(text) if text else {}
+    if response.get("successful") is False:
+        raise RuntimeError(f"{tool_name} failed: {response.get('error')}")
+    data = response.get("data", response) or {}
+    if isinstance(data, dict) and isinstance(data.get("details"), dict):
+        return data["details"]
+    return data
+
+
+async def supports_batched_commit(client) -> bool:
+    """True if the MCP server exposes every tool the batched path needs (cached per client)."""
+    key = id(client)
+    if key not in _tool_support:
+        try:
+            names = {t.name for t in await client.list_tools()}
+        except Exception as e:
+            log_warn(AGENT, f"list_tools failed ({e}) — assuming no batched commit support")
+            names = set()
+        missing = [t for t in BATCH_COMMIT_TOOLS if t not in names]
+        if missing:
+            log_warn(AGENT, f"Batched commit unavailable — server lacks {missing}")
+        _tool_support[key] = not missing
+    return _tool_support[key]
+
+
+async def resolve_branch(client, owner: str, repo: str, pull_number: int) -> str:
+    """GITHUB_BOT_BRANCH, else the repo's default branch (read from the PR), else 'main'."""
+    if GITHUB_BOT_BRANCH:
+        return GITHUB_BOT_BRANCH
+    try:
+        pr = await _call_json(client, "GITHUB_GET_A_PULL_REQUEST", {
+            "owner": owner, "repo": repo, "pull_number": pull_number,
+        })
+        branch = ((pr.get("base") or {}).get("repo") or {}).get("default_branch")
+        if branch:
+            return branch
+    except Exception as e:
+        log_warn(AGENT, f"Could not resolve default branch: {e}")
+    return "main"
+
+
+async def upload_blobs(client, owner: str, repo: str, artifacts: List[Dict]) -> List[Dict]:
+    """Create a blob for every artifact without one, concurrently. Returns updated copies."""
+    async def _upload(artifact: Dict) -> Dict:
+        if artifact.get("blob_sha"):
+            return artifact
+        blob = await _call_json(client, "GITHUB_CREATE_A_BLOB", {
+            "owner": owner, "repo": repo,
+            "content": artifact["content"], "encoding": "utf-8",
+        })
+        log_step(AGENT, f"  blob {blob['sha'][:10]}  ←  {artifact['path']}")
+        return {**artifact, "blob_sha": blob["sha"]}
+
+    return list(await asyncio.gather(*(_upload(a) for a in artifacts)))
+
+
+# ============================================================================
+# WRITERS
+# ============================================================================
+
+async def commit_artifacts(client, owner: str, repo: str, pull_number: int,
+                           artifacts: List[Dict], message: str) -> str:
+    """
+    Commit every artifact in one commit on the bot branch and move the ref
+    once (fast-forward only). Returns the new commit SHA; raises on failure.
+    """
+    branch = await resolve_branch(client, owner, repo, pull_number)
+    ref    = f"heads/{branch}"
+    log_step(AGENT, f"Batched commit of {len(artifacts)} file(s) → {owner}/{repo}@{branch}")
+
+    artifacts, head = await asyncio.gather(
+        upload_blobs(client, owner, repo, artifacts),
+        _call_json(client, "GITHUB_GET_A_REFERENCE", {"owner": owner, "repo": repo, "ref": ref}),
+    )
+    head_sha  = head["object"]["sha"]
+    base_tree = await _call_json(client, "GITHUB_GET_A_TREE", {
+        "owner": owner, "repo": repo, "tree_sha": head_sha, "recursive": False,
+    })
+
+    tree = await _call_json(client, "GITHUB_CREATE_A_TREE", {
+        "owner":     owner,
+        "repo":      repo,
+        "base_tree": base_tree["sha"],
+        "tree": [{"path": a["path"], "mode": "100644", "type": "blob", "sha": a["blob_sha"]}
+                 for a in artifacts],
+    })
+    commit = await _call_json(client, "GITHUB_CREATE_A_COMMIT", {
+        "owner":   owner,
+        "repo":    repo,
+        "message": message,
+        "tree":    tree["sha"],
+        "parents": [head_sha],
+    })
+    await _call_json(client, "GITHUB_UPDATE_A_REFERENCE", {
+        "owner": owner, "repo": repo, "ref": ref, "sha": commit["sha"], "force": False,
+    })
+    log_ok(AGENT, f"Commit {commit['sha'][:10]} — {len(artifacts)} file(s), ref {ref} moved once")
+    return commit["sha"]
+
+
+async def write_files_individually(client, owner: str, repo: str,
+                                   artifacts: List[Dict]) -> List[bool]:
+    """
+    Fallback: one GITHUB_CREATE_OR_UPDATE_FILE_CONTENTS call (one commit) per
+    artifact. Sequential — concurrent commits to one branch conflict.
+    """
+    results = []
+    for artifact in artifacts:
+        try:
+            await _call_json(client, "GITHUB_CREATE_OR_UPDATE_FILE_CONTENTS", {
+                "owner":   owner,
+                "repo":    repo,
+                "path":    artifact["path"],
+                "message": artifact["message"],
+                "content": artifact["content"],
+            })
+            log_ok(AGENT, f"  written: {artifact['path']}")
+            results.append(True)
+        except Exception as e:
+            log_error(AGENT, f"  failed:  {artifact['path']} — {e}")
+            results.append(False)
+    return results
+
+
+async def write_artifacts(client, owner: str, repo: str, pull_number: int,
+                          artifacts: List[Dict], message: str) -> List[bool]:
+    """Batched single commit when possible, per-file writes otherwise. One bool per artifact."""
+    if not artifacts:
+        return []
+    if await supports_batched_commit(client):
+        try:
+            await commit_artifacts(client, owner, repo, pull_number, artifacts, message)
+            return [True] * len(artifacts)
+        except Exception as e:
+            log_error(AGENT, f"Batched commit failed: {e} — falling back to per-file writes")
+    return await write_files_individually(client, owner, repo, artifacts)
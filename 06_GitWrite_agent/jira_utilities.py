@@ -8,7 +8,8 @@ def build_jira_ticket_summary(bug: dict) -> str:
     Build Jira ticket summary from bug data.
     Returns a formatted summary string (description capped at 80 chars).
     """
-    return f"[{bug['severity'].upper()}] {bug['type']}: {bug['description'][:80]}"
+    return (f"[{str(bug.get('severity') or 'medium').upper()}] {bug.get('type', 'unknown')}: "
+            f"{str(bug.get('description', ''))[:80]}")
 
 
 def build_jira_ticket_description(bug: dict, owner: str, repo: str, pull_number: int) -> str:
@@ -19,15 +20,15 @@ def build_jira_ticket_description(bug: dict, owner: str, repo: str, pull_number:
     return f"""**Bug found in PR #{pull_number}**
 
 **Repository:** {owner}/{repo}
-**Severity:** {bug['severity']}
-**Type:** {bug['type']}
-**Location:** {bug['location']}
+**Severity:** {bug.get('severity', 'medium')}
+**Type:** {bug.get('type', 'unknown')}
+**Location:** {bug.get('location', '')}
 
 **Description:**
-{bug['description']}
+{bug.get('description', '')}
 
 **Suggestion:**
-{bug['suggestion']}
+{bug.get('suggestion', '')}
 
 **PR Link:** https://github.com/{owner}/{repo}/pull/{pull_number}
 """
@@ -44,4 +45,4 @@ def get_jira_priority(severity: str) -> str:
         "low":      "Low",
         "critical": "Highest",
     }
-    return priority_map.get(severity.lower(), "Medium")
+    return priority_map.get(str(severity or "").lower(), "Medium")
@@ -0,0 +1,106 @@
+"""
+languages.py — Language of a changed file, shared by the read and review agents
+
+detect_language(filename, patch) checks, in order:
+  1. special file names   Dockerfile, Makefile, CMakeLists.txt, Gemfile, BUILD …
+  2. extension            the last suffix, case-insensitive (.py, .tsx, .yml …)
+  3. shebang              "#!/usr/bin/env python3" on the file's first line,
+                          when the patch shows it (extension-less scripts)
+and returns "unknown" when none applies.
+"""
+
+import re
+from typing import Optional
+
+UNKNOWN = "unknown"
+
+EXTENSIONS = {
+    ".py": "python", ".pyi": "python", ".pyx": "python",
+    ".js": "javascript", ".mjs": "javascript", ".cjs": "javascript", ".jsx": "javascript",
+    ".ts": "typescript", ".mts": "typescript", ".cts": "typescript", ".tsx": "typescript",
+    ".vue": "vue", ".svelte": "svelte",
+    ".go": "go",
+    ".java": "java", ".kt": "kotlin", ".kts": "kotlin", ".scala": "scala",
+    ".groovy": "groovy", ".gradle": "groovy",
+    ".c": "c", ".h": "c",
+    ".cc": "cpp", ".cpp": "cpp", ".cxx": "cpp", ".hh": "cpp", ".hpp": "cpp", ".hxx": "cpp",
+    ".rs": "rust", ".cs": "csharp", ".swift": "swift", ".m": "objective-c", ".mm": "objective-c",
+    ".rb": "ruby", ".php": "php", ".pl": "perl", ".pm": "perl", ".lua": "lua",
+    ".dart": "dart", ".ex": "elixir", ".exs": "elixir", ".r": "r",
+    ".sh": "shell", ".bash": "shell", ".zsh": "shell", ".ksh": "shell", ".ps1": "powershell",
+    ".sql": "sql",
+    ".html": "html", ".htm": "html", ".css": "css", ".scss": "css", ".sass": "css", ".less": "css",
+    ".json": "json", ".jsonc": "json", ".yaml": "yaml", ".yml": "yaml", ".toml": "toml",
+    ".ini": "ini", ".cfg": "ini", ".conf": "ini", ".properties": "ini", ".env": "ini",
+    ".xml": "xml", ".tf": "terraform", ".tfvars": "terraform", ".hcl": "terraform",
+    ".proto": "protobuf", ".graphql": "graphql", ".gql": "graphql",
+    ".md": "markdown", ".markdown": "markdown", ".rst": "restructuredtext", ".txt": "text",
+    ".csv": "csv", ".svg": "svg", ".ipynb": "jupyter", ".lock": "lock",
+}
+
+# Lower-cased file name → language (matched before the extension)
+FILENAMES = {
+    "dockerfile": "dockerfile", "containerfile": "dockerfile",
+    "makefile": "makefile", "gnumakefile": "makefile", "cmakelists.txt": "cmake",
+    "jenkinsfile": "groovy",
+    "gemfile": "ruby", "rakefile": "ruby", "podfile": "ruby", "vagrantfile": "ruby",
+    "build": "starlark", "build.bazel": "starlark", "workspace": "starlark",
+    "workspace.bazel": "starlark", "module.bazel": "starlark",
+    ".bashrc": "shell", ".bash_profile": "shell", ".zshrc": "shell", ".profile": "shell",
+    ".gitignore": "text", ".dockerignore": "text", ".editorconfig": "ini",
+    ".env": "ini", "requirements.txt": "text", "go.mod": "go-mod",
+    "readme": "text", "license": "text", "codeowners": "text",
+}
+FILENAME_PREFIXES = (("dockerfile.", "dockerfile"), ("makefile.", "makefile"), ("requirements", "text"))
+
+# Interpreter (version digits stripped) → language
+INTERPRETERS = {
+    "python": "python", "pypy": "python",
+    "node": "javascript", "nodejs": "javascript", "deno": "typescript", "bun": "javascript",
+    "ts-node": "typescript", "tsx": "typescript",
+    "bash": "shell", "sh": "shell", "zsh": "shell", "dash": "shell", "ksh": "shell",
+    "ruby": "ruby", "perl": "perl", "php": "php", "lua": "lua", "rscript": "r",
+    "pwsh": "powershell",
+}
+
+_FIRST_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+1(?:,\d+)? @@[^\n]*\n")
+_VERSION    = re.compile(r"[\d.]+$")
+
+
+def shebang_language(patch: str) -> Optional[str]:
+    """Language named by the shebang on the file's first line, if the patch shows it."""
+    m = _FIRST_HUNK.match(patch or "")
+    if not m:
+        return None
+    for line in patch[m.end():].split("\n", 3):
+        if line.startswith("-"):
+            continue
+        first = line[1:]
+        break
+    else:
+        return None
+    if not first.startswith("#!"):
+        return None
+
+    words = first[2:].split()
+    if words and words[0].rsplit("/", 1)[-1] == "env":
+        words = [w for w in words[1:] if not w.startswith("-") and "=" not in w]
+    if not words:
+        return None
+    interpreter = _VERSION.sub("", words[0].rsplit("/", 1)[-1].lower())
+    return INTERPRETERS.get(interpreter)
+
+
+def detect_language(filename: str, patch: str = "") -> str:
+    """Language label for a changed file (see module docstring for the order)."""
+    name = filename.rsplit("/", 1)[-1].lower()
+    if name in FILENAMES:
+        return FILENAMES[name]
+    for prefix, language in FILENAME_PREFIXES:
+        if name.startswith(prefix):
+            return language
+
+    stem, _, ext = name.rpartition(".")
+    if stem and f".{ext}" in EXTENSIONS:       # ".bashrc" has no extension
+        return EXTENSIONS[f".{ext}"]
+    return shebang_language(patch) or UNKNOWN
@@ -1,42 +1,93 @@
 # src/37-Multiple-Agents-Orchestrator/lg_utility.py
 import os
-from langgraph.graph import MessagesState
-from langchain_core.runnables.graph_mermaid import MermaidDrawMethod
+import hashlib
 from typing import Any, Dict, List, Union
 import json
+from langgraph.graph import StateGraph
+from metrics import timed_node
+
+
+class TimedStateGraph(StateGraph):
+    """
+    StateGraph whose nodes are timed automatically: every node added by name
+    is wrapped so its latency lands in metrics under {graph, node}.
+    """
+
+    def __init__(self, state_schema, graph_name: str, **kwargs):
+        super().__init__(state_schema, **kwargs)
+        self.graph_name = graph_name
+
+    def add_node(self, node, action=None, **kwargs):
+        if isinstance(node, str) and callable(action):
+            action = timed_node(self.graph_name, node, action)
+        return super().add_node(node, action, **kwargs)
+
+
+# # Graph rendering is opt-in: RENDER_GRAPHS=png (Mermaid API, network) or
+# RENDER_GRAPHS=mermaid (text only, offline). Unset/0 → no rendering at import.
+RENDER_GRAPHS = os.getenv("RENDER_GRAPHS", "").lower()
+
+
+def _graph_hash(mermaid_code: str) -> str:
+    return hashlib.sha256(mermaid_code.encode("utf-8")).hexdigest()
 
-# def save_graph_as_png(graph, filename=None):
-#     if filename is None:
-#         filename = os.path.splitext(os.path.basename(__file__))[0]
-    
-#     # png_bytes = graph.get_graph().draw_mermaid_png()
-#     png_bytes = graph.get_graph().draw_mermaid_png(draw_method=MermaidDrawMethod.PYPPETEER)
-#     with open(f"{filename}.png", "wb") as f:
-#         f.write(png_bytes)
 
 def save_graph_as_png(graph, filename="gsheet_agent_graph"):
     """
-    Save the graph visualization as PNG
+    Save the graph visualization as PNG (or mermaid text) when RENDER_GRAPHS
+    is set. Output is cached by a hash of the graph structure, so an
+    unchanged graph is never re-rendered.
     """
-    from langchain_core.runnables.graph_mermaid import MermaidDrawMethod
-   
+    if RENDER_GRAPHS in ("", "0", "false", "no"):
+        return
+
     try:
-        png_bytes = graph.get_graph().draw_mermaid_png(
-            draw_method=MermaidDrawMethod.API
-        )
-        with open(f"{filename}.png", "wb") as f:
-            f.write(png_bytes)
-        print(f"\n📊 Graph saved as {filename}.png")
+        mermaid_code = graph.get_graph().draw_mermaid()
     except Exception as e:
-        print(f"\n⚠️ Could not save graph image: {e}")
+        print(f"\n⚠️ Could not draw graph: {e}")
+        return
+
+    as_png    = RENDER_GRAPHS != "mermaid"
+    out_file  = f"{filename}.png" if as_png else f"{filename}_mermaid.txt"
+    hash_file = f"{out_file}.sha256"
+    digest    = _graph_hash(mermaid_code)
+    try:
+        with open(hash_file) as f:
+            if f.read().strip() == digest and os.path.exists(out_file):
+                return                                   # unchanged graph — cached
+    except OSError:
+        pass
+
+    if as_png:
+        from langchain_core.runnables.graph_mermaid import MermaidDrawMethod
         try:
-            mermaid_code = graph.get_graph().draw_mermaid()
-            with open(f"{filename}_mermaid.txt", "w") as f:
+            png_bytes = graph.get_graph().draw_mermaid_png(
+                draw_method=MermaidDrawMethod.API
+            )
+            with open(out_file, "wb") as f:
+                f.write(png_bytes)
+            print(f"\n📊 Graph saved as {out_file}")
+        except Exception as e:
+            print(f"\n⚠️ Could not save graph image: {e}")
+            out_file  = f"{filename}_mermaid.txt"
+            hash_file = f"{out_file}.sha256"
+            as_png    = False
+
+    if not as_png:
+        try:
+            with open(out_file, "w") as f:
                 f.write(mermaid_code)
-            print(f"   ✓ Saved mermaid code to {filename}_mermaid.txt")
-            print(f"   Visualize at: https://mermaid.live/")
+            print(f"   ✓ Saved mermaid code to {out_file}")
+            print("   Visualize at: https://mermaid.live/")
         except Exception as e2:
             print(f"   Could not save mermaid code: {e2}")
+            return
+
+    try:
+        with open(hash_file, "w") as f:
+            f.write(digest)
+    except OSError:
+        pass
 
 def pretty_print_json_list(data: Union[List[Dict[str, Any]], Dict[str, Any]]) -> None:
     """
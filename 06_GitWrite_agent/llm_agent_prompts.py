@@ -2,6 +2,152 @@
 Prompts and instructions for LLM Review Agent
 """
 
+import math
+from diff_hunks import diff_hunks
+from artifact_store import patch_text
+
+# Bump whenever a prompt template or its formatting changes — it is part of
+# the LLM response cache key, so old cached responses stop matching.
+PROMPT_TEMPLATE_VERSION = "3"
+
+# ============================================================================
+# PROMPT PACKING  (token budget spread across files, cut at hunk boundaries)
+# ============================================================================
+
+CHARS_PER_TOKEN = 4   # rough heuristic for code + English
+
+# Default prompt budget when the caller does not pass one
+PROMPT_TOKEN_BUDGET = 12000
+
+# Priority weights (by languages.detect_language label) — reviewable source
+# first, docs/config/lock files last
+LANGUAGE_WEIGHTS = {
+    "markdown": 0.4, "restructuredtext": 0.4, "text": 0.3,
+    "json": 0.6, "yaml": 0.6, "toml": 0.6, "ini": 0.5, "xml": 0.5,
+    "lock": 0.1, "svg": 0.1, "csv": 0.2,
+    "unknown": 0.8,
+}
+STATUS_WEIGHTS = {"added": 1.0, "modified": 1.0, "renamed": 0.5, "removed": 0.3}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate — no tokenizer round-trip."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _hunk_texts(diff: dict) -> tuple:
+    """(hunk texts, hunk headers) sliced from the diff's parsed hunks."""
+    patch  = patch_text(diff)
+    parsed = diff_hunks(diff)
+    if not parsed.hunks:
+        return ([patch], [patch.split("\n", 1)[0]]) if patch else ([], [])
+    return ([h.text(patch) for h in parsed.hunks],
+            [h.header(patch) for h in parsed.hunks])
+
+
+def diff_priority(diff: dict) -> float:
+    """Higher → more of the budget. Change size (log-scaled) × language × status."""
+    changes = int(diff.get("additions", 0) or 0) + int(diff.get("deletions", 0) or 0)
+    lang    = LANGUAGE_WEIGHTS.get(str(diff.get("language", "unknown")).lower(), 1.0)
+    status  = STATUS_WEIGHTS.get(diff.get("status", "modified"), 1.0)
+    return (1.0 + math.log2(1 + changes)) * lang * status
+
+
+def _file_header(diff: dict) -> str:
+    return (f"\n\n=== File: {diff['filename']} ===\n"
+            f"Language: {diff['language']}\n"
+            f"Changes: +{diff['additions']}/-{diff['deletions']}\n"
+            f"\nDiff:\n")
+
+
+def _allocate(demands: list, weights: list, budget: int) -> list:
+    """
+    Water-filling: split budget in proportion to weights; files that need
+    less than their share are fully funded and the surplus is re-spread.
+    """
+    alloc     = [0] * len(demands)
+    active    = [i for i, d in enumerate(demands) if d > 0]
+    remaining = budget
+    while active and remaining > 0:
+        total_w   = sum(weights[i] for i in active) or 1.0
+        satisfied = [i for i in active if demands[i] <= remaining * weights[i] / total_w]
+        if not satisfied:
+            for i in active:
+                alloc[i] = int(remaining * weights[i] / total_w)
+            break
+        for i in satisfied:
+            alloc[i]   = demands[i]
+            remaining -= demands[i]
+            active.remove(i)
+    return alloc
+
+
+def pack_diffs(diffs: list, max_tokens: int = PROMPT_TOKEN_BUDGET) -> tuple:
+    """
+    Pack diffs into at most ~max_tokens of prompt text. Every file keeps its
+    header; the rest of the budget is spread by diff_priority() and filled
+    with whole hunks only. Returns (text, omitted), where omitted lists
+    {"filename", "hunks_total", "hunks_omitted", "omitted_headers",
+    "omitted_tokens"} for every file that lost hunks.
+    """
+    headers = [_file_header(d) for d in diffs]
+    sliced  = [_hunk_texts(d) for d in diffs]
+    hunks   = [texts for texts, _ in sliced]
+    costs   = [[estimate_tokens(h) for h in file_hunks] for file_hunks in hunks]
+
+    budget = max_tokens - sum(estimate_tokens(h) for h in headers)
+    alloc  = _allocate([sum(c) for c in costs], [diff_priority(d) for d in diffs], max(budget, 0))
+
+    # Whole hunks, in order, within each file's allocation
+    keep = [[False] * len(c) for c in costs]
+    used = 0
+    for i, file_costs in enumerate(costs):
+        spent = 0
+        for j, cost in enumerate(file_costs):
+            if spent + cost <= alloc[i]:
+                keep[i][j] = True
+                spent     += cost
+        used += spent
+
+    # Allocation left unused at hunk granularity → highest-priority leftovers
+    spare = max(budget, 0) - used
+    order = sorted(range(len(diffs)), key=lambda i: -diff_priority(diffs[i]))
+    for i in order:
+        for j, cost in enumerate(costs[i]):
+            if not keep[i][j] and cost <= spare:
+                keep[i][j] = True
+                spare     -= cost
+
+    parts, omitted = [], []
+    for i, diff in enumerate(diffs):
+        parts.append(headers[i])
+        parts.extend(h if h.endswith("\n") else h + "\n"
+                     for h, k in zip(hunks[i], keep[i]) if k)
+        dropped = [j for j, k in enumerate(keep[i]) if not k]
+        if dropped:
+            entry = {
+                "filename":        diff["filename"],
+                "hunks_total":     len(hunks[i]),
+                "hunks_omitted":   len(dropped),
+                "omitted_headers": [sliced[i][1][j] for j in dropped],
+                "omitted_tokens":  sum(costs[i][j] for j in dropped),
+            }
+            omitted.append(entry)
+            parts.append(f"[omitted {entry['hunks_omitted']} of {entry['hunks_total']} hunk(s), "
+                         f"~{entry['omitted_tokens']} tokens: "
+                         f"{'; '.join(entry['omitted_headers'])}]\n")
+
+    if omitted:
+        parts.append("\nNOTE: some hunks were omitted to fit the review budget "
+                     "(marked [omitted ...] above). Do not report issues in omitted code.\n")
+    return "".join(parts), omitted
+
+
+def format_diffs_for_analysis(diffs: list, max_tokens: int = PROMPT_TOKEN_BUDGET) -> str:
+    """Format diffs into text for LLM analysis, packed into max_tokens."""
+    return pack_diffs(diffs, max_tokens)[0]
+
+
 # ============================================================================
 # CODE ANALYSIS PROMPTS
 # ============================================================================
@@ -32,20 +178,10 @@ Respond ONLY with valid JSON in this exact format:
 DO NOT include any text outside the JSON structure."""
 
 
-def format_diffs_for_analysis(diffs: list) -> str:
-    """Format diffs into text for LLM analysis"""
-    diffs_text = ""
-    for diff in diffs:
-        diffs_text += f"\n\n=== File: {diff['filename']} ===\n"
-        diffs_text += f"Language: {diff['language']}\n"
-        diffs_text += f"Changes: +{diff['additions']}/-{diff['deletions']}\n"
-        diffs_text += f"\nDiff:\n{diff['patch'][:2000]}\n"  # Limit to 2000 chars
-    return diffs_text
-
-
-def create_analysis_prompt(diffs: list) -> str:
+def create_analysis_prompt(diffs: list, max_tokens: int = PROMPT_TOKEN_BUDGET) -> str:
     """Create full analysis prompt"""
-    diffs_text = format_diffs_for_analysis(diffs)
+    budget     = max_tokens - estimate_tokens(CODE_ANALYSIS_SYSTEM_INSTRUCTION)
+    diffs_text = format_diffs_for_analysis(diffs, budget)
     return f"{CODE_ANALYSIS_SYSTEM_INSTRUCTION}\n\nAnalyze this code change:\n{diffs_text}"
 
 
@@ -186,7 +322,193 @@ Code diffs to review:
 """
 
 
-def create_combined_prompt(diffs: list) -> str:
+def build_combined_prompt(diffs: list, max_tokens: int = PROMPT_TOKEN_BUDGET) -> tuple:
+    """Combined prompt packed into max_tokens. Returns (prompt, omitted hunks report)."""
+    budget            = max_tokens - estimate_tokens(COMBINED_REVIEW_PROMPT)
+    diffs_text, omitted = pack_diffs(diffs, budget)
+    return COMBINED_REVIEW_PROMPT.format(diffs=diffs_text), omitted
+
+
+def create_combined_prompt(diffs: list, max_tokens: int = PROMPT_TOKEN_BUDGET) -> str:
     """Create a single prompt that returns review_comments, bugs_found, and test_suggestions in one call."""
-    diffs_text = format_diffs_for_analysis(diffs)
-    return COMBINED_REVIEW_PROMPT.format(diffs=diffs_text)
\ No newline at end of file
+    return build_combined_prompt(diffs, max_tokens)[0]
+
+
+# ============================================================================
+# LANGUAGE-SPECIFIC PROMPTS  (one leaner template per language family)
+# ============================================================================
+
+# Same JSON shape as COMBINED_REVIEW_PROMPT, without the worked example values
+LANGUAGE_REVIEW_PROMPT = """You are an expert {reviewer} code reviewer. Review these diffs for bugs, security and performance problems. Check especially: {focus}.
+
+Return ONLY valid JSON, no markdown:
+{{"review_comments": {{"summary": "", "bugs": [{{"severity": "high|medium|low", "title": "", "description": "", "suggestion": ""}}], "quality_issues": [], "security_issues": [], "positive_feedback": []}},
+"bugs_found": [{{"severity": "high|medium|low", "type": "", "description": "", "location": "filename:line", "suggestion": ""}}],
+"test_suggestions": {tests}}}
+
+Diffs:
+{diffs}
+"""
+
+LANGUAGE_TESTS_SCHEMA = ('{{"test_framework": "{framework}", "test_cases": [{{"test_name": "", '
+                         '"description": "", "test_code": "complete self-contained test", "covers_bug": ""}}]}}')
+LANGUAGE_NO_TESTS     = '{"test_cases": []}'
+
+MIXED = "mixed"     # several small families pooled — reviewed with COMBINED_REVIEW_PROMPT
+
+# family → reviewer, focus, test framework (None → no tests requested; the
+# write agent only commits a pytest file)
+PROMPT_FAMILIES = {
+    "python": {
+        "reviewer":  "Python",
+        "focus":     "None handling, mutable default arguments, exception handling, "
+                     "resource cleanup (with), asyncio misuse, injection via subprocess/eval/SQL",
+        "framework": "pytest",
+    },
+    "web": {
+        "reviewer":  "JavaScript/TypeScript",
+        "focus":     "unhandled promises and missing await, null/undefined access, == vs ===, "
+                     "unsafe types (any, non-null assertions), XSS and unsafe HTML, React hook rules",
+        "framework": None,
+    },
+    "go": {
+        "reviewer":  "Go",
+        "focus":     "ignored errors, nil dereferences, goroutine leaks and data races, "
+                     "defer in loops, context propagation, closing bodies and files",
+        "framework": None,
+    },
+    "jvm": {
+        "reviewer":  "Java/Kotlin/Scala",
+        "focus":     "null safety, resource leaks (try-with-resources, use), equals/hashCode, "
+                     "thread safety, swallowed exceptions",
+        "framework": None,
+    },
+    "native": {
+        "reviewer":  "C/C++/Rust",
+        "focus":     "memory safety, bounds and integer overflow, undefined behaviour, "
+                     "ownership and lifetimes, unsafe blocks, unchecked return values",
+        "framework": None,
+    },
+    "shell": {
+        "reviewer":  "shell script",
+        "focus":     "quoting and word splitting, set -euo pipefail, unchecked exit codes, "
+                     "command injection, portability",
+        "framework": None,
+    },
+    "sql": {
+        "reviewer":  "SQL",
+        "focus":     "injection, missing WHERE or index, transaction boundaries, "
+                     "irreversible or locking migrations",
+        "framework": None,
+    },
+    "config": {
+        "reviewer":  "configuration and infrastructure",
+        "focus":     "invalid keys or values, plain-text secrets, insecure defaults, "
+                     "unpinned versions, broken references between files",
+        "framework": None,
+    },
+    "docs": {
+        "reviewer":  "documentation",
+        "focus":     "incorrect or outdated instructions, broken code samples and links",
+        "framework": None,
+    },
+}
+
+# languages.detect_language label → family; anything else → MIXED
+LANGUAGE_FAMILIES = {
+    "python": "python",
+    "javascript": "web", "typescript": "web", "vue": "web", "svelte": "web",
+    "go": "go",
+    "java": "jvm", "kotlin": "jvm", "scala": "jvm", "groovy": "jvm",
+    "c": "native", "cpp": "native", "rust": "native", "objective-c": "native",
+    "shell": "shell", "powershell": "shell",
+    "sql": "sql",
+    "yaml": "config", "json": "config", "toml": "config", "ini": "config", "xml": "config",
+    "dockerfile": "config", "terraform": "config", "makefile": "config", "cmake": "config",
+    "starlark": "config",
+    "markdown": "docs", "restructuredtext": "docs", "text": "docs",
+}
+
+
+def prompt_family(language: str) -> str:
+    return LANGUAGE_FAMILIES.get(str(language or "").lower(), MIXED)
+
+
+def build_language_prompt(family: str, diffs: list, max_tokens: int = PROMPT_TOKEN_BUDGET) -> tuple:
+    """
+    Prompt for diffs of one family, packed into max_tokens. Falls back to the
+    combined prompt for MIXED. Returns (prompt, omitted hunks report).
+    """
+    profile = PROMPT_FAMILIES.get(family)
+    if profile is None:
+        return build_combined_prompt(diffs, max_tokens)
+
+    fields              = _language_fields(profile)
+    budget              = max_tokens - prompt_overhead_tokens(family)
+    diffs_text, omitted = pack_diffs(diffs, budget)
+    return LANGUAGE_REVIEW_PROMPT.format(diffs=diffs_text, **fields), omitted
+
+
+def _language_fields(profile: dict) -> dict:
+    framework = profile["framework"]
+    return {
+        "reviewer": profile["reviewer"],
+        "focus":    profile["focus"],
+        "tests":    LANGUAGE_TESTS_SCHEMA.format(framework=framework) if framework else LANGUAGE_NO_TESTS,
+    }
+
+
+def prompt_overhead_tokens(family: str) -> int:
+    """Template tokens the family's prompt builder takes off the budget before packing diffs."""
+    profile = PROMPT_FAMILIES.get(family)
+    if profile is None:
+        return estimate_tokens(COMBINED_REVIEW_PROMPT)
+    return estimate_tokens(LANGUAGE_REVIEW_PROMPT.format(diffs="", **_language_fields(profile)))
+
+# ============================================================================
+# CHUNKING  (map-reduce review of large PRs)
+# ============================================================================
+
+def _diff_tokens(diff: dict) -> int:
+    """Tokens pack_diffs() charges for the whole diff: header plus every hunk."""
+    return estimate_tokens(_file_header(diff)) + sum(map(estimate_tokens, _hunk_texts(diff)[0]))
+
+
+def chunk_diffs_by_token_budget(diffs: list, max_tokens: int) -> list:
+    """
+    Group diffs, in their original order, into chunks whose unpacked diff
+    text stays under max_tokens. A single diff larger than the budget gets
+    a chunk of its own (pack_diffs then trims it at hunk boundaries).
+    """
+    chunks, current, used = [], [], 0
+    for diff in diffs:
+        cost = _diff_tokens(diff)
+        if current and used + cost > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(diff)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def group_diffs_by_language(diffs: list, min_tokens: int = 0) -> list:
+    """
+    [(family, diffs)] in order of first appearance. With several families,
+    those under min_tokens of diff text are pooled into one MIXED group, so
+    a one-line README fix does not cost a Gemini call of its own.
+    """
+    groups = {}
+    for diff in diffs:
+        groups.setdefault(prompt_family(diff.get("language")), []).append(diff)
+
+    # Files without a family profile are already in MIXED; small families join them
+    small = [f for f, group in groups.items()
+             if f != MIXED and sum(map(_diff_tokens, group)) < min_tokens]
+    if len(small) > 1 or (small and MIXED in groups):
+        for family in small:
+            del groups[family]
+        pooled        = set(small) | {MIXED}
+        groups[MIXED] = [d for d in diffs if prompt_family(d.get("language")) in pooled]
+    return list(groups.items())
@@ -0,0 +1,154 @@
+"""
+llm_response_cache.py — Content-addressed on-disk cache for Gemini responses
+
+Entries are keyed by sha256(prompt, model name, prompt template version), so
+a replay of an unchanged PR returns the stored response text without a
+Gemini call. Each entry is one JSON file; its mtime is the LRU clock.
+"""
+
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Optional
+from debug_utils import log_warn
+
+AGENT = "LLM-CACHE"
+
+LLM_CACHE_DIR         = os.getenv("LLM_CACHE_DIR", ".cache/llm_responses")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_MAX_BYTES   = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+LLM_CACHE_MAX_AGE_S   = float(os.getenv("LLM_CACHE_MAX_AGE_S", str(7 * 24 * 3600)))
+LLM_CACHE_BYPASS      = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+
+def cache_key(prompt: str, model_name: str, template_version: str) -> str:
+    """sha256 over the exact inputs that determine the response."""
+    h = hashlib.sha256()
+    for part in (model_name, template_version, prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LLMResponseCache:
+    """
+    cache = LLMResponseCache()
+    text  = cache.get(key)          # None on miss / expired / bypass
+    cache.put(key, text, model=...) # write + evict down to the limits
+    cache.delete(key)               # drop an entry that turned out unusable
+    """
+
+    def __init__(self,
+                 cache_dir: str = LLM_CACHE_DIR,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 max_age_s: float = LLM_CACHE_MAX_AGE_S,
+                 bypass: bool = LLM_CACHE_BYPASS):
+        self.cache_dir   = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self.max_age_s   = max_age_s
+        self.bypass      = bypass
+
+        self.hits      = 0
+        self.misses    = 0
+        self.writes    = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text, or None. Bypass always misses."""
+        if self.bypass:
+            self.misses += 1
+            return None
+
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_s:
+                self._remove(path)
+                self.misses += 1
+                return None
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)                       # LRU touch
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            log_warn(AGENT, f"Unreadable cache entry {key[:12]}… — dropping ({e})")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry.get("response_text")
+
+    def put(self, key: str, response_text: str, **meta):
+        """Store a response atomically, then evict to the size/age limits."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {"created_at": time.time(), **meta, "response_text": response_text}
+        tmp   = f"{self._path(key)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(key))
+            self.writes += 1
+        except OSError as e:
+            log_warn(AGENT, f"Could not write cache entry {key[:12]}…: {e}")
+            self._remove(tmp)
+            return
+        self.evict()
+
+    def delete(self, key: str):
+        """Drop one entry (e.g. a stored response that turned out to be unusable)."""
+        self._remove(self._path(key))
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones past the limits."""
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        except FileNotFoundError:
+            return
+
+        now, entries = time.time(), []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - st.st_mtime > self.max_age_s:
+                self._remove(path)
+                self.evictions += 1
+            else:
+                entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()                           # oldest first
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "writes":    self.writes,
+            "evictions": self.evictions,
+        }
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Process-wide cache used by LLMReviewAgent
+llm_response_cache = LLMResponseCache()
@@ -0,0 +1,278 @@
+"""
+log_backend.py — Pluggable output backends for debug_utils
+
+debug_utils builds one LogRecord per log call and hands it to the active
+backend. Backends:
+  ConsoleBackend    coloured console text (the interactive default)
+  JsonLinesBackend  one JSON object per line, tagged with the run id
+  QueueBackend      wraps another backend; a daemon thread does the writing
+                    so callers never block on stdout / disk
+
+Configuration (env, read once by configure_logging):
+  LOG_FORMAT           console | json                       (default console)
+  LOG_LEVEL            DEBUG | INFO | WARNING | ERROR        (default DEBUG)
+  LOG_FILE             JSON-lines destination; unset → stdout
+  LOG_ASYNC            1 → background writer thread          (default 1)
+  LOG_QUEUE_SIZE       max queued records before DEBUG/INFO are dropped
+  LOG_MAX_FIELD_CHARS  cap on any string in a JSON record
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import threading
+import contextvars
+from typing import Any, Callable, Dict, List, Optional
+
+DEBUG   = 10
+INFO    = 20
+WARNING = 30
+ERROR   = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+_LEVELS     = {name: level for level, name in LEVEL_NAMES.items()}
+
+LOG_FORMAT          = os.getenv("LOG_FORMAT", "console").lower()
+LOG_LEVEL           = _LEVELS.get(os.getenv("LOG_LEVEL", "DEBUG").upper(), DEBUG)
+LOG_FILE            = os.getenv("LOG_FILE")
+LOG_ASYNC           = os.getenv("LOG_ASYNC", "1").lower() not in ("0", "false", "no")
+LOG_QUEUE_SIZE      = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+
+
+# ============================================================================
+# RUN CORRELATION ID
+# ============================================================================
+
+# Context-local, so concurrent reviews in one event loop each keep their own id
+_run_id: contextvars.ContextVar[str] = contextvars.ContextVar("run_id", default=uuid.uuid4().hex[:12])
+
+
+def new_run_id() -> str:
+    """Start a new correlation id for the current context (e.g. one PR review)."""
+    run_id = uuid.uuid4().hex[:12]
+    _run_id.set(run_id)
+    return run_id
+
+
+def set_run_id(run_id: str):
+    """Adopt an existing correlation id (e.g. when resuming a checkpointed run)."""
+    _run_id.set(run_id)
+
+
+def get_run_id() -> str:
+    return _run_id.get()
+
+
+# ============================================================================
+# RECORDS
+# ============================================================================
+
+class LogRecord:
+    """
+    One log call. `console` renders the coloured text lazily from the
+    timestamp, so formatting happens on the writer thread — and not at all
+    when the JSON backend is active.
+    """
+    __slots__ = ("ts", "level", "agent", "event", "msg", "data", "run_id", "console")
+
+    def __init__(self, level: int, agent: str, event: str, msg: str = "",
+                 data: Optional[Dict[str, Any]] = None,
+                 console: Optional[Callable[[float], List[str]]] = None):
+        self.ts      = time.time()
+        self.level   = level
+        self.agent   = agent
+        self.event   = event
+        self.msg     = msg
+        self.data    = data
+        self.run_id  = get_run_id()
+        self.console = console
+
+
+def _cap(value: Any, max_chars: int) -> Any:
+    """Truncate long strings anywhere in a JSON-able payload."""
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + f"… (+{len(value) - max_chars} chars)"
+    if isinstance(value, dict):
+        return {str(k): _cap(v, max_chars) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_cap(v, max_chars) for v in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return _cap(str(value), max_chars)
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class ConsoleBackend:
+    """Coloured console lines, exactly as the print-based helpers produced them."""
+
+    def __init__(self, stream=None):
+        self._stream = stream
+
+    @property
+    def stream(self):
+        # Resolved per write, like print(): follows redirected / replaced stdout
+        return self._stream or sys.stdout
+
+    def write(self, record: LogRecord):
+        if record.console is None:
+            return
+        # One write per record keeps a multi-line block together under concurrency
+        self.stream.write("\n".join(record.console(record.ts)) + "\n")
+
+    def flush(self):
+        if not self.stream.closed:
+            self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonLinesBackend:
+    """One JSON object per record: ts, level, run_id, agent, event, msg, data."""
+
+    def __init__(self, path: Optional[str] = None, max_field_chars: int = LOG_MAX_FIELD_CHARS):
+        self.path            = path
+        self._file           = open(path, "a", encoding="utf-8") if path else None
+        self.max_field_chars = max_field_chars
+
+    @property
+    def stream(self):
+        return self._file or sys.stdout
+
+    def write(self, record: LogRecord):
+        entry = {
+            "ts":     round(record.ts, 6),
+            "level":  LEVEL_NAMES.get(record.level, str(record.level)),
+            "run_id": record.run_id,
+            "agent":  record.agent,
+            "event":  record.event,
+            "msg":    _cap(record.msg, self.max_field_chars),
+        }
+        if record.data:
+            entry["data"] = _cap(record.data, self.max_field_chars)
+        self.stream.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def flush(self):
+        if not self.stream.closed:
+            self.stream.flush()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+
+
+_STOP = object()
+
+
+class QueueBackend:
+    """
+    Hands records to a daemon thread that writes them to `inner`. When the
+    queue is full, DEBUG/INFO records are dropped (and counted); WARNING and
+    ERROR wait for room.
+    """
+
+    def __init__(self, inner, max_queue: int = LOG_QUEUE_SIZE):
+        self.inner   = inner
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._drain, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: LogRecord):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            if record.level >= WARNING:
+                self._queue.put(record)
+            else:
+                self.dropped += 1
+
+    def _drain(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is _STOP:
+                    return
+                if isinstance(record, threading.Event):      # flush marker
+                    self.inner.flush()
+                    record.set()
+                    continue
+                try:
+                    self.inner.write(record)
+                except Exception as e:                        # never kill the writer
+                    sys.stderr.write(f"log backend error: {e}\n")
+                if self._queue.empty():
+                    self.inner.flush()
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything queued so far has been written."""
+        if not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5.0)
+        if self.dropped:
+            sys.stderr.write(f"log backend: dropped {self.dropped} record(s) under load\n")
+        self.inner.close()
+
+
+# ============================================================================
+# ACTIVE BACKEND
+# ============================================================================
+
+_backend       = None
+_backend_level = LOG_LEVEL
+
+
+def set_log_backend(backend, level: Optional[int] = None):
+    """Install a backend (anything with write/flush/close). Closes the previous one."""
+    global _backend, _backend_level
+    previous, _backend = _backend, backend
+    if level is not None:
+        _backend_level = level
+    if previous is not None and previous is not backend:
+        previous.close()
+
+
+def configure_logging(fmt: str = LOG_FORMAT, level: int = LOG_LEVEL,
+                      path: Optional[str] = LOG_FILE, use_thread: bool = LOG_ASYNC):
+    """Build the backend described by the LOG_* settings and install it."""
+    inner = JsonLinesBackend(path) if fmt == "json" else ConsoleBackend()
+    set_log_backend(QueueBackend(inner) if use_thread else inner, level)
+
+
+def is_enabled(level: int) -> bool:
+    return level >= _backend_level
+
+
+def emit(record: LogRecord):
+    if _backend is None:
+        configure_logging()
+    _backend.write(record)
+
+
+def flush_logs():
+    if _backend is not None:
+        _backend.flush()
+
+
+@atexit.register
+def _close_backend():
+    if _backend is not None:
+        _backend.close()
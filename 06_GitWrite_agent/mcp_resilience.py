@@ -0,0 +1,271 @@
+"""
+mcp_resilience.py — Timeouts, retries, hedging and circuit breaking for MCP tool calls
+
+Every agent calls MCP tools through call_tool(client, name, arguments):
+  timeout   each attempt is bounded (per tool, MCP_TOOL_TIMEOUTS overrides)
+  retry     exponential backoff with full jitter — only for tools annotated
+            readOnlyHint and idempotentHint in tool_details.txt, so a write
+            is never repeated
+  hedging   a read-only call still running after MCP_HEDGE_AFTER_MS gets a
+            second request; the first answer wins (off by default)
+  breaker   per MCP server: after MCP_BREAKER_FAILURES consecutive failures
+            calls fail fast for MCP_BREAKER_RESET_S, then one probe is let
+            through
+
+Only transport failures (timeouts, connection / HTTP-transport errors, 5xx)
+count against the breaker and are retried. A tool-level error — the server
+answered, e.g. a 404 or a validation error — is raised straight away.
+
+Tools missing from tool_details.txt (e.g. Jira's CREATE_ISSUE) are treated
+as writes: one attempt, no hedge.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+from typing import Any, Dict, Optional
+from metrics import timed_call
+from mcp_session_manager import mcp_sessions
+from debug_utils import log_warn, log_error
+
+AGENT = "MCP-CALL"
+
+MCP_READ_TIMEOUT_S    = float(os.getenv("MCP_READ_TIMEOUT_S", "20"))
+MCP_WRITE_TIMEOUT_S   = float(os.getenv("MCP_WRITE_TIMEOUT_S", "45"))
+MCP_RETRY_ATTEMPTS    = int(os.getenv("MCP_RETRY_ATTEMPTS", "3"))        # total tries for retryable tools
+MCP_RETRY_BASE_MS     = float(os.getenv("MCP_RETRY_BASE_MS", "200"))
+MCP_RETRY_MAX_MS      = float(os.getenv("MCP_RETRY_MAX_MS", "5000"))
+MCP_HEDGE_AFTER_MS    = float(os.getenv("MCP_HEDGE_AFTER_MS", "0"))       # 0 → hedging off
+MCP_BREAKER_FAILURES  = int(os.getenv("MCP_BREAKER_FAILURES", "5"))
+MCP_BREAKER_RESET_S   = float(os.getenv("MCP_BREAKER_RESET_S", "30"))
+
+# "TOOL=seconds,TOOL=seconds" — overrides the read/write default per tool
+MCP_TOOL_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (item.partition("=") for item in os.getenv("MCP_TOOL_TIMEOUTS", "").split(","))
+    if name.strip() and seconds
+}
+
+TOOL_DETAILS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_details.txt")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the server while its circuit breaker is open."""
+
+
+# Transport exception classes by name — httpx / anyio / fastmcp are only
+# imported by the MCP client itself
+_TRANSPORT_ERRORS = {"TransportError", "ClosedResourceError", "BrokenResourceError", "EndOfStream"}
+_MCP_CONNECTION_CLOSED = -32000
+
+
+def is_transport_error(e: BaseException) -> bool:
+    """True if e says the server could not be reached / did not answer, not that the tool failed."""
+    if isinstance(e, (asyncio.TimeoutError, TimeoutError, OSError)):
+        return True
+    names = {cls.__name__ for cls in type(e).__mro__}
+    if names & _TRANSPORT_ERRORS:
+        return True
+    if "HTTPStatusError" in names:
+        return getattr(getattr(e, "response", None), "status_code", 0) >= 500
+    if "McpError" in names:
+        return getattr(getattr(e, "error", None), "code", None) == _MCP_CONNECTION_CLOSED
+    return False
+
+
+# ============================================================================
+# TOOL POLICIES
+# ============================================================================
+
+class ToolPolicy:
+    __slots__ = ("name", "read_only", "idempotent", "timeout_s")
+
+    def __init__(self, name: str, read_only: bool, idempotent: bool):
+        self.name       = name
+        self.read_only  = read_only
+        self.idempotent = idempotent
+        default         = MCP_READ_TIMEOUT_S if read_only else MCP_WRITE_TIMEOUT_S
+        self.timeout_s  = MCP_TOOL_TIMEOUTS.get(name, default)
+
+    @property
+    def retryable(self) -> bool:
+        return self.read_only and self.idempotent
+
+    @property
+    def hedgeable(self) -> bool:
+        return self.read_only and MCP_HEDGE_AFTER_MS > 0
+
+
+def load_tool_annotations(path: str = TOOL_DETAILS_PATH) -> Dict[str, Dict[str, Any]]:
+    """name → MCP annotations, from the JSON tool definitions in tool_details.txt."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        log_warn(AGENT, f"Cannot read {path} ({e}) — every tool treated as a write")
+        return {}
+
+    _, _, body = text.partition("Tool Descriptions")
+    decoder, pos, annotations = json.JSONDecoder(), 0, {}
+    while True:
+        start = body.find("{", pos)
+        if start == -1:
+            break
+        try:
+            tool, pos = decoder.raw_decode(body, start)
+        except json.JSONDecodeError:
+            pos = start + 1
+            continue
+        if isinstance(tool, dict) and tool.get("name"):
+            annotations[tool["name"]] = tool.get("annotations") or {}
+    return annotations
+
+
+_annotations: Optional[Dict[str, Dict[str, Any]]] = None
+_policies:    Dict[str, ToolPolicy] = {}
+
+
+def tool_policy(name: str) -> ToolPolicy:
+    global _annotations
+    policy = _policies.get(name)
+    if policy is None:
+        if _annotations is None:
+            _annotations = load_tool_annotations()
+        hints  = _annotations.get(name, {})
+        policy = _policies[name] = ToolPolicy(name, bool(hints.get("readOnlyHint")),
+                                              bool(hints.get("idempotentHint")))
+    return policy
+
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+class CircuitBreaker:
+    """closed → (N consecutive failures) → open → (reset_s) → half-open: one probe."""
+
+    def __init__(self, server: str, failures: int = MCP_BREAKER_FAILURES,
+                 reset_s: float = MCP_BREAKER_RESET_S):
+        self.server      = server
+        self.threshold   = failures
+        self.reset_s     = reset_s
+        self.failures    = 0
+        self.opened_at: Optional[float] = None
+        self.probing     = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_s else "open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError, or admit the call; True when it is the half-open probe."""
+        state = self.state
+        if state == "open" or (state == "half-open" and self.probing):
+            raise CircuitOpenError(f"circuit open for {self.server} "
+                                   f"({self.failures} consecutive failures)")
+        if state == "half-open":
+            self.probing = True
+            return True
+        return False
+
+    def record(self, ok: bool):
+        self.probing = False
+        if ok:
+            self.failures, self.opened_at = 0, None
+            return
+        self.failures += 1
+        if self.failures >= self.threshold and self.opened_at is None:
+            log_error(AGENT, f"Circuit opened for {self.server} after {self.failures} failures")
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def circuit_breaker(server: str) -> CircuitBreaker:
+    breaker = _breakers.get(server)
+    if breaker is None:
+        breaker = _breakers[server] = CircuitBreaker(server)
+    return breaker
+
+
+# ============================================================================
+# CALL
+# ============================================================================
+
+def backoff_s(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    cap = min(MCP_RETRY_MAX_MS, MCP_RETRY_BASE_MS * (2 ** (attempt - 1)))
+    return random.uniform(0, cap) / 1000
+
+
+async def _attempt(client, policy: ToolPolicy, arguments: dict):
+    return await asyncio.wait_for(client.call_tool(policy.name, arguments), policy.timeout_s)
+
+
+async def _hedged(client, policy: ToolPolicy, arguments: dict):
+    """Primary request; if it is still running after MCP_HEDGE_AFTER_MS, race a second one."""
+    primary = asyncio.ensure_future(_attempt(client, policy, arguments))
+    done, _ = await asyncio.wait({primary}, timeout=MCP_HEDGE_AFTER_MS / 1000)
+    if done:
+        return primary.result()
+
+    hedge   = asyncio.ensure_future(_attempt(client, policy, arguments))
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_tool(client, tool_name: str, arguments: dict, server: Optional[str] = None):
+    """
+    client.call_tool with the tool's timeout, retry, hedging and the server's
+    circuit breaker applied. Returns the raw MCP result; raises the last
+    error (or CircuitOpenError) when every allowed attempt failed.
+    """
+    policy   = tool_policy(tool_name)
+    breaker  = circuit_breaker(server or mcp_sessions.server_url(client))
+    attempts = MCP_RETRY_ATTEMPTS if policy.retryable else 1
+
+    for attempt in range(1, attempts + 1):
+        probe = breaker.before_call()
+        try:
+            async with timed_call("mcp", tool_name), mcp_sessions.in_use(client):
+                if policy.hedgeable:
+                    result = await _hedged(client, policy, arguments)
+                else:
+                    result = await _attempt(client, policy, arguments)
+        except asyncio.CancelledError:
+            if probe:
+                breaker.probing = False     # no verdict — let the next call probe
+            raise
+        except Exception as e:
+            if not is_transport_error(e):
+                breaker.record(ok=True)     # the server answered — the tool call itself failed
+                raise
+            breaker.record(ok=False)
+            if isinstance(e, asyncio.TimeoutError):
+                e = TimeoutError(f"{tool_name} timed out after {policy.timeout_s:.0f}s")
+            if attempt == attempts:
+                raise e
+            delay = backoff_s(attempt)
+            log_warn(AGENT, f"{tool_name} attempt {attempt}/{attempts} failed ({e}) — "
+                            f"retrying in {delay * 1000:.0f}ms")
+            await asyncio.sleep(delay)
+            continue
+        breaker.record(ok=True)
+        return result
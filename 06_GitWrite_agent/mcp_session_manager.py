@@ -0,0 +1,256 @@
+"""
+mcp_session_manager.py — Shared, pooled FastMCP sessions for the PR Review agents
+
+One warm session per MCP server URL (up to MCP_SESSIONS_PER_SERVER) is kept
+open and handed out to the read, write and Jira agents across runs. MCP
+multiplexes requests over a session, so callers share sessions instead of
+leasing them, and never close what they are given.
+"""
+
+import os
+import time
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Dict, List
+from debug_utils import log_step, log_ok, log_warn, log_error
+
+if TYPE_CHECKING:
+    from fastmcp import Client     # imported lazily in _open — keeps startup cheap
+
+AGENT = "MCP-POOL"
+
+MCP_MAX_SESSIONS         = int(os.getenv("MCP_MAX_SESSIONS", "8"))          # across all servers
+MCP_SESSIONS_PER_SERVER  = int(os.getenv("MCP_SESSIONS_PER_SERVER", "2"))
+MCP_HEALTH_CHECK_AFTER_S = float(os.getenv("MCP_HEALTH_CHECK_AFTER_S", "30"))  # ping if idle longer
+MCP_IDLE_TIMEOUT_S       = float(os.getenv("MCP_IDLE_TIMEOUT_S", "300"))       # close if idle longer
+MCP_PING_TIMEOUT_S       = float(os.getenv("MCP_PING_TIMEOUT_S", "5"))
+
+
+class _Session:
+    __slots__ = ("url", "client", "opened_at", "last_used", "in_use", "retired")
+
+    def __init__(self, url: str, client: "Client"):
+        self.url       = url
+        self.client    = client
+        self.opened_at = time.monotonic()
+        self.last_used = self.opened_at
+        self.in_use    = 0        # calls in flight (mcp_resilience.call_tool)
+        self.retired   = False    # out of the pool; closed when the last call ends
+
+    def idle_s(self) -> float:
+        return time.monotonic() - self.last_used
+
+
+class MCPSessionManager:
+    """
+    mcp_sessions = MCPSessionManager()
+    client = await mcp_sessions.get_client(url)   # warm, shared session
+    async with mcp_sessions.in_use(client):       # around each call (mcp_resilience)
+        ...
+    await mcp_sessions.close_all()                # once, at shutdown
+
+    The lock only guards pool bookkeeping; opening, pinging and closing
+    sessions happen outside it. A session with calls in flight is never
+    closed — when it has to go (idle reap, LRU eviction, failed health
+    check) it leaves the pool and closes once its last call returns.
+    """
+
+    def __init__(self,
+                 max_sessions: int = MCP_MAX_SESSIONS,
+                 sessions_per_server: int = MCP_SESSIONS_PER_SERVER,
+                 health_check_after_s: float = MCP_HEALTH_CHECK_AFTER_S,
+                 idle_timeout_s: float = MCP_IDLE_TIMEOUT_S):
+        if max_sessions < 1 or sessions_per_server < 1:
+            raise ValueError("max_sessions and sessions_per_server must be >= 1")
+        self.max_sessions         = max_sessions
+        self.sessions_per_server  = sessions_per_server
+        self.health_check_after_s = health_check_after_s
+        self.idle_timeout_s       = idle_timeout_s
+
+        self._sessions: Dict[str, List[_Session]]       = {}
+        self._clients:  Dict[int, _Session]             = {}   # id(client) → session, retired included
+        self._opening:  Dict[str, List["asyncio.Task"]] = {}   # opens in progress (count toward caps)
+        self._next:     Dict[str, int]                  = {}   # round-robin cursor per URL
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = \
+            weakref.WeakKeyDictionary()
+        self.opened     = 0
+        self.reused     = 0
+        self.closed     = 0
+
+    # ── public API ───────────────────────────────────────────────────────────
+
+    async def get_client(self, url: str) -> "Client":
+        """Return a connected, healthy client for url, opening one if needed."""
+        async with self._lock:
+            to_close = self._reap_idle()
+            pool     = self._sessions.setdefault(url, [])
+            session, opening = None, None
+            can_open = (self._server_count(url) < self.sessions_per_server
+                        and self._total() < self.max_sessions)
+            if not can_open and pool:
+                cursor          = self._next.get(url, 0) % len(pool)
+                self._next[url] = cursor + 1
+                session         = pool[cursor]
+            elif not can_open and self._opening.get(url):
+                opening = self._opening[url][0]          # share the session being opened
+            else:
+                if not can_open:
+                    # Global cap reached by other servers — make room for this one
+                    to_close += self._evict_lru()
+                opening = self._start_open(url)
+        await self._close_all_of(to_close)
+
+        if opening is not None:
+            return (await asyncio.shield(opening)).client
+
+        if await self._healthy(session):
+            session.last_used = time.monotonic()
+            self.reused += 1
+            return session.client
+
+        log_warn(AGENT, f"Session to {url} failed health check — reopening")
+        async with self._lock:
+            to_close = self._retire(session)
+            opening  = self._start_open(url)
+        await self._close_all_of(to_close)
+        return (await asyncio.shield(opening)).client
+
+    @asynccontextmanager
+    async def in_use(self, client: "Client"):
+        """Mark client's session busy for one call, so it is not closed under it."""
+        session = self._clients.get(id(client))
+        if session is None:
+            yield
+            return
+        session.in_use   += 1
+        session.last_used = time.monotonic()
+        try:
+            yield
+        finally:
+            session.in_use   -= 1
+            session.last_used = time.monotonic()
+            if session.retired and session.in_use == 0:
+                await self._shutdown(session)
+
+    async def close_all(self):
+        """Close every pooled session. Call once at shutdown."""
+        async with self._lock:
+            sessions = list(self._clients.values())
+            self._sessions.clear()
+            self._next.clear()
+        await self._close_all_of(sessions)
+        if sessions:
+            log_ok(AGENT, f"Closed {len(sessions)} MCP session(s)  "
+                          f"(opened={self.opened} reused={self.reused})")
+
+    def server_url(self, client: "Client") -> str:
+        """URL of the pooled session that owns client ("unknown" if not pooled)."""
+        session = self._clients.get(id(client))
+        return session.url if session is not None else "unknown"
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "open":   self._total(),
+            "opened": self.opened,
+            "reused": self.reused,
+            "closed": self.closed,
+        }
+
+    @property
+    def _lock(self) -> asyncio.Lock:
+        """Pool lock of the running event loop (asyncio.Lock is bound to one loop)."""
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    # ── bookkeeping (caller holds self._lock) ────────────────────────────────
+
+    def _server_count(self, url: str) -> int:
+        return len(self._sessions.get(url, [])) + len(self._opening.get(url, []))
+
+    def _total(self) -> int:
+        return (sum(len(pool) for pool in self._sessions.values())
+                + sum(len(tasks) for tasks in self._opening.values()))
+
+    def _start_open(self, url: str) -> "asyncio.Task":
+        """Open a session in the background; it counts toward the caps until done."""
+        task  = asyncio.ensure_future(self._open(url))
+        tasks = self._opening.setdefault(url, [])
+        tasks.append(task)
+        task.add_done_callback(tasks.remove)
+        return task
+
+    def _retire(self, session: _Session) -> List[_Session]:
+        """Take session out of the pool; returns it if it can be closed now."""
+        pool = self._sessions.get(session.url, [])
+        if session in pool:
+            pool.remove(session)
+        session.retired = True
+        return [session] if session.in_use == 0 else []
+
+    def _reap_idle(self) -> List[_Session]:
+        to_close = []
+        for pool in list(self._sessions.values()):
+            for session in list(pool):
+                if session.in_use == 0 and session.idle_s() > self.idle_timeout_s:
+                    log_step(AGENT, f"Closing idle session to {session.url} "
+                                    f"(idle {session.idle_s():.0f}s)")
+                    to_close += self._retire(session)
+        return to_close
+
+    def _evict_lru(self) -> List[_Session]:
+        sessions = [s for pool in self._sessions.values() for s in pool]
+        if not sessions:
+            return []
+        idle = [s for s in sessions if s.in_use == 0]
+        lru  = min(idle or sessions, key=lambda s: s.last_used)
+        log_step(AGENT, f"Session cap reached — evicting LRU session to {lru.url}"
+                        + ("" if idle else " (closes after its calls finish)"))
+        return self._retire(lru)
+
+    # ── I/O (outside self._lock) ─────────────────────────────────────────────
+
+    async def _open(self, url: str) -> _Session:
+        from fastmcp import Client
+
+        log_step(AGENT, f"Opening MCP session → {url}")
+        client = Client(url)
+        await client.__aenter__()
+        session = _Session(url, client)
+        self._sessions.setdefault(url, []).append(session)
+        self._clients[id(client)] = session
+        self.opened += 1
+        log_ok(AGENT, f"MCP session open  ({self._total()}/{self.max_sessions} total)")
+        return session
+
+    async def _shutdown(self, session: _Session):
+        if self._clients.pop(id(session.client), None) is None:
+            return          # already closed
+        try:
+            await session.client.__aexit__(None, None, None)
+        except Exception as e:
+            log_warn(AGENT, f"Error closing session to {session.url}: {e}")
+        self.closed += 1
+
+    async def _close_all_of(self, sessions: List[_Session]):
+        for session in sessions:
+            await self._shutdown(session)
+
+    async def _healthy(self, session: _Session) -> bool:
+        if not session.client.is_connected():
+            return False
+        if session.in_use or session.idle_s() < self.health_check_after_s:
+            return True
+        try:
+            await asyncio.wait_for(session.client.ping(), timeout=MCP_PING_TIMEOUT_S)
+            return True
+        except Exception as e:
+            log_error(AGENT, f"Ping to {session.url} failed: {e}")
+            return False
+
+
+# Process-wide manager shared by every agent
+mcp_sessions = MCPSessionManager()
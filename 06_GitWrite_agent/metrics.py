@@ -0,0 +1,217 @@
+"""
+metrics.py — In-process latency histograms for the PR Review pipeline
+
+Three families, all in milliseconds:
+  pr_review_node_duration_ms{graph, node}                  every graph node
+  pr_review_external_call_duration_ms{kind, name, outcome} MCP tools, Gemini
+  pr_review_queue_wait_ms{service, priority}               review_service queue
+
+Graph nodes are timed by lg_utility.TimedStateGraph; external calls by
+wrapping them in `timed_call(kind, name)`. Export with export_prometheus()
+(text exposition format) or export_json() (count/mean/p50/p95/p99/max).
+"""
+
+import os
+import json
+import math
+import time
+import bisect
+import asyncio
+import functools
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (ms) of the Prometheus buckets; +Inf is implicit
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000]
+
+# Raw samples kept per series for percentiles (most recent N)
+METRICS_RESERVOIR_SIZE = int(os.getenv("METRICS_RESERVOIR_SIZE", "4096"))
+
+NODE_METRIC       = "pr_review_node_duration_ms"
+CALL_METRIC       = "pr_review_external_call_duration_ms"
+QUEUE_WAIT_METRIC = "pr_review_queue_wait_ms"
+
+_HELP = {
+    NODE_METRIC:       "Wall time of one LangGraph node execution.",
+    CALL_METRIC:       "Wall time of one external call (MCP tool or Gemini).",
+    QUEUE_WAIT_METRIC: "Time a queued review waited before a worker picked it up.",
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "total", "max", "samples")
+
+    def __init__(self, reservoir: int = METRICS_RESERVOIR_SIZE):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)     # last slot is +Inf
+        self.count   = 0
+        self.total   = 0.0
+        self.max     = 0.0
+        self.samples = deque(maxlen=reservoir)
+
+    def observe(self, ms: float):
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max    = max(self.max, ms)
+        self.samples.append(ms)
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile over the retained samples."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        rank    = max(1, math.ceil(pct / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean":  round(self.total / self.count, 2) if self.count else 0.0,
+            "p50":   round(self.percentile(50), 2),
+            "p95":   round(self.percentile(95), 2),
+            "p99":   round(self.percentile(99), 2),
+            "max":   round(self.max, 2),
+        }
+
+
+class MetricsRegistry:
+    """
+    metrics.observe(NODE_METRIC, {"graph": "GIT-READ", "node": "FETCH_PR_FILES"}, 412.0)
+    text = metrics.export_prometheus()
+    """
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, labels: Dict[str, str], ms: float):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._series.get(key)
+            if hist is None:
+                hist = self._series[key] = Histogram()
+            hist.observe(ms)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def export_json(self) -> Dict[str, List[Dict[str, Any]]]:
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for (metric, labels), hist in sorted(self._series.items()):
+                out.setdefault(metric, []).append({"labels": dict(labels), **hist.summary()})
+        return out
+
+    def export_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            series = sorted(self._series.items())
+        current = None
+        for (metric, labels), hist in series:
+            if metric != current:
+                lines.append(f"# HELP {metric} {_HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} histogram")
+                current = metric
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            sep  = "," if base else ""
+            cumulative = 0
+            for bound, n in zip(BUCKETS_MS + ["+Inf"], hist.buckets):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{base}}} {hist.total:.3f}")
+            lines.append(f"{metric}_count{{{base}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
+
+
+# ============================================================================
+# RECORDING HELPERS
+# ============================================================================
+
+def observe_node(graph: str, node: str, ms: float):
+    metrics.observe(NODE_METRIC, {"graph": graph, "node": node}, ms)
+
+
+def observe_call(kind: str, name: str, ms: float, ok: bool = True):
+    metrics.observe(CALL_METRIC, {"kind": kind, "name": name,
+                                  "outcome": "ok" if ok else "error"}, ms)
+
+
+def timed_node(graph: str, node: str, fn: Callable) -> Callable:
+    """Wrap a graph node (sync or async) so each run is recorded under graph/node."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _async_node(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                observe_node(graph, node, (time.perf_counter() - t0) * 1000)
+        return _async_node
+
+    @functools.wraps(fn)
+    def _sync_node(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            observe_node(graph, node, (time.perf_counter() - t0) * 1000)
+    return _sync_node
+
+
+class timed_call:
+    """
+    async with timed_call("mcp", "GITHUB_GET_A_TREE"):
+        await client.call_tool(...)
+
+    Records the call's latency, with outcome=error when it raises.
+    Works as a sync context manager too.
+    """
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.elapsed_ms = 0.0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *_):
+        self.elapsed_ms = (time.perf_counter() - self._t0) * 1000
+        observe_call(self.kind, self.name, self.elapsed_ms, ok=exc_type is None)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, *rest):
+        return self.__exit__(exc_type, *rest)
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def write_metrics(directory: str, registry: Optional[MetricsRegistry] = None) -> Tuple[str, str]:
+    """Write metrics.prom and metrics.json into directory. Returns both paths."""
+    registry = registry or metrics
+    os.makedirs(directory, exist_ok=True)
+    prom_path = os.path.join(directory, "metrics.prom")
+    json_path = os.path.join(directory, "metrics.json")
+    for path, body in ((prom_path, registry.export_prometheus()),
+                       (json_path, json.dumps(registry.export_json(), indent=2))):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, path)
+    return prom_path, json_path
@@ -0,0 +1,175 @@
+"""
+review_filter.py — Keep generated, vendored and lock files away from the LLM
+
+Every changed file is classified before its diff is built:
+
+  path rules     one compiled regex built from glob sets — lock files,
+                 minified bundles and source maps, test snapshots,
+                 generated protobuf / gRPC code, vendored directories
+  content rules  generated-file markers ("@generated", "Code generated ...
+                 DO NOT EDIT", ...) in the file header — the first
+                 REVIEW_FILTER_HEADER_LINES lines, when the patch shows the
+                 top of the file — and added lines longer than
+                 REVIEW_FILTER_MAX_LINE (minified output)
+
+Skipped files are returned with the reason, so the run records why a file
+was not reviewed instead of silently dropping it.
+
+  REVIEW_FILTER=0            only files without a patch are skipped
+  REVIEW_FILTER_SKIP=a,b     extra globs to skip
+  REVIEW_FILTER_KEEP=a,b     globs that are always reviewed (beat every rule)
+
+A glob without "/" matches the file name in any directory; one with "/"
+matches the path from the repository root or any directory below it.
+"""
+
+import os
+import re
+import fnmatch
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from artifact_store import patch_text
+
+REVIEW_FILTER              = os.getenv("REVIEW_FILTER", "1") != "0"
+REVIEW_FILTER_MAX_LINE     = int(os.getenv("REVIEW_FILTER_MAX_LINE", "1000"))   # chars
+REVIEW_FILTER_HEADER_LINES = int(os.getenv("REVIEW_FILTER_HEADER_LINES", "30"))
+
+_FIRST_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+
+def _env_globs(name: str) -> List[str]:
+    return [g.strip() for g in os.getenv(name, "").split(",") if g.strip()]
+
+
+# reason → globs
+PATH_RULES: Dict[str, List[str]] = {
+    "lock file": [
+        "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml",
+        "bun.lockb", "poetry.lock", "Pipfile.lock", "uv.lock", "pdm.lock",
+        "Cargo.lock", "Gemfile.lock", "composer.lock", "go.sum", "mix.lock",
+        "pubspec.lock", "Podfile.lock", "packages.lock.json", "*.lock",
+    ],
+    "minified": [
+        "*.min.js", "*.min.mjs", "*.min.css", "*-min.js", "*.bundle.js", "*.js.map", "*.css.map",
+    ],
+    "snapshot": [
+        "__snapshots__/*", "*.snap", "*.ambr", "*.approved.*", "*.received.*",
+    ],
+    "generated": [
+        "*_pb2.py", "*_pb2.pyi", "*_pb2_grpc.py", "*.pb.go", "*_grpc.pb.go", "*.pb.cc",
+        "*.pb.h", "*_pb.js", "*_pb.d.ts", "*_grpc_pb.js", "*.pb.swift", "*.g.dart",
+        "*.freezed.dart", "*.designer.cs", "*.Designer.cs", "*.generated.*",
+    ],
+    "vendored": [
+        "vendor/*", "vendors/*", "third_party/*", "third-party/*", "thirdparty/*",
+        "node_modules/*", "bower_components/*", "Pods/*",
+    ],
+}
+
+GENERATED_MARKERS = re.compile(
+    r"@generated\b"
+    r"|Code generated .* DO NOT EDIT"
+    r"|Generated by the protocol buffer compiler"
+    r"|DO NOT EDIT[.!]? *(?:this file|THIS FILE)?.*(?:generated|GENERATED)"
+    r"|(?:auto-?generated|automatically generated) (?:file|code|by)",
+    re.IGNORECASE,
+)
+
+
+def compile_globs(rules: Dict[str, Sequence[str]]) -> Tuple[Optional["re.Pattern"], Dict[str, str]]:
+    """One regex for every glob; each reason is a named group (m.lastgroup → reason)."""
+    parts, reasons = [], {}
+    for i, (reason, globs) in enumerate(rules.items()):
+        if not globs:
+            continue
+        group          = f"r{i}"
+        reasons[group] = reason
+        alternatives   = "|".join(f"(?:.*/)?{fnmatch.translate(g)}" for g in globs)
+        parts.append(f"(?P<{group}>{alternatives})")
+    return (re.compile("|".join(parts)) if parts else None), reasons
+
+
+def _file_header(patch: str, max_lines: int) -> str:
+    """New-side text of the file's first lines, or "" if the patch starts further down."""
+    m = _FIRST_HUNK.match(patch)
+    if not m or int(m.group(1)) > 1:
+        return ""
+    lines = patch.splitlines()[1:max_lines + 1]
+    return "\n".join(line[1:] for line in lines if not line.startswith("-"))
+
+
+def _added_lines(patch: str) -> Iterable[str]:
+    for line in patch.splitlines():
+        if line.startswith("+") and not line.startswith("+++"):
+            yield line[1:]
+
+
+class ReviewFilter:
+    """
+    review_filter = ReviewFilter()
+    reviewable, skipped = review_filter.split(changed_files)
+    """
+
+    def __init__(self,
+                 rules: Dict[str, Sequence[str]] = PATH_RULES,
+                 skip: Sequence[str] = (),
+                 keep: Sequence[str] = (),
+                 enabled: bool = True,
+                 max_line: int = REVIEW_FILTER_MAX_LINE,
+                 header_lines: int = REVIEW_FILTER_HEADER_LINES):
+        rules = dict(rules)
+        if skip:
+            rules["REVIEW_FILTER_SKIP"] = list(skip)
+        self.enabled      = enabled
+        self.max_line     = max_line
+        self.header_lines = header_lines
+        self._paths, self._reasons = compile_globs(rules)
+        self._keep, _     = compile_globs({"keep": list(keep)})
+
+    def classify(self, file: Dict) -> Optional[str]:
+        """Why file should not go to the LLM, or None if it should."""
+        patch = patch_text(file)
+        if not patch:
+            return f"no patch ({file.get('status', '?')})"
+        if not self.enabled:
+            return None
+
+        filename = file.get("filename", "")
+        if self._keep is not None and self._keep.match(filename):
+            return None
+        if self._paths is not None:
+            m = self._paths.match(filename)
+            if m:
+                return self._reasons[m.lastgroup]
+
+        marker = GENERATED_MARKERS.search(_file_header(patch, self.header_lines))
+        if marker:
+            return f"generated (marker {marker.group(0)[:40]!r})"
+        longest = max(map(len, _added_lines(patch)), default=0)
+        if longest > self.max_line:
+            return f"minified (line of {longest} chars)"
+        return None
+
+    def split(self, files: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """(files to review, skip records {filename, status, additions, deletions, reason})."""
+        reviewable, skipped = [], []
+        for f in files:
+            reason = self.classify(f)
+            if reason is None:
+                reviewable.append(f)
+                continue
+            skipped.append({
+                "filename":  f.get("filename", "?"),
+                "status":    f.get("status", "?"),
+                "additions": f.get("additions", 0),
+                "deletions": f.get("deletions", 0),
+                "reason":    reason,
+            })
+        return reviewable, skipped
+
+
+# Process-wide filter configured from the environment
+review_filter = ReviewFilter(
+    skip=_env_globs("REVIEW_FILTER_SKIP"),
+    keep=_env_globs("REVIEW_FILTER_KEEP"),
+    enabled=REVIEW_FILTER,
+)
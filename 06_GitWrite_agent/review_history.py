@@ -0,0 +1,229 @@
+"""
+review_history.py — Per-PR review history for incremental re-review
+
+For each owner/repo/pull_number we persist, per reviewed file, a fingerprint
+of its patch plus the findings attributed to it (bugs, test cases, Jira
+tickets). On the next run only files whose patch changed go back to the LLM;
+findings for unchanged files are reused.
+
+History file layout (JSON):
+{
+  "files": {
+    "<filename>": {
+      "fingerprint": "<sha256 of patch>",
+      "bugs":        [bug dicts],
+      "test_cases":  [test case dicts],
+      "tickets":     [ticket dicts]
+    }
+  },
+  "tickets": [ticket dicts]    PR-level: tickets whose bug no file entry owns
+}                              (no location, or dropped after streaming)
+"""
+
+import os
+import copy
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from debug_utils import log_step, log_warn
+
+AGENT = "HISTORY"
+
+REVIEW_HISTORY_DIR = os.getenv("REVIEW_HISTORY_DIR", ".cache/review_history")
+INCREMENTAL_REVIEW = os.getenv("INCREMENTAL_REVIEW", "1").lower() not in ("0", "false", "no")
+
+
+# ============================================================================
+# PERSISTENCE
+# ============================================================================
+
+def patch_fingerprint(patch: str) -> str:
+    return hashlib.sha256(patch.encode("utf-8")).hexdigest()
+
+
+def diff_fingerprint(diff: Dict) -> str:
+    """A diff's patch_id is already the patch fingerprint (artifact_store.py)."""
+    if diff.get("patch") is None and diff.get("patch_id"):
+        return diff["patch_id"]
+    return patch_fingerprint(diff.get("patch") or "")
+
+
+def _history_path(owner: str, repo: str, pull_number: int) -> str:
+    return os.path.join(REVIEW_HISTORY_DIR, owner, repo, f"{pull_number}.json")
+
+
+def load_review_history(owner: str, repo: str, pull_number: int) -> Dict:
+    """Load the stored history for a PR — empty when none exists or disabled."""
+    if not INCREMENTAL_REVIEW:
+        return {"files": {}}
+    path = _history_path(owner, repo, pull_number)
+    try:
+        with open(path, encoding="utf-8") as f:
+            history = json.load(f)
+    except FileNotFoundError:
+        return {"files": {}}
+    except (OSError, ValueError) as e:
+        log_warn(AGENT, f"Unreadable review history {path} — starting fresh ({e})")
+        return {"files": {}}
+    history.setdefault("files", {})
+    log_step(AGENT, f"Loaded history for {owner}/{repo}#{pull_number}: {len(history['files'])} file(s)")
+    return history
+
+
+def save_review_history(owner: str, repo: str, pull_number: int, history: Dict):
+    """Atomically persist the history for a PR."""
+    if not INCREMENTAL_REVIEW:
+        return
+    path = _history_path(owner, repo, pull_number)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        log_warn(AGENT, f"Could not save review history {path}: {e}")
+
+
+# ============================================================================
+# ATTRIBUTION
+# ============================================================================
+
+def bug_filename(bug: Dict, filenames: List[str]) -> Optional[str]:
+    """Map a bug's "filename:line" location onto one of the PR's files."""
+    location = str(bug.get("location") or "").strip()
+    if not location:
+        return None
+    path = location.rsplit(":", 1)[0].strip() if ":" in location else location
+    for fname in filenames:
+        if path == fname or fname.endswith("/" + path) or path.endswith("/" + fname):
+            return fname
+    return None
+
+
+def _bug_key(bug: Dict) -> Tuple[str, str]:
+    return (str(bug.get("type") or bug.get("bug_type") or "").lower(),
+            str(bug.get("location") or "").lower())
+
+
+# ============================================================================
+# INCREMENTAL REVIEW
+# ============================================================================
+
+def split_diffs_by_history(diffs: List[Dict], history: Dict) -> Tuple[List[Dict], List[str]]:
+    """Return (diffs whose patch changed or is new, filenames unchanged since last run)."""
+    files     = history.get("files", {})
+    changed   = []
+    unchanged = []
+    for d in diffs:
+        previous = files.get(d["filename"])
+        if previous and previous.get("fingerprint") == diff_fingerprint(d):
+            unchanged.append(d["filename"])
+        else:
+            changed.append(d)
+    return changed, unchanged
+
+
+def reused_findings(history: Dict, unchanged: List[str]) -> Dict:
+    """
+    Findings for unchanged files in the LLM response shape
+    (review_comments / bugs_found / test_suggestions), ready to be merged
+    with the fresh review.
+    """
+    files      = history.get("files", {})
+    bugs       = [b for f in unchanged for b in files[f].get("bugs", [])]
+    test_cases = [t for f in unchanged for t in files[f].get("test_cases", [])]
+    review = {
+        "summary": f"{len(unchanged)} unchanged file(s) carried over from the previous review."
+                   if unchanged else "",
+        "bugs": [{
+            "severity":    b.get("severity", "medium"),
+            "title":       b.get("type", "bug"),
+            "description": b.get("description", ""),
+            "suggestion":  b.get("suggestion", ""),
+        } for b in bugs],
+    }
+    return {
+        "review_comments":  review,
+        "bugs_found":       bugs,
+        "test_suggestions": {"test_framework": "pytest", "test_cases": test_cases},
+    }
+
+
+def update_history_findings(history: Dict, reviewed: List[Dict], unchanged: List[str],
+                            bugs: List[Dict], test_cases: List[Dict]) -> Dict:
+    """
+    Rebuild the per-file entries after a review: freshly reviewed files get
+    their new fingerprint and the fresh findings (bugs, test_cases) that can
+    be attributed to them, unchanged files keep their entry, and files no
+    longer in the PR are dropped.
+    """
+    old       = history.get("files", {})
+    files     = {f: old[f] for f in unchanged if f in old}
+    filenames = [d["filename"] for d in reviewed]
+
+    for d in reviewed:
+        files[d["filename"]] = {
+            "fingerprint": diff_fingerprint(d),
+            "bugs":        [],
+            "test_cases":  [],
+            "tickets":     [],
+        }
+
+    for bug in bugs:
+        fname = bug_filename(bug, filenames)
+        if fname:
+            files[fname]["bugs"].append(bug)
+
+    for tc in test_cases:
+        covers = str(tc.get("covers_bug") or "").lower()
+        for fname in filenames:
+            if any(_bug_key(b)[0] == covers for b in files[fname]["bugs"]):
+                files[fname]["test_cases"].append(tc)
+                break
+
+    return {**history, "files": files}
+
+
+def known_tickets(history: Dict, bugs: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Split bugs into (tickets already created for them, bugs still needing one)."""
+    by_key = {_bug_key(t): t for t in history.get("tickets", [])}
+    for entry in history.get("files", {}).values():
+        for t in entry.get("tickets", []):
+            by_key[_bug_key(t)] = t
+
+    tickets, remaining = [], []
+    for bug in bugs:
+        ticket = by_key.get(_bug_key(bug))
+        if ticket:
+            tickets.append(ticket)
+        else:
+            remaining.append(bug)
+    return tickets, remaining
+
+
+def record_tickets(history: Dict, tickets: List[Dict]) -> Dict:
+    """
+    Return a copy of history with tickets attached to the files owning their
+    bugs; tickets no file owns go to the PR-level "tickets" list, so a later
+    known_tickets() still finds them.
+    """
+    history = copy.deepcopy(history)
+    files   = history.get("files", {})
+    owned   = set()
+    for entry in files.values():
+        bug_keys = {_bug_key(b) for b in entry.get("bugs", [])}
+        have     = {t.get("ticket_key") for t in entry.get("tickets", [])}
+        for t in tickets:
+            if _bug_key(t) in bug_keys:
+                owned.add(t.get("ticket_key"))
+                if t.get("ticket_key") not in have:
+                    entry.setdefault("tickets", []).append(t)
+
+    pr_level = history.setdefault("tickets", [])
+    have     = {t.get("ticket_key") for t in pr_level}
+    for t in tickets:
+        if t.get("ticket_key") not in owned | have:
+            pr_level.append(t)
+            have.add(t.get("ticket_key"))
+    return history
@@ -0,0 +1,141 @@
+"""
+review_scheduler.py — SLA-aware ordering of queued PR reviews
+
+Each PR gets a cost estimate from cheap metadata — additions, deletions and
+changed_files from the webhook payload or GITHUB_GET_A_PULL_REQUEST, else
+the first page of GITHUB_LIST_PULL_REQUESTS_FILES — and a priority class:
+
+  URGENT  label such as hotfix / security / incident, or a hotfix/ branch
+  NORMAL  everything else
+  BULK    estimated cost above SCHEDULER_BULK_COST (vendoring, mass renames)
+
+Reviews run in ascending order of
+
+  key = class * SCHEDULER_CLASS_SPAN + log2(1 + cost) + enqueued_at / SCHEDULER_AGING_S
+
+so small PRs go first, a PR twice as large ranks one step later, and each
+SCHEDULER_AGING_S of waiting is worth one step. Aging grows at the same
+rate for every queued PR, so the key is fixed at enqueue time (a plain heap
+works) and a large PR waits at most about
+(class gap * SCHEDULER_CLASS_SPAN + log2 cost ratio) * SCHEDULER_AGING_S.
+"""
+
+import os
+import math
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from GitReadAgent import call_mcp_tool, parse_github_pr_url, FILES_PER_PAGE
+from mcp_session_manager import mcp_sessions
+from debug_utils import log_step, log_warn
+
+AGENT = "SCHEDULER"
+
+SCHEDULER_AGING_S      = float(os.getenv("SCHEDULER_AGING_S", "60"))
+SCHEDULER_CLASS_SPAN   = float(os.getenv("SCHEDULER_CLASS_SPAN", "6"))
+SCHEDULER_BULK_COST    = float(os.getenv("SCHEDULER_BULK_COST", "5000"))
+SCHEDULER_UNKNOWN_COST = float(os.getenv("SCHEDULER_UNKNOWN_COST", "500"))
+
+# A changed file costs about as much as this many changed lines
+# (one more diff header, hunk packing and MCP payload per file)
+FILE_COST = 20
+
+URGENT, NORMAL, BULK = 0, 1, 2
+CLASS_NAMES = {URGENT: "urgent", NORMAL: "normal", BULK: "bulk"}
+
+URGENT_LABELS   = {"hotfix", "urgent", "security", "incident", "p0", "sev1"}
+URGENT_BRANCHES = ("hotfix/", "hotfix-", "security/")
+
+
+# ============================================================================
+# COST & PRIORITY
+# ============================================================================
+
+def pr_cost(meta: Dict) -> float:
+    """Estimated review cost in changed-line units; SCHEDULER_UNKNOWN_COST without metadata."""
+    if not meta or meta.get("changed_files") is None:
+        return SCHEDULER_UNKNOWN_COST
+    lines = (meta.get("additions") or 0) + (meta.get("deletions") or 0)
+    return float(lines + FILE_COST * meta["changed_files"])
+
+
+def priority_class(meta: Dict, cost: float) -> int:
+    labels = {str(l.get("name", l) if isinstance(l, dict) else l).lower()
+              for l in (meta or {}).get("labels") or []}
+    branch = str(((meta or {}).get("head") or {}).get("ref") or "").lower()
+    if labels & URGENT_LABELS or branch.startswith(URGENT_BRANCHES):
+        return URGENT
+    if cost > SCHEDULER_BULK_COST:
+        return BULK
+    return NORMAL
+
+
+def priority_key(cls: int, cost: float, enqueued_at: float) -> float:
+    """Lower runs first. enqueued_at is a time.monotonic() timestamp."""
+    return cls * SCHEDULER_CLASS_SPAN + math.log2(1 + cost) + enqueued_at / SCHEDULER_AGING_S
+
+
+def prioritize(meta: Dict, enqueued_at: float) -> Tuple[float, int, float]:
+    """(key, class, cost) for a PR's metadata."""
+    cost = pr_cost(meta)
+    cls  = priority_class(meta, cost)
+    return priority_key(cls, cost, enqueued_at), cls, cost
+
+
+# ============================================================================
+# METADATA
+# ============================================================================
+
+def _details(response: Dict):
+    data = response.get("data", {}) or {}
+    return data.get("details", data) if isinstance(data, dict) else data
+
+
+async def fetch_pr_meta(pr_url: str) -> Dict:
+    """
+    additions / deletions / changed_files (+ labels, head) for a PR from
+    GITHUB_GET_A_PULL_REQUEST; falls back to summing the first page of
+    GITHUB_LIST_PULL_REQUESTS_FILES. Empty dict when neither works.
+    """
+    mcp_url = os.getenv("GITHUB_MCP_SERVER_URL")
+    if not mcp_url:
+        return {}
+    try:
+        owner, repo, pull_number = parse_github_pr_url(pr_url)
+        client = await mcp_sessions.get_client(mcp_url)
+        args   = {"owner": owner, "repo": repo, "pull_number": pull_number}
+    except Exception as e:
+        log_warn(AGENT, f"No metadata for {pr_url}: {e}")
+        return {}
+
+    try:
+        pr = _details(await call_mcp_tool(client, "GITHUB_GET_A_PULL_REQUEST", args))
+        if isinstance(pr, dict) and isinstance(pr.get("changed_files"), int):
+            return pr
+    except Exception as e:
+        log_warn(AGENT, f"GET_A_PULL_REQUEST failed for {pr_url}: {e} — sizing from the files list")
+
+    try:
+        files = _details(await call_mcp_tool(client, "GITHUB_LIST_PULL_REQUESTS_FILES",
+                                             {**args, "page": 1, "per_page": FILES_PER_PAGE})) or []
+    except Exception as e:
+        log_warn(AGENT, f"No metadata for {pr_url}: {e}")
+        return {}
+    return {
+        "additions":     sum(f.get("additions", 0) for f in files),
+        "deletions":     sum(f.get("deletions", 0) for f in files),
+        # A full first page means there may be more; count it as at least one more page
+        "changed_files": len(files) * (2 if len(files) >= FILES_PER_PAGE else 1),
+    }
+
+
+async def priority_order(urls: List[str], metas: Optional[Dict[str, Dict]] = None) -> List[int]:
+    """Batch mode: fetch metadata concurrently; indices of urls in review order."""
+    metas   = dict(metas or {})
+    missing = [u for u in dict.fromkeys(urls) if u not in metas]
+    for url, meta in zip(missing, await asyncio.gather(*(fetch_pr_meta(u) for u in missing))):
+        metas[url] = meta
+
+    ranked = sorted((*prioritize(metas[url], 0.0), i) for i, url in enumerate(urls))
+    for _, cls, cost, i in ranked:
+        log_step(AGENT, f"  {CLASS_NAMES[cls]:6s}  cost={cost:>8.0f}  {urls[i]}")
+    return [i for _, _, _, i in ranked]
@@ -0,0 +1,405 @@
+"""
+review_service.py — Webhook-driven PR review service
+
+Long-running asyncio HTTP server (stdlib only) that accepts GitHub
+`pull_request` webhooks and feeds an in-process queue drained by
+REVIEW_WORKERS workers, each running orchestrator_graph via review_pr().
+
+Jobs are ordered by review_scheduler (REVIEW_SCHEDULER=priority, the
+default: urgent and small PRs first, with aging) or FIFO. Pushes are
+coalesced per PR: a push for a PR that is already queued just
+updates the queued job's head SHA, and a push for a PR under review is
+parked and re-queued once when that review finishes. A burst of N pushes
+therefore costs at most two reviews, the last one of the latest head.
+
+Endpoints:
+  POST /webhook   GitHub webhook (X-Hub-Signature-256 checked when
+                  GITHUB_WEBHOOK_SECRET is set)
+  GET  /healthz   JSON status, worker and queue figures
+  GET  /metrics   Prometheus text: queue gauges + pipeline histograms
+
+Usage:
+    python review_service.py [--host 0.0.0.0] [--port 8080] [--workers 4] [--scheduler priority]
+"""
+
+import os
+import hmac
+import json
+import time
+import signal
+import asyncio
+import hashlib
+import argparse
+from typing import Dict, Optional, Tuple
+from Orchestrator import review_pr, enable_checkpointing
+from checkpointing import CHECKPOINT_DB, close_checkpointer
+from mcp_session_manager import mcp_sessions
+from metrics import metrics, QUEUE_WAIT_METRIC
+from review_scheduler import fetch_pr_meta, prioritize, CLASS_NAMES
+from debug_utils import log_step, log_ok, log_error
+
+AGENT = "SERVICE"
+
+REVIEW_SERVICE_HOST   = os.getenv("REVIEW_SERVICE_HOST", "0.0.0.0")
+REVIEW_SERVICE_PORT   = int(os.getenv("REVIEW_SERVICE_PORT", "8080"))
+REVIEW_WORKERS        = int(os.getenv("REVIEW_WORKERS", "4"))
+REVIEW_SCHEDULER      = os.getenv("REVIEW_SCHEDULER", "priority")      # priority | fifo
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+MAX_BODY_BYTES        = int(os.getenv("REVIEW_SERVICE_MAX_BODY_BYTES", str(25 * 1024 * 1024)))
+REQUEST_TIMEOUT_S     = 10.0
+
+# pull_request actions that change what there is to review
+REVIEW_ACTIONS = {"opened", "synchronize", "reopened", "ready_for_review"}
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized",
+            404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+
+class ReviewJob:
+    __slots__ = ("pr_url", "head_sha", "meta", "enqueued_at", "pushes", "priority", "cost")
+
+    def __init__(self, pr_url: str, head_sha: Optional[str], meta: Optional[Dict] = None):
+        self.pr_url      = pr_url
+        self.head_sha    = head_sha
+        self.meta        = meta or {}      # webhook pull_request fields used for sizing
+        self.enqueued_at = time.monotonic()
+        self.pushes      = 1
+        self.priority    = "fifo"          # scheduler class, once ranked
+        self.cost        = None
+
+    def absorb(self, head_sha: Optional[str], meta: Optional[Dict] = None):
+        """A newer push for the same PR — review its head instead."""
+        self.head_sha = head_sha or self.head_sha
+        self.meta     = meta or self.meta
+        self.pushes  += 1
+
+
+class CoalescingQueue:
+    """
+    FIFO of PRs with at most one queued and one parked job per PR.
+
+    submit(url, sha, meta) → "queued" | "coalesced" (merged into the queued job)
+                           | "deferred" (PR under review; re-queued when it finishes)
+    job = await queue.next()   ...   queue.done(job)
+
+    Subclasses change the order by overriding _enqueue / _dequeue.
+    """
+
+    def __init__(self):
+        self._order: asyncio.Queue        = asyncio.Queue()
+        self.pending:   Dict[str, ReviewJob] = {}   # queued, not started
+        self.in_flight: Dict[str, ReviewJob] = {}   # being reviewed
+        self.parked:    Dict[str, ReviewJob] = {}   # pushed during review
+        self.received  = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def submit(self, pr_url: str, head_sha: Optional[str] = None, meta: Optional[Dict] = None) -> str:
+        self.received += 1
+        if pr_url in self.pending:
+            self.pending[pr_url].absorb(head_sha, meta)
+            self.coalesced += 1
+            return "coalesced"
+        if pr_url in self.in_flight:
+            if pr_url in self.parked:
+                self.parked[pr_url].absorb(head_sha, meta)
+                self.coalesced += 1
+            else:
+                self.parked[pr_url] = ReviewJob(pr_url, head_sha, meta)
+            return "deferred"
+        self._push(ReviewJob(pr_url, head_sha, meta))
+        return "queued"
+
+    def _push(self, job: ReviewJob):
+        self.pending[job.pr_url] = job
+        self._enqueue(job)
+
+    def _enqueue(self, job: ReviewJob):
+        self._order.put_nowait(job.pr_url)
+
+    async def _dequeue(self) -> str:
+        return await self._order.get()
+
+    async def next(self) -> ReviewJob:
+        pr_url = await self._dequeue()
+        job    = self.pending.pop(pr_url)
+        self.in_flight[pr_url] = job
+        return job
+
+    def done(self, job: ReviewJob):
+        self.in_flight.pop(job.pr_url, None)
+        parked = self.parked.pop(job.pr_url, None)
+        if parked is not None:
+            self._push(parked)
+
+
+class PriorityReviewQueue(CoalescingQueue):
+    """
+    CoalescingQueue ordered by review_scheduler.priority_key. A job becomes
+    visible to workers once sized — immediately from webhook metadata, else
+    after one GET_A_PULL_REQUEST (it is already coalescable meanwhile).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._order: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq     = 0
+        self._sizing  = set()              # in-flight metadata lookups (keeps tasks alive)
+
+    def _enqueue(self, job: ReviewJob):
+        if job.meta.get("changed_files") is not None:
+            self._rank(job, job.meta)
+            return
+        task = asyncio.get_running_loop().create_task(self._size(job))
+        self._sizing.add(task)
+        task.add_done_callback(self._sizing.discard)
+
+    async def _size(self, job: ReviewJob):
+        self._rank(job, await fetch_pr_meta(job.pr_url))
+
+    def _rank(self, job: ReviewJob, meta: Dict):
+        key, cls, cost = prioritize(meta, job.enqueued_at)
+        job.priority   = CLASS_NAMES[cls]
+        job.cost       = cost
+        self._seq     += 1
+        self._order.put_nowait((key, self._seq, job.pr_url))
+
+    async def _dequeue(self) -> str:
+        return (await self._order.get())[2]
+
+
+def make_queue(kind: str = REVIEW_SCHEDULER) -> CoalescingQueue:
+    if kind == "fifo":
+        return CoalescingQueue()
+    if kind == "priority":
+        return PriorityReviewQueue()
+    raise ValueError(f"unknown scheduler {kind!r} (priority | fifo)")
+
+
+# ============================================================================
+# SERVICE
+# ============================================================================
+
+class ReviewService:
+    """
+    service = ReviewService(workers=4)
+    await service.start(host, port)
+    await service.wait_stopped()
+    """
+
+    def __init__(self, workers: int = REVIEW_WORKERS, secret: str = GITHUB_WEBHOOK_SECRET,
+                 queue: Optional[CoalescingQueue] = None):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.workers    = workers
+        self.secret     = secret.encode() if secret else b""
+        self.queue      = queue or make_queue()
+        self.started_at = time.time()
+        self.completed  = 0
+        self.failed     = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks     = []
+        self._semaphore = asyncio.Semaphore(workers)
+        self._stopped   = asyncio.Event()
+
+    # ── lifecycle ────────────────────────────────────────────────────────────
+
+    async def start(self, host: str = REVIEW_SERVICE_HOST, port: int = REVIEW_SERVICE_PORT):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._tasks  = [asyncio.create_task(self._worker(i), name=f"review-worker-{i}")
+                        for i in range(1, self.workers + 1)]
+        log_ok(AGENT, f"Listening on http://{host}:{port}  workers={self.workers}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._stopped.set()
+        log_ok(AGENT, f"Stopped — completed={self.completed} failed={self.failed} "
+                      f"dropped_queued={len(self.queue)}")
+
+    async def wait_stopped(self):
+        await self._stopped.wait()
+
+    # ── workers ──────────────────────────────────────────────────────────────
+
+    async def _worker(self, n: int):
+        while True:
+            job     = await self.queue.next()
+            wait_ms = (time.monotonic() - job.enqueued_at) * 1000
+            metrics.observe(QUEUE_WAIT_METRIC, {"service": "review", "priority": job.priority}, wait_ms)
+            log_step(AGENT, f"[worker {n}] {job.pr_url}  head={str(job.head_sha)[:10]}  "
+                            f"pushes={job.pushes}  priority={job.priority}  cost={job.cost}  "
+                            f"waited={wait_ms:.0f}ms")
+            try:
+                record = await review_pr(job.pr_url, self._semaphore)
+                if record["ok"]:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            except Exception as e:          # review_pr never raises; guard the worker anyway
+                self.failed += 1
+                log_error(AGENT, f"[worker {n}] {job.pr_url} crashed: {e}")
+            finally:
+                self.queue.done(job)
+
+    # ── request handling ─────────────────────────────────────────────────────
+
+    def handle_webhook(self, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict]:
+        if self.secret:
+            expected = "sha256=" + hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, headers.get("x-hub-signature-256", "")):
+                return 401, {"error": "bad signature"}
+
+        event = headers.get("x-github-event", "")
+        if event == "ping":
+            return 200, {"status": "pong"}
+        if event != "pull_request":
+            return 202, {"status": "ignored", "reason": f"event {event or '(none)'}"}
+
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            return 400, {"error": f"invalid JSON: {e}"}
+
+        action = payload.get("action")
+        pr     = payload.get("pull_request") or {}
+        if action not in REVIEW_ACTIONS:
+            return 202, {"status": "ignored", "reason": f"action {action}"}
+        if pr.get("draft"):
+            return 202, {"status": "ignored", "reason": "draft"}
+        if not pr.get("html_url"):
+            return 400, {"error": "pull_request.html_url missing"}
+
+        meta   = {k: pr.get(k) for k in ("additions", "deletions", "changed_files", "labels", "head")}
+        status = self.queue.submit(pr["html_url"], (pr.get("head") or {}).get("sha"), meta)
+        log_step(AGENT, f"Webhook {action}: {pr['html_url']} → {status}  depth={len(self.queue)}")
+        return 202, {"status": status, "pr": pr["html_url"], "queue_depth": len(self.queue)}
+
+    def health(self) -> Dict:
+        return {
+            "status":      "ok" if all(not t.done() for t in self._tasks) else "degraded",
+            "uptime_s":    round(time.time() - self.started_at, 1),
+            "workers":     self.workers,
+            "queue_depth": len(self.queue),
+            "in_flight":   len(self.queue.in_flight),
+            "parked":      len(self.queue.parked),
+            "received":    self.queue.received,
+            "coalesced":   self.queue.coalesced,
+            "completed":   self.completed,
+            "failed":      self.failed,
+            "mcp":         mcp_sessions.stats(),
+        }
+
+    def prometheus(self) -> str:
+        h = self.health()
+        gauges = [
+            ("pr_review_queue_depth",        "gauge",   "Reviews waiting for a worker.",           h["queue_depth"]),
+            ("pr_review_in_flight",          "gauge",   "Reviews currently running.",              h["in_flight"]),
+            ("pr_review_parked",             "gauge",   "PRs pushed again while under review.",    h["parked"]),
+            ("pr_review_webhooks_total",     "counter", "pull_request webhooks accepted.",         h["received"]),
+            ("pr_review_coalesced_total",    "counter", "Pushes merged into an existing job.",     h["coalesced"]),
+            ("pr_review_completed_total",    "counter", "Reviews finished successfully.",          h["completed"]),
+            ("pr_review_failed_total",       "counter", "Reviews that failed.",                    h["failed"]),
+        ]
+        lines = []
+        for name, kind, help_text, value in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n" + metrics.export_prometheus()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, body, ctype = await asyncio.wait_for(self._route(reader), REQUEST_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            status, body, ctype = 400, b'{"error": "request timeout"}', "application/json"
+        except Exception as e:
+            log_error(AGENT, f"Request failed: {e}")
+            status, body, ctype = 500, json.dumps({"error": str(e)}).encode(), "application/json"
+        try:
+            writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                         f"Content-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _route(self, reader: asyncio.StreamReader) -> Tuple[int, bytes, str]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            return 400, b'{"error": "malformed request"}', "application/json"
+        method, path = request_line[0].upper(), request_line[1].split("?", 1)[0]
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            return 413, b'{"error": "payload too large"}', "application/json"
+        body = await reader.readexactly(length) if length else b""
+
+        if path == "/webhook":
+            if method != "POST":
+                return 405, b'{"error": "POST only"}', "application/json"
+            status, payload = self.handle_webhook(headers, body)
+            return status, json.dumps(payload).encode(), "application/json"
+        if path == "/healthz":
+            return 200, json.dumps(self.health()).encode(), "application/json"
+        if path == "/metrics":
+            return 200, self.prometheus().encode(), "text/plain; version=0.0.4"
+        return 404, b'{"error": "not found"}', "application/json"
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Webhook-driven PR review service")
+    parser.add_argument("--host", default=REVIEW_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=REVIEW_SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=REVIEW_WORKERS)
+    parser.add_argument("--scheduler", choices=["priority", "fifo"], default=REVIEW_SCHEDULER)
+    parser.add_argument("--checkpoint-db", metavar="FILE", default=CHECKPOINT_DB,
+                        help="checkpoint every review to this SQLite file")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = _parse_args(argv)
+    if args.checkpoint_db:
+        await enable_checkpointing(args.checkpoint_db)
+
+    service = ReviewService(workers=args.workers, queue=make_queue(args.scheduler))
+    loop    = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.create_task(service.stop()))
+        except NotImplementedError:      # Windows
+            pass
+
+    await service.start(args.host, args.port)
+    try:
+        await service.wait_stopped()
+    finally:
+        await mcp_sessions.close_all()
+        if args.checkpoint_db:
+            await close_checkpointer(args.checkpoint_db)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+stream_json.py — Incremental extraction of array elements from streamed JSON
+
+The combined review prompt answers with one JSON object whose "bugs_found"
+array comes before the (much longer) test suggestions. ArrayStreamParser
+scans the response as it streams in and yields every element of the named
+top-level array as soon as its closing brace arrives, so downstream work
+can start before the model has finished. Each character is scanned once.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+class ArrayStreamParser:
+    """
+    parser = ArrayStreamParser("bugs_found")
+    for text in stream:
+        for bug in parser.feed(text):
+            ...                       # complete element, already json-decoded
+    """
+
+    def __init__(self, key: str):
+        self.key       = key
+        self.text      = ""           # everything received so far
+        self.pos       = 0            # next character to scan
+        self.depth     = 0            # brace/bracket nesting
+        self.in_string = False
+        self.escape    = False
+        self.started   = False        # seen the top-level "{" (skips ``` fences / prose)
+        self.done      = False        # the target array has closed
+
+        self._str_start: Optional[int] = None
+        self._last_str:  Optional[str] = None   # last string literal at depth 1
+        self._key:       Optional[str] = None   # key whose value is being scanned
+        self._array_depth: Optional[int] = None  # depth inside the target array
+        self._elem_start:  Optional[int] = None
+
+        self.emitted = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk; return elements of the target array completed by it."""
+        if self.done or not chunk:
+            return []
+        self.text += chunk
+
+        out  = []
+        text = self.text
+        for i in range(self.pos, len(text)):
+            c = text[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self._str_start is not None:
+                        self._last_str = text[self._str_start + 1:i]
+                continue
+
+            if not self.started:
+                if c == "{":
+                    self.started = True
+                    self.depth   = 1
+                continue
+
+            if c == '"':
+                self.in_string  = True
+                self._str_start = i
+            elif c == ":" and self.depth == 1:
+                self._key = self._last_str
+            elif c in "{[":
+                if c == "[" and self.depth == 1 and self._key == self.key:
+                    self._array_depth = self.depth + 1
+                elif c == "{" and self._array_depth is not None and self.depth == self._array_depth:
+                    self._elem_start = i
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if (c == "}" and self._elem_start is not None
+                        and self.depth == self._array_depth):
+                    element = self._decode(text[self._elem_start:i + 1])
+                    self._elem_start = None
+                    if element is not None:
+                        out.append(element)
+                elif c == "]" and self._array_depth is not None and self.depth == self._array_depth - 1:
+                    self._array_depth = None
+                    self.done = True
+                    self.pos  = i + 1
+                    return out
+
+        self.pos = len(text)
+        return out
+
+    def _decode(self, raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            element = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        self.emitted += 1
+        return element if isinstance(element, dict) else None
@@ -0,0 +1,106 @@
+import hashlib
+import os
+
+import pytest
+
+from artifact_store import ArtifactStore, patch_text, release_run_store, run_store
+
+KB = 1024
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArtifactStore("run-1", memory_limit_mb=2 * KB / (1024 * 1024), spill_dir=str(tmp_path))
+    yield store
+    store.close()
+
+
+def text(tag, size=KB):
+    return (tag * size)[:size]
+
+
+def test_ids_are_content_addresses_and_puts_deduplicate(store):
+    aid = store.put("patch")
+    assert aid == hashlib.sha256(b"patch").hexdigest()
+    assert store.put("patch") == aid
+    assert store.stats()["artifacts"] == 1 and store.dedup_hits == 1
+
+
+def test_oldest_artifacts_spill_past_the_memory_limit(store):
+    ids = [store.put(text(tag)) for tag in "abcd"]
+    stats = store.stats()
+    assert stats["spilled"] == 2 and stats["memory_bytes"] == 2 * KB
+    assert sorted(os.listdir(store.spill_dir)) == sorted(ids[:2])
+    assert [store.get(aid) for aid in ids] == [text(tag) for tag in "abcd"]
+
+
+def test_a_single_oversized_artifact_stays_in_memory(store):
+    aid = store.put(text("x", 10 * KB))
+    assert store.stats()["spilled"] == 0 and store.get(aid) == text("x", 10 * KB)
+
+
+def test_zero_limit_never_spills(tmp_path):
+    store = ArtifactStore("run-2", memory_limit_mb=0, spill_dir=str(tmp_path))
+    for tag in "abcdef":
+        store.put(text(tag, 100 * KB))
+    assert store.stats()["spilled"] == 0
+    assert not os.path.exists(store.spill_dir)
+
+
+def test_derived_values_are_computed_once(store):
+    calls = []
+
+    def measure(value):
+        calls.append(value)
+        return len(value)
+
+    aid = store.put(text("a"))
+    store.put(text("b"))
+    store.put(text("c"))                      # "a" is now spilled
+    assert store.derived(aid, measure) == store.derived(aid, measure) == KB
+    assert calls == [text("a")]
+
+
+def test_close_removes_spill_files(store):
+    for tag in "abcd":
+        store.put(text(tag))
+    assert os.path.isdir(store.spill_dir)
+    store.close()
+    assert not os.path.exists(store.spill_dir)
+    assert store.stats()["memory_bytes"] == 0
+
+
+def test_unknown_id_raises(store):
+    with pytest.raises(KeyError):
+        store.get("0" * 64)
+
+
+class FakeBlobs:
+    def __init__(self):
+        self.blobs = {}
+
+    def put(self, value, thread_id=None):
+        sha = hashlib.sha256(value.encode("utf-8")).hexdigest()
+        self.blobs[sha] = (value, thread_id)
+        return sha
+
+    def get(self, sha):
+        return self.blobs[sha][0]
+
+
+def test_durable_store_is_written_through_and_read_back(tmp_path):
+    blobs = FakeBlobs()
+    aid   = ArtifactStore("run-3", spill_dir=str(tmp_path), durable=blobs).put("patch")
+    assert blobs.blobs[aid] == ("patch", "run-3")
+    resumed = ArtifactStore("run-3", spill_dir=str(tmp_path), durable=blobs)
+    assert resumed.get(aid) == "patch"
+
+
+def test_patch_text_prefers_inline_patch():
+    try:
+        aid = run_store().put("stored")
+        assert patch_text({"patch": "inline", "patch_id": aid}) == "inline"
+        assert patch_text({"patch": None, "patch_id": aid}) == "stored"
+        assert patch_text({"filename": "logo.png"}) == ""
+    finally:
+        release_run_store()
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from bug_index import BugFingerprint, BugIndex, minhash_signature, normalize_location, similarity
+
+DESCRIPTION = "The loop reads one element past the end of the buffer when the input list is empty"
+
+
+def bug(description=DESCRIPTION, location="src/parser.py:42", kind="Index Error"):
+    return {"type": kind, "location": location, "description": description}
+
+
+def ticket(key):
+    return {"ticket_key": key, "ticket_url": f"https://jira.example/browse/{key}", "severity": "high"}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BugIndex(path=str(tmp_path / "bugs.sqlite3"), threshold=0.7, bypass=False)
+    yield index
+    index.close()
+
+
+def test_signatures_are_stable_and_comparable():
+    assert minhash_signature(DESCRIPTION) == minhash_signature(DESCRIPTION)
+    assert similarity(minhash_signature(DESCRIPTION), minhash_signature(DESCRIPTION)) == 1.0
+    assert similarity(minhash_signature(DESCRIPTION), minhash_signature("unrelated text here")) < 0.3
+    assert similarity(minhash_signature("a"), minhash_signature("a")[:8]) == 0.0
+
+
+def test_location_drops_line_numbers():
+    assert normalize_location({"location": "./Src\\Parser.py:42-50"}) == "src/parser.py"
+    assert normalize_location({"location": "src/parser.py:42:7"}) == "src/parser.py"
+
+
+def test_fingerprint_matches_near_duplicates_only():
+    fp = BugFingerprint(bug())
+    assert fp.matches(BugFingerprint(bug(location="src/parser.py:57", kind="index_error")))
+    assert fp.matches(BugFingerprint(bug(DESCRIPTION + " again")))
+    assert not fp.matches(BugFingerprint(bug("Division by zero when the total is empty")))
+    assert not fp.matches(BugFingerprint(bug(location="src/lexer.py:42")))
+
+
+def test_lookup_finds_indexed_ticket(index):
+    index.add("PRJ", BugFingerprint(bug()), ticket("PRJ-1"))
+    hit = index.lookup("PRJ", BugFingerprint(bug(location="src/parser.py:60")))
+    assert hit["ticket_key"] == "PRJ-1" and hit["similarity"] == 1.0
+    assert index.lookup("OTHER", BugFingerprint(bug())) is None
+    assert index.stats() == {"hits": 1, "misses": 1, "writes": 1}
+
+
+def test_add_if_missing_does_not_duplicate(index):
+    fp = BugFingerprint(bug())
+    index.add("PRJ", fp, ticket("PRJ-1"))
+    index.add("PRJ", fp, ticket("PRJ-1"), if_missing=True)
+    assert index.writes == 1
+
+
+def test_find_prefers_history_and_indexes_it(index):
+    history = {"files": {}, "tickets": [{**ticket("PRJ-7"), "type": "Index Error",
+                                         "location": "src/parser.py:42"}]}
+    hit = asyncio.run(index.find("PRJ", bug(), history=history))
+    assert hit["ticket_key"] == "PRJ-7"
+    assert index.lookup("PRJ", BugFingerprint(bug()))["ticket_key"] == "PRJ-7"
+
+
+def test_find_and_remember_use_the_index(index):
+    async def scenario():
+        fp = BugFingerprint(bug())
+        assert await index.find("PRJ", bug(), fp) is None
+        await index.remember("PRJ", fp, ticket("PRJ-2"))
+        return await asyncio.gather(*(index.find("PRJ", bug()) for _ in range(5)))
+
+    assert [hit["ticket_key"] for hit in asyncio.run(scenario())] == ["PRJ-2"] * 5
+
+
+def test_bypass_never_touches_sqlite(tmp_path):
+    index = BugIndex(path=str(tmp_path / "bugs.sqlite3"), bypass=True)
+    index.add("PRJ", BugFingerprint(bug()), ticket("PRJ-1"))
+    assert index.lookup("PRJ", BugFingerprint(bug())) is None
+    assert not (tmp_path / "bugs.sqlite3").exists()
@@ -0,0 +1,113 @@
+import json
+import sqlite3
+
+import pytest
+
+from checkpointing import BLOB_KEY, BlobStore, CompactSerializer
+from diff_hunks import diff_hunks, parse_patch
+
+LONG = "x" * 64
+
+
+class JsonSerializer:
+    """Stand-in for JsonPlusSerializer: (type, bytes) pairs of plain JSON."""
+
+    def dumps_typed(self, obj):
+        return "json", self.dumps(obj)
+
+    def loads_typed(self, data):
+        return self.loads(data[1])
+
+    def dumps(self, obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    with sqlite3.connect(path) as conn:        # the saver's table, as prune() sees it
+        conn.execute("CREATE TABLE checkpoints (thread_id TEXT)")
+    return path
+
+
+@pytest.fixture
+def blobs(db):
+    store = BlobStore(db)
+    yield store
+    store.close()
+
+
+def blob_count(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM checkpoint_blobs").fetchone()[0]
+
+
+def checkpoint(path, thread_id):
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO checkpoints VALUES (?)", (thread_id,))
+
+
+def test_round_trip_moves_long_strings_to_blobs(blobs):
+    serde = CompactSerializer(blobs, inner=JsonSerializer(), min_chars=32)
+    state = {"summary": LONG, "short": "ok", "tests": [LONG, {"code": LONG + "y"}], "n": 3}
+
+    kind, data = serde.dumps_typed(state)
+    stored     = json.loads(data)
+    assert kind == "json"
+    assert stored["short"] == "ok" and set(stored["summary"]) == {BLOB_KEY}
+    assert stored["tests"][0] == stored["summary"]                   # written once
+    assert serde.loads_typed((kind, data)) == state                  # queued or committed
+
+    blobs.flush()
+    assert blob_count(blobs.path) == 2
+    assert serde.loads(serde.dumps(state)) == state                  # and from SQLite
+
+
+def test_parsed_patches_are_dropped_and_reparsed(blobs):
+    serde = CompactSerializer(blobs, inner=JsonSerializer())
+    patch = "@@ -1 +1,2 @@\n+a\n+b\n"
+    diff  = {"filename": "a.py", "patch": patch, "hunks": parse_patch(patch)}
+    restored = serde.loads_typed(serde.dumps_typed({"diffs": [diff]}))["diffs"][0]
+    assert restored["hunks"] is None
+    assert list(diff_hunks(restored).added_lines) == [1, 2]
+
+
+def test_missing_blob_raises(blobs):
+    with pytest.raises(KeyError):
+        blobs.get("0" * 64)
+
+
+def test_drop_thread_keeps_shared_blobs(blobs):
+    blobs.put("only run-a", thread_id="run-a")
+    blobs.put("shared", thread_id="run-a")
+    shared = blobs.put("shared", thread_id="run-b")
+    blobs.flush()
+
+    assert blobs.drop_thread("run-a") == 1
+    assert blob_count(blobs.path) == 1
+    assert blobs.get(shared) == "shared"
+
+
+def test_prune_removes_blobs_of_threads_without_checkpoints(db, blobs):
+    checkpoint(db, "kept")
+    kept = blobs.put("kept text", thread_id="kept")
+    blobs.put("finished text", thread_id="gone")
+    blobs.flush()
+
+    assert blobs.prune() == 1
+    assert blob_count(db) == 1
+    assert blobs.get(kept) == "kept text"
+
+
+def test_blobs_survive_reopening(db):
+    store = BlobStore(db)
+    sha   = store.put(LONG, thread_id="run")
+    store.close()
+    reopened = BlobStore(db)
+    try:
+        assert reopened.get(sha) == LONG
+    finally:
+        reopened.close()
@@ -0,0 +1,74 @@
+import pytest
+
+from llm_agent_prompts import _diff_tokens, chunk_diffs_by_token_budget
+
+
+def make_diff(name, lines=10):
+    body = "".join(f"+line {i} of {name}\n" for i in range(lines))
+    return {"filename": name, "status": "modified", "language": "python",
+            "additions": lines, "deletions": 0,
+            "patch": f"@@ -0,0 +1,{lines} @@\n{body}"}
+
+
+def test_chunks_keep_order_and_budget():
+    diffs  = [make_diff(f"f{i}.py") for i in range(6)]
+    budget = _diff_tokens(diffs[0]) * 2
+    chunks = chunk_diffs_by_token_budget(diffs, budget)
+    assert [d for chunk in chunks for d in chunk] == diffs
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2]
+    assert all(sum(map(_diff_tokens, chunk)) <= budget for chunk in chunks)
+
+
+def test_oversized_diff_gets_own_chunk():
+    small, big = make_diff("small.py", 2), make_diff("big.py", 500)
+    chunks = chunk_diffs_by_token_budget([small, big, small], _diff_tokens(small) * 3)
+    assert chunks == [[small], [big], [small]]
+
+
+def test_everything_fits_in_one_chunk():
+    diffs = [make_diff("a.py"), make_diff("b.py")]
+    assert chunk_diffs_by_token_budget(diffs, 10 ** 6) == [diffs]
+
+
+@pytest.fixture
+def merge():
+    pytest.importorskip("langgraph")
+    from LLMReviewAgent import merge_review_results
+    return merge_review_results
+
+
+def result(bugs=(), tests=(), summary="", framework=None):
+    return {
+        "review_comments":  {"summary": summary, "bugs": [], "quality_issues": [],
+                             "security_issues": [], "positive_feedback": []},
+        "bugs_found":       list(bugs),
+        "test_suggestions": {"test_framework": framework, "test_cases": list(tests)},
+    }
+
+
+def test_single_result_is_returned_unchanged(merge):
+    only = result(summary="one")
+    assert merge([only]) is only
+
+
+def test_bugs_are_deduplicated_across_chunks(merge):
+    bug = {"type": "logic", "location": "a.py:3", "description": "Off by one"}
+    same = {"type": "Logic", "location": "a.py:3", "description": "  off by one "}
+    other = {"type": "logic", "location": "b.py:9", "description": "Off by one"}
+    merged = merge([result(bugs=[bug], summary="A."), result(bugs=[same, other], summary="B.")])
+    assert merged["bugs_found"] == [bug, other]
+    assert merged["review_comments"]["summary"] == "A. B."
+
+
+def test_colliding_test_names_are_renamed_in_code(merge):
+    def case(body):
+        return {"test_name": "test_parse", "test_code": f"def test_parse():\n    {body}\n"}
+
+    merged = merge([result(tests=[case("assert 1")]),
+                    result(tests=[case("assert 2")], framework="unittest"),
+                    result(tests=[case("assert 3")])])
+    cases = merged["test_suggestions"]["test_cases"]
+    assert [tc["test_name"] for tc in cases] == ["test_parse", "test_parse_2", "test_parse_3"]
+    assert cases[1]["test_code"].startswith("def test_parse_2():")
+    assert cases[2]["test_code"].startswith("def test_parse_3():")
+    assert merged["test_suggestions"]["test_framework"] == "unittest"
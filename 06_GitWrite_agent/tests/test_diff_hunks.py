@@ -0,0 +1,66 @@
+import pytest
+
+from diff_hunks import bug_in_changed_lines, filter_bugs_to_changed_lines, parse_location, parse_patch
+
+PATCH = (
+    "@@ -1,3 +1,4 @@ def first():\n"
+    " keep\n"
+    "-old\n"
+    "+new one\n"
+    "+new two\n"
+    " keep\n"
+    "@@ -20,2 +21,1 @@\n"
+    "-gone\n"
+    " tail\n"
+    "\\ No newline at end of file\n"
+)
+
+
+def test_parse_patch_counts_lines_and_offsets():
+    parsed = parse_patch(PATCH)
+    first, second = parsed.hunks
+    assert (first.new_start, first.new_len, first.additions, first.deletions) == (1, 4, 2, 1)
+    assert (second.new_start, second.new_len, second.additions, second.deletions) == (21, 1, 0, 1)
+    assert list(parsed.added_lines) == [2, 3]
+    assert (parsed.additions, parsed.deletions) == (2, 2)
+    assert first.header(PATCH) == "@@ -1,3 +1,4 @@ def first():"
+    assert first.text(PATCH) + second.text(PATCH) == PATCH
+    assert parsed.covers(4) and parsed.covers(21) and not parsed.covers(10)
+
+
+def test_parse_patch_defaults_and_garbage():
+    (hunk,) = parse_patch("@@ -5 +5 @@\n+x\n").hunks
+    assert (hunk.old_len, hunk.new_len, hunk.new_end) == (1, 1, 5)
+    assert parse_patch("").hunks == []
+    assert parse_patch("Binary files differ\n").hunks == []
+
+
+@pytest.mark.parametrize("location, expected", [
+    ("src/a.py:12",     ("src/a.py", 12, 12)),
+    ("src/a.py:12-15",  ("src/a.py", 12, 15)),
+    ("src/a.py:12 - 15", ("src/a.py", 12, 15)),
+    ("src/a.py",        ("src/a.py", None, None)),
+    ("",                ("", None, None)),
+])
+def test_parse_location(location, expected):
+    assert parse_location(location) == expected
+
+
+@pytest.mark.parametrize("location, kept", [
+    ("src/a.py:3",      True),      # inside the first hunk
+    ("src/a.py:5-30",   True),      # range overlapping the second hunk
+    ("src/a.py:10",     False),     # between hunks
+    ("a.py:2",          True),      # path suffix still names the file
+    ("src/a.py",        True),      # no line number → cannot check
+    ("src/other.py:2",  False),     # not part of the diff
+    ("",                True),      # no location → kept
+])
+def test_bug_in_changed_lines(location, kept):
+    assert bug_in_changed_lines({"location": location}, {"src/a.py": parse_patch(PATCH)}) is kept
+
+
+def test_filter_bugs_to_changed_lines():
+    diffs   = [{"filename": "src/a.py", "patch": PATCH}]
+    inside  = {"location": "src/a.py:2"}
+    outside = {"location": "src/a.py:100"}
+    assert filter_bugs_to_changed_lines([inside, outside], diffs) == ([inside], [outside])
@@ -0,0 +1,59 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+import GitReadAgent
+from GitReadAgent import FILES_PER_PAGE, fetch_all_pr_files
+
+
+class FakeGitHub:
+    """MCP client answering the two tools fetch_all_pr_files uses."""
+
+    def __init__(self, total_files, report_count=True):
+        self.files        = [{"filename": f"f{i}.py"} for i in range(total_files)]
+        self.report_count = report_count
+        self.pages        = []
+
+    async def call_tool(self, name, arguments):
+        if name == "GITHUB_GET_A_PULL_REQUEST":
+            data = {"changed_files": len(self.files)} if self.report_count else {}
+        else:
+            page = arguments["page"]
+            self.pages.append(page)
+            await asyncio.sleep(0.001 * (10 - page % 10))        # later pages may finish first
+            start = (page - 1) * FILES_PER_PAGE
+            data  = {"details": self.files[start:start + FILES_PER_PAGE]}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps({"data": data}))])
+
+
+def fetch(client):
+    return asyncio.run(fetch_all_pr_files(client, "o", "r", 1))
+
+
+def test_single_page_needs_no_more_requests():
+    client = FakeGitHub(7)
+    assert [f["filename"] for f in fetch(client)] == [f"f{i}.py" for i in range(7)]
+    assert client.pages == [1]
+
+
+def test_concurrent_pages_are_merged_in_page_order():
+    client = FakeGitHub(3 * FILES_PER_PAGE + 5)
+    files  = fetch(client)
+    assert [f["filename"] for f in files] == [f["filename"] for f in client.files]
+    assert sorted(client.pages) == [1, 2, 3, 4]
+
+
+def test_unknown_count_walks_pages_until_a_short_one():
+    client = FakeGitHub(2 * FILES_PER_PAGE + 1, report_count=False)
+    assert len(fetch(client)) == 2 * FILES_PER_PAGE + 1
+    assert client.pages == [1, 2, 3]
+
+
+def test_page_count_is_capped(monkeypatch):
+    monkeypatch.setattr(GitReadAgent, "MAX_FILE_PAGES", 2)
+    client = FakeGitHub(5 * FILES_PER_PAGE)
+    assert len(fetch(client)) == 2 * FILES_PER_PAGE
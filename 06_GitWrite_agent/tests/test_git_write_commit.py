@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+import GitWriteAgent
+from GitWriteAgent import ARTIFACT_KEYS, WRITE_TASKS, git_commit_artifacts_node, git_write_init_node
+
+
+def artifact(path, flag, content="x"):
+    return {"path": path, "content": content, "message": f"update {path}", "flag": flag}
+
+
+def state(**values):
+    base = {"owner": "o", "repo": "r", "pull_number": 7, "client": object(),
+            "staged_files": None, "defer_commit": False, **{k: None for k in ARTIFACT_KEYS}}
+    return {**base, **values}
+
+
+@pytest.fixture
+def written(monkeypatch):
+    calls = []
+
+    async def write_artifacts(client, owner, repo, pull_number, artifacts, message):
+        calls.append((artifacts, message))
+        return [True] * len(artifacts)
+
+    monkeypatch.setattr(GitWriteAgent, "write_artifacts", write_artifacts)
+    return calls
+
+
+@pytest.mark.parametrize("requested, expected", [
+    (None,                          WRITE_TASKS),
+    ([],                            []),
+    (["TAG_PR", "DELETE_REPO"],     ["TAG_PR"]),
+])
+def test_init_keeps_an_explicit_empty_task_list(requested, expected):
+    result = asyncio.run(git_write_init_node({"write_tasks": requested}))
+    assert result["write_tasks"] == expected
+    assert result["pending_files"] == [] and not result["tests_committed"]
+
+
+def test_commit_writes_one_blob_per_path(written):
+    staged  = [artifact(".github/pr-review/tags.json", "pr_tagged", "old"),
+               artifact("tests/test_pr_7.py", "tests_committed")]
+    fresh   = artifact(".github/pr-review/tags.json", "pr_tagged", "new")
+    result  = asyncio.run(git_commit_artifacts_node(state(staged_files=staged, tags_artifact=fresh)))
+
+    (artifacts, message), = written
+    assert [a["path"] for a in artifacts] == [".github/pr-review/tags.json", "tests/test_pr_7.py"]
+    assert artifacts[0]["content"] == "new"
+    assert message.count("update .github/pr-review/tags.json") == 1
+    assert result == {"pr_tagged": True, "tests_committed": True, "pending_files": []}
+
+
+def test_nothing_staged_means_no_commit(written):
+    assert asyncio.run(git_commit_artifacts_node(state())) == {"pending_files": []}
+    assert written == []
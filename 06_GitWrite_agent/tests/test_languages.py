@@ -0,0 +1,78 @@
+import pytest
+
+from languages import UNKNOWN, detect_language, shebang_language
+from llm_agent_prompts import MIXED, _diff_tokens, group_diffs_by_language
+
+
+def script(first_line, start="@@ -0,0 +1,2 @@"):
+    return f"{start}\n+{first_line}\n+echo hi\n"
+
+
+@pytest.mark.parametrize("filename, language", [
+    ("src/app.py",             "python"),
+    ("web/App.TSX",            "typescript"),
+    ("deploy/values.yml",      "yaml"),
+    ("Dockerfile",             "dockerfile"),
+    ("docker/Dockerfile.prod", "dockerfile"),
+    ("CMakeLists.txt",         "cmake"),
+    ("requirements-dev.txt",   "text"),
+    (".env",                   "ini"),
+    ("config/.env",            "ini"),
+    (".bashrc",                "shell"),
+    ("archive.tar.gz",         UNKNOWN),
+    ("LICENSE",                "text"),
+    ("bin/tool",               UNKNOWN),
+])
+def test_detect_by_name_and_extension(filename, language):
+    assert detect_language(filename) == language
+
+
+@pytest.mark.parametrize("first_line, language", [
+    ("#!/usr/bin/env python3",            "python"),
+    ("#!/usr/bin/env -S node --harmony",  "javascript"),
+    ("#!/bin/bash -e",                    "shell"),
+    ("#!/usr/local/bin/ruby2.7",          "ruby"),
+    ("#!/usr/bin/env",                    None),
+    ("#!/opt/custom-interpreter",         None),
+    ("import os",                         None),
+])
+def test_shebang(first_line, language):
+    assert shebang_language(script(first_line)) == language
+
+
+def test_shebang_needs_the_top_of_the_file():
+    assert shebang_language(script("#!/bin/sh", start="@@ -10,2 +10,3 @@")) is None
+    replaced = "@@ -1,2 +1,2 @@\n-#!/bin/sh\n+#!/usr/bin/env python3\n import os\n"
+    assert shebang_language(replaced) == "python"
+
+
+def test_extension_beats_shebang_and_shebang_beats_unknown():
+    assert detect_language("run.sh", script("#!/usr/bin/env python3")) == "shell"
+    assert detect_language("bin/run", script("#!/usr/bin/env python3")) == "python"
+
+
+def diff(name, language, lines=1):
+    body = "".join(f"+line {i}\n" for i in range(lines))
+    return {"filename": name, "status": "modified", "language": language,
+            "additions": lines, "deletions": 0, "patch": f"@@ -0,0 +1,{lines} @@\n{body}"}
+
+
+def test_groups_keep_first_appearance_order():
+    diffs  = [diff("a.ts", "typescript"), diff("b.py", "python"), diff("c.js", "javascript")]
+    groups = group_diffs_by_language(diffs)
+    assert [(family, [d["filename"] for d in group]) for family, group in groups] == \
+           [("web", ["a.ts", "c.js"]), ("python", ["b.py"])]
+
+
+def test_small_families_are_pooled_into_mixed():
+    big    = [diff(f"m{i}.py", "python", 200) for i in range(2)]
+    small  = [diff("README.md", "markdown"), diff("ci.yml", "yaml"), diff("x.bin", "unknown")]
+    groups = dict(group_diffs_by_language(big + small, min_tokens=_diff_tokens(big[0])))
+    assert set(groups) == {"python", MIXED}
+    assert [d["filename"] for d in groups[MIXED]] == ["README.md", "ci.yml", "x.bin"]
+
+
+def test_a_single_small_family_is_not_pooled_on_its_own():
+    diffs  = [diff("m.py", "python", 200), diff("README.md", "markdown")]
+    groups = group_diffs_by_language(diffs, min_tokens=_diff_tokens(diffs[0]))
+    assert [family for family, _ in groups] == ["python", "docs"]
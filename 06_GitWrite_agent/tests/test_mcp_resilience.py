@@ -0,0 +1,152 @@
+import asyncio
+import itertools
+
+import pytest
+
+import mcp_resilience
+from mcp_resilience import CircuitBreaker, CircuitOpenError, call_tool, circuit_breaker, is_transport_error
+
+READ_TOOL  = "GITHUB_FIND_PULL_REQUESTS"      # readOnly + idempotent → retried
+WRITE_TOOL = "CREATE_ISSUE"                   # not annotated → one attempt
+
+_servers = itertools.count()
+
+
+@pytest.fixture
+def server():
+    """A fresh breaker name per test — breakers are process-wide."""
+    return f"test-server-{next(_servers)}"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(mcp_resilience, "backoff_s", lambda attempt: 0)
+
+
+class TransportError(Exception):
+    """Named like httpx's — is_transport_error matches by class name."""
+
+
+class McpError(Exception):
+    def __init__(self, code):
+        super().__init__(f"mcp error {code}")
+        self.error = type("ErrorData", (), {"code": code})()
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = type("Response", (), {"status_code": status})()
+
+
+class FakeClient:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls    = 0
+
+    async def call_tool(self, name, arguments):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+@pytest.mark.parametrize("error, transport", [
+    (asyncio.TimeoutError(),          True),
+    (ConnectionResetError(),          True),
+    (TransportError(),                True),
+    (HTTPStatusError(503),            True),
+    (HTTPStatusError(404),            False),
+    (McpError(-32000),                True),
+    (McpError(-32602),                False),
+    (ValueError("bad arguments"),     False),
+])
+def test_is_transport_error(error, transport):
+    assert is_transport_error(error) is transport
+
+
+def test_breaker_opens_then_admits_a_single_probe(server):
+    breaker = CircuitBreaker(server, failures=2, reset_s=3600)
+    for _ in range(2):
+        assert breaker.before_call() is False
+        breaker.record(ok=False)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.reset_s = 0
+    assert breaker.state == "half-open"
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()                     # the probe is still out
+    breaker.record(ok=True)
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_failed_probe_reopens(server):
+    breaker = CircuitBreaker(server, failures=1, reset_s=0)
+    breaker.record(ok=False)
+    assert breaker.before_call() is True
+    breaker.record(ok=False)
+    breaker.reset_s = 3600
+    assert breaker.state == "open"
+
+
+def test_transport_errors_are_retried_and_counted(server):
+    client = FakeClient(TransportError("reset"), TransportError("reset"), "answer")
+    assert asyncio.run(call_tool(client, READ_TOOL, {}, server=server)) == "answer"
+    assert client.calls == 3
+    assert circuit_breaker(server).failures == 0
+
+
+def test_writes_are_not_retried(server):
+    client = FakeClient(TransportError("reset"), "answer")
+    with pytest.raises(TransportError):
+        asyncio.run(call_tool(client, WRITE_TOOL, {}, server=server))
+    assert client.calls == 1
+    assert circuit_breaker(server).failures == 1
+
+
+def test_tool_errors_neither_retry_nor_trip_the_breaker(server):
+    breaker = circuit_breaker(server)
+    breaker.failures = breaker.threshold - 1
+    client = FakeClient(McpError(-32602))
+    with pytest.raises(McpError):
+        asyncio.run(call_tool(client, READ_TOOL, {}, server=server))
+    assert client.calls == 1
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_open_breaker_fails_fast(server):
+    breaker = circuit_breaker(server)
+    breaker.reset_s = 3600
+    for _ in range(breaker.threshold):
+        breaker.record(ok=False)
+    client = FakeClient()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_tool(client, READ_TOOL, {}, server=server))
+    assert client.calls == 0
+
+
+def test_cancelled_probe_lets_the_next_call_probe(server):
+    breaker = circuit_breaker(server)
+    breaker.reset_s = 0
+    for _ in range(breaker.threshold):
+        breaker.record(ok=False)
+
+    class Hanging(FakeClient):
+        async def call_tool(self, name, arguments):
+            await asyncio.sleep(3600)
+
+    async def scenario():
+        probe = asyncio.ensure_future(call_tool(Hanging(), READ_TOOL, {}, server=server))
+        await asyncio.sleep(0)
+        assert breaker.probing
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await call_tool(FakeClient("answer"), READ_TOOL, {}, server=server)
+
+    assert asyncio.run(scenario()) == "answer"
+    assert breaker.state == "closed"
@@ -0,0 +1,67 @@
+import pytest
+
+from llm_agent_prompts import (MIXED, _diff_tokens, build_language_prompt, chunk_diffs_by_token_budget,
+                               estimate_tokens, pack_diffs, prompt_overhead_tokens)
+
+
+def hunk(start, lines, tag):
+    body = "".join(f"+{tag} line {i}: some code here\n" for i in range(lines))
+    return f"@@ -{start},0 +{start},{lines} @@ {tag}\n{body}"
+
+
+def make_diff(name, hunks, language="python", status="modified"):
+    patch = "".join(hunk(1 + 100 * i, lines, f"{name}#{i}") for i, lines in enumerate(hunks))
+    return {"filename": name, "status": status, "language": language,
+            "additions": sum(hunks), "deletions": 0, "patch": patch}
+
+
+def test_everything_fits_without_omissions():
+    diffs = [make_diff("a.py", [5, 5]), make_diff("b.py", [3])]
+    text, omitted = pack_diffs(diffs, 10 ** 6)
+    assert omitted == []
+    assert "=== File: a.py ===" in text and "a.py#1" in text and "b.py#0" in text
+    assert "[omitted" not in text
+
+
+def test_tight_budget_drops_whole_hunks_and_reports_them():
+    diffs = [make_diff("big.py", [40, 40, 40]), make_diff("small.py", [2])]
+    budget = _diff_tokens(diffs[0]) // 2
+    text, omitted = pack_diffs(diffs, budget)
+
+    assert estimate_tokens(text) <= budget + 100         # + omission markers and note
+    assert "=== File: small.py ===" in text and "small.py#0" in text
+    (entry,) = omitted
+    assert entry["filename"] == "big.py" and entry["hunks_total"] == 3
+    assert 1 <= entry["hunks_omitted"] < 3
+    assert entry["omitted_tokens"] > 0
+    for header in entry["omitted_headers"]:
+        assert header in text                             # listed in the marker …
+        assert text.count(header) == 1                    # … but its body is gone
+    assert "Do not report issues in omitted code" in text
+
+
+def test_headers_survive_a_zero_budget():
+    diffs = [make_diff("a.py", [5]), make_diff("b.py", [5])]
+    text, omitted = pack_diffs(diffs, 0)
+    assert "=== File: a.py ===" in text and "=== File: b.py ===" in text
+    assert [e["hunks_omitted"] for e in omitted] == [1, 1]
+
+
+def test_higher_priority_file_keeps_more():
+    diffs = [make_diff("notes.txt", [30, 30], language="text"),
+             make_diff("core.py", [30, 30], status="added")]
+    _, omitted = pack_diffs(diffs, sum(map(_diff_tokens, diffs)) * 2 // 3)
+    dropped = {e["filename"]: e["hunks_omitted"] for e in omitted}
+    assert dropped.get("core.py", 0) <= dropped.get("notes.txt", 0)
+
+
+@pytest.mark.parametrize("family", ["python", MIXED])
+def test_chunks_fit_their_prompt_without_omissions(family):
+    diffs  = [make_diff(f"f{i}.py", [20, 15]) for i in range(8)]
+    budget = prompt_overhead_tokens(family) + _diff_tokens(diffs[0]) * 3
+    chunks = chunk_diffs_by_token_budget(diffs, budget - prompt_overhead_tokens(family))
+    assert len(chunks) > 1
+    for chunk in chunks:
+        prompt, omitted = build_language_prompt(family, chunk, budget)
+        assert omitted == []
+        assert estimate_tokens(prompt) <= budget + len(chunk)
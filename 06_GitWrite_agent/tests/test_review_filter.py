@@ -0,0 +1,70 @@
+import pytest
+
+from review_filter import ReviewFilter, compile_globs
+
+CODE = "@@ -1,2 +1,3 @@\n import os\n+x = 1\n print(x)\n"
+
+
+def changed(filename, patch=CODE, status="modified"):
+    return {"filename": filename, "status": status, "additions": 1, "deletions": 0, "patch": patch}
+
+
+@pytest.mark.parametrize("filename, reason", [
+    ("package-lock.json",                "lock file"),
+    ("services/api/poetry.lock",         "lock file"),
+    ("static/app.min.js",                "minified"),
+    ("web/src/__snapshots__/App.snap",   "snapshot"),
+    ("proto/user_pb2.py",                "generated"),
+    ("vendor/github.com/x/y.go",         "vendored"),
+    ("app/vendor/lib.js",                "vendored"),
+    ("src/vendored_helpers.py",          None),
+    ("src/main.py",                      None),
+])
+def test_path_rules(filename, reason):
+    assert ReviewFilter().classify(changed(filename)) == reason
+
+
+def test_files_without_a_patch_are_always_skipped():
+    binary = changed("logo.png", patch=None, status="added")
+    assert ReviewFilter(enabled=False).classify(binary) == "no patch (added)"
+    assert ReviewFilter(enabled=False).classify(changed("poetry.lock")) is None
+
+
+def test_generated_marker_only_counts_in_the_file_header():
+    marked = "@@ -1,2 +1,3 @@\n+// Code generated by protoc-gen-go. DO NOT EDIT.\n package x\n"
+    assert ReviewFilter().classify(changed("api/user.go", marked)).startswith("generated (marker")
+
+    further_down = "@@ -40,2 +40,3 @@\n+// Code generated by protoc-gen-go. DO NOT EDIT.\n x\n"
+    assert ReviewFilter().classify(changed("api/user.go", further_down)) is None
+
+    below_header = "@@ -1,40 +1,41 @@\n" + " line\n" * 35 + "+# @generated\n"
+    assert ReviewFilter(header_lines=30).classify(changed("gen.py", below_header)) is None
+
+
+def test_removed_marker_does_not_count():
+    patch = "@@ -1,2 +1,1 @@\n-# @generated\n import os\n"
+    assert ReviewFilter().classify(changed("tool.py", patch)) is None
+
+
+def test_long_added_line_is_minified():
+    patch = "@@ -1 +1 @@\n-old\n+" + "a;" * 600 + "\n"
+    assert ReviewFilter(max_line=1000).classify(changed("dist/app.js", patch)) == "minified (line of 1200 chars)"
+    assert ReviewFilter(max_line=2000).classify(changed("dist/app.js", patch)) is None
+
+
+def test_extra_skip_and_keep_globs():
+    review_filter = ReviewFilter(skip=["docs/*"], keep=["package-lock.json"])
+    assert review_filter.classify(changed("docs/guide.md")) == "REVIEW_FILTER_SKIP"
+    assert review_filter.classify(changed("package-lock.json")) is None
+    assert review_filter.classify(changed("frontend/package-lock.json")) is None
+
+
+def test_split_records_why_files_were_skipped():
+    reviewable, skipped = ReviewFilter().split([changed("src/a.py"), changed("yarn.lock")])
+    assert [f["filename"] for f in reviewable] == ["src/a.py"]
+    assert skipped == [{"filename": "yarn.lock", "status": "modified", "additions": 1,
+                        "deletions": 0, "reason": "lock file"}]
+
+
+def test_empty_rules_compile_to_nothing():
+    assert compile_globs({"keep": []}) == (None, {})
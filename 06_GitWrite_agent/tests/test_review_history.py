@@ -0,0 +1,75 @@
+from review_history import (diff_fingerprint, known_tickets, record_tickets, reused_findings,
+                            split_diffs_by_history, update_history_findings)
+
+
+def diff(name, patch):
+    return {"filename": name, "patch": patch}
+
+
+def bug(location, kind="logic"):
+    return {"type": kind, "location": location, "description": f"{kind} at {location}"}
+
+
+def ticket(key, location, kind="logic"):
+    return {"ticket_key": key, "type": kind, "location": location}
+
+
+def history_for(*diffs, **findings):
+    return update_history_findings({"files": {}}, list(diffs), [],
+                                   findings.get("bugs", []), findings.get("test_cases", []))
+
+
+def test_split_reviews_only_changed_and_new_files():
+    a, b = diff("a.py", "@@ a"), diff("b.py", "@@ b")
+    history = history_for(a, b)
+    changed, unchanged = split_diffs_by_history([a, diff("b.py", "@@ b2"), diff("c.py", "@@ c")],
+                                                history)
+    assert [d["filename"] for d in changed] == ["b.py", "c.py"]
+    assert unchanged == ["a.py"]
+
+
+def test_patch_id_stands_in_for_the_patch():
+    a = diff("a.py", "@@ a")
+    stored = {"filename": "a.py", "patch": None, "patch_id": diff_fingerprint(a)}
+    assert split_diffs_by_history([stored], history_for(a)) == ([], ["a.py"])
+
+
+def test_update_attributes_findings_and_drops_removed_files():
+    a, b = diff("a.py", "@@ a"), diff("b.py", "@@ b")
+    old  = history_for(a, b, bugs=[bug("b.py:3")])
+    test = {"test_name": "test_a", "covers_bug": "null"}
+    new  = update_history_findings(old, [diff("a.py", "@@ a2")], [],
+                                   [bug("src/a.py:7", "null"), bug("")], [test])
+    assert set(new["files"]) == {"a.py"}
+    entry = new["files"]["a.py"]
+    assert entry["fingerprint"] == diff_fingerprint(diff("a.py", "@@ a2"))
+    assert entry["bugs"] == [bug("src/a.py:7", "null")]
+    assert entry["test_cases"] == [test]
+
+
+def test_unchanged_files_keep_their_findings():
+    a = diff("a.py", "@@ a")
+    old = history_for(a, bugs=[bug("a.py:1")])
+    new = update_history_findings(old, [], ["a.py"], [], [])
+    assert new["files"]["a.py"] == old["files"]["a.py"]
+    assert reused_findings(new, ["a.py"])["bugs_found"] == [bug("a.py:1")]
+
+
+def test_recorded_tickets_are_known_next_run():
+    history = history_for(diff("a.py", "@@ a"), bugs=[bug("a.py:1")])
+    history = record_tickets(history, [ticket("PRJ-1", "a.py:1"), ticket("PRJ-2", "")])
+    assert [t["ticket_key"] for t in history["files"]["a.py"]["tickets"]] == ["PRJ-1"]
+    assert [t["ticket_key"] for t in history["tickets"]] == ["PRJ-2"]
+
+    tickets, remaining = known_tickets(history, [bug("a.py:1"), bug(""), bug("a.py:9")])
+    assert [t["ticket_key"] for t in tickets] == ["PRJ-1", "PRJ-2"]
+    assert remaining == [bug("a.py:9")]
+
+
+def test_record_tickets_is_idempotent_and_copies():
+    history = history_for(diff("a.py", "@@ a"), bugs=[bug("a.py:1")])
+    once    = record_tickets(history, [ticket("PRJ-1", "a.py:1"), ticket("PRJ-2", "")])
+    twice   = record_tickets(once, [ticket("PRJ-1", "a.py:1"), ticket("PRJ-2", "")])
+    assert twice == once
+    assert history["files"]["a.py"]["tickets"] == []
+    assert "tickets" not in history
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("langgraph")
+
+import review_scheduler
+from review_scheduler import (BULK, NORMAL, URGENT, FILE_COST, SCHEDULER_AGING_S, SCHEDULER_UNKNOWN_COST,
+                              pr_cost, priority_class, priority_key, prioritize)
+
+
+def meta(files=1, additions=10, deletions=0, **extra):
+    return {"changed_files": files, "additions": additions, "deletions": deletions, **extra}
+
+
+def test_cost_counts_lines_and_files():
+    assert pr_cost(meta(files=3, additions=10, deletions=5)) == 15 + 3 * FILE_COST
+    assert pr_cost({"changed_files": 0, "additions": None}) == 0
+    assert pr_cost({}) == pr_cost({"additions": 10}) == SCHEDULER_UNKNOWN_COST
+
+
+@pytest.mark.parametrize("extra, cls", [
+    ({},                                       NORMAL),
+    ({"labels": [{"name": "Security"}]},       URGENT),
+    ({"labels": ["p0"]},                       URGENT),
+    ({"head": {"ref": "hotfix/login"}},        URGENT),
+    ({"labels": [{"name": "docs"}]},           NORMAL),
+])
+def test_priority_class_by_labels_and_branch(extra, cls):
+    assert priority_class(meta(**extra), 10) == cls
+
+
+def test_large_prs_are_bulk_unless_urgent():
+    cost = review_scheduler.SCHEDULER_BULK_COST + 1
+    assert priority_class(meta(), cost) == BULK
+    assert priority_class(meta(labels=["hotfix"]), cost) == URGENT
+
+
+def test_key_orders_by_class_then_size():
+    assert priority_key(URGENT, 1000, 0) < priority_key(NORMAL, 1000, 0) < priority_key(BULK, 1000, 0)
+    assert priority_key(NORMAL, 10, 0) < priority_key(NORMAL, 1000, 0)
+
+
+def test_class_is_worth_class_span_doublings():
+    span = review_scheduler.SCHEDULER_CLASS_SPAN
+    assert priority_key(URGENT, 2 ** span * 100, 0) == pytest.approx(priority_key(NORMAL, 100, 0), abs=0.02)
+
+
+def test_twice_the_cost_equals_one_aging_step():
+    # A PR twice as large (log2 step) ranks like a same-size PR queued one aging period later
+    doubled = priority_key(NORMAL, 2 * 1000 + 1, 0)
+    later   = priority_key(NORMAL, 1000, SCHEDULER_AGING_S)
+    assert doubled == pytest.approx(later)
+
+
+def test_waiting_lets_a_large_pr_overtake_newer_small_ones():
+    old_large = priority_key(NORMAL, 4000, 0)
+    assert old_large > priority_key(NORMAL, 10, 0)
+    assert old_large < priority_key(NORMAL, 10, 20 * SCHEDULER_AGING_S)
+
+
+def test_prioritize_returns_key_class_and_cost():
+    key, cls, cost = prioritize(meta(labels=["urgent"]), 0.0)
+    assert (cls, cost) == (URGENT, 10 + FILE_COST)
+    assert key == priority_key(URGENT, cost, 0.0)
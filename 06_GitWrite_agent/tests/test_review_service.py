@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from review_service import CoalescingQueue, PriorityReviewQueue, make_queue
+
+PR_A = "https://github.com/o/r/pull/1"
+PR_B = "https://github.com/o/r/pull/2"
+
+
+def test_pushes_to_a_queued_pr_coalesce():
+    async def scenario():
+        queue = CoalescingQueue()
+        assert queue.submit(PR_A, "sha1") == "queued"
+        assert queue.submit(PR_B, "sha2") == "queued"
+        assert queue.submit(PR_A, "sha3", {"changed_files": 1}) == "coalesced"
+        assert len(queue) == 2
+
+        job = await queue.next()
+        assert (job.pr_url, job.head_sha, job.pushes, job.meta) == (PR_A, "sha3", 2, {"changed_files": 1})
+        assert (await queue.next()).pr_url == PR_B
+        assert (queue.received, queue.coalesced) == (3, 1)
+
+    asyncio.run(scenario())
+
+
+def test_pushes_during_review_are_parked_until_done():
+    async def scenario():
+        queue = CoalescingQueue()
+        queue.submit(PR_A, "sha1")
+        job = await queue.next()
+        assert queue.submit(PR_A, "sha2") == "deferred"
+        assert queue.submit(PR_A, "sha3") == "deferred"
+        assert len(queue) == 0 and queue.coalesced == 1
+
+        queue.done(job)
+        again = await queue.next()
+        assert (again.pr_url, again.head_sha, again.pushes) == (PR_A, "sha3", 2)
+        queue.done(again)
+        assert not queue.in_flight and not queue.parked
+
+    asyncio.run(scenario())
+
+
+def test_priority_queue_runs_small_and_urgent_prs_first():
+    big    = {"changed_files": 200, "additions": 9000, "deletions": 0}
+    small  = {"changed_files": 1, "additions": 3, "deletions": 1}
+    hotfix = {"changed_files": 5, "additions": 200, "deletions": 0, "labels": [{"name": "hotfix"}]}
+
+    async def scenario():
+        queue = PriorityReviewQueue()
+        queue.submit("big", "s", big)
+        queue.submit("small", "s", small)
+        queue.submit("hotfix", "s", hotfix)
+        order = [await queue.next() for _ in range(3)]
+        return [(job.pr_url, job.priority) for job in order]
+
+    assert asyncio.run(scenario()) == [("hotfix", "urgent"), ("small", "normal"), ("big", "bulk")]
+
+
+def test_make_queue():
+    assert type(make_queue("fifo")) is CoalescingQueue
+    assert type(make_queue("priority")) is PriorityReviewQueue
+    with pytest.raises(ValueError):
+        make_queue("lifo")
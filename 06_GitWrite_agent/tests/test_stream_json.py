@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from stream_json import ArrayStreamParser
+
+BUGS = [
+    {"type": "logic", "location": "a.py:3", "description": 'uses "{" and "}" in a string \\ escaped'},
+    {"type": "null", "location": "b.py:9", "description": "nested", "extra": {"lines": [1, [2, 3]]}},
+]
+RESPONSE = "```json\n" + json.dumps({
+    "review_comments":  {"summary": "s", "bugs_found": [{"type": "not the target"}]},
+    "bugs_found":       BUGS,
+    "test_suggestions": {"test_cases": [{"test_name": "t"}]},
+}, indent=2) + "\n```"
+
+
+def feed_in(text, size):
+    parser, out = ArrayStreamParser("bugs_found"), []
+    for i in range(0, len(text), size):
+        out.append(parser.feed(text[i:i + size]))
+    return parser, out
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, len(RESPONSE)])
+def test_elements_are_emitted_whatever_the_fragmenting(size):
+    parser, batches = feed_in(RESPONSE, size)
+    assert [bug for batch in batches for bug in batch] == BUGS
+    assert parser.done and parser.emitted == 2
+
+
+def test_element_is_emitted_as_soon_as_it_closes():
+    first_end = RESPONSE.index("\n    }", RESPONSE.index('"a.py:3"')) + len("\n    }")
+    parser    = ArrayStreamParser("bugs_found")
+    assert parser.feed(RESPONSE[:first_end - 1]) == []
+    assert parser.feed(RESPONSE[first_end - 1:first_end]) == [BUGS[0]]
+
+
+def test_stops_scanning_after_the_array_closes():
+    parser = ArrayStreamParser("bugs_found")
+    parser.feed(RESPONSE)
+    scanned = parser.pos
+    assert parser.feed('{"bugs_found": [{"type": "late"}]}') == []
+    assert parser.pos == scanned
+
+
+def test_empty_or_missing_array_yields_nothing():
+    assert ArrayStreamParser("bugs_found").feed('{"bugs_found": []}') == []
+    parser = ArrayStreamParser("bugs_found")
+    assert parser.feed('{"review_comments": {"bugs": [{"x": 1}]}}') == []
+    assert not parser.done
+
+
+def test_malformed_element_is_skipped():
+    parser = ArrayStreamParser("bugs_found")
+    assert parser.feed('{"bugs_found": [{"type": tru}, {"type": "ok"}]}') == [{"type": "ok"}]